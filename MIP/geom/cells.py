@@ -36,11 +36,12 @@ def get_cell_importances(parser):
         cards to their contents.
     """
     imp_dict = OrderedDict()
-    for card in parser.cards(blocks='d', skipcomments=True):
+    imp_types = [t for t in parser.index().data_types()
+                 if t.startswith('imp:')]
+    for card in parser.data_cards(*imp_types):
         type_, name, params = card.parts()
-        if name.lower().strip().startswith('imp:'):
-            params = (type_ + params).split()
-            imp_dict[name.lower()] = params
+        params = (type_ + params).split()
+        imp_dict[name.lower()] = params
     return imp_dict
 
 
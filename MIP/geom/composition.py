@@ -9,10 +9,9 @@ def get_material_composition(parser):
     :returns: a dictionary describing material composition.
     """
     mat_dict = OrderedDict()
-    for card in parser.cards(blocks='d', skipcomments=True):
+    for card in parser.data_cards('m'):
         name, dtype, params = card.parts()
-        if dtype.lower() == 'm':
-            name = int(name)
-            params = params.split()
-            mat_dict[name] = params
+        name = int(name)
+        params = params.split()
+        mat_dict[name] = params
     return mat_dict
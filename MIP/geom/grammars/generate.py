@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Generate the Python parser for the geometry grammar.
+
+The generated module, ``geom_parser.py``, is shipped with the package so that
+the grammar does not have to be compiled by TatSu every time the converter is
+started. Regenerate it whenever ``geom.ebnf`` changes (the test suite checks
+that it is up to date)::
+
+    python -m MIP.geom.grammars.generate
+
+Use the TatSu version pinned in ``poetry.lock``: the code generated by TatSu
+only works with a range of TatSu versions, and the ``tatsu`` requirement in
+``pyproject.toml`` must stay within that range.
+"""
+
+import hashlib
+from os import path
+
+import tatsu
+
+
+here = path.dirname(path.abspath(__file__))
+ebnf_path = path.join(here, 'geom.ebnf')
+parser_path = path.join(here, 'geom_parser.py')
+
+# The annotations written by recent TatSu versions (``set[str]``,
+# ``ParserConfig | None``) cannot be evaluated by Python < 3.10; postpone their
+# evaluation so that the generated module can be imported by all the supported
+# Python versions.
+header = '''\
+# Generated from geom.ebnf by `python -m MIP.geom.grammars.generate`.
+# Do not edit by hand.
+from __future__ import annotations
+
+EBNF_SHA256 = {sha!r}
+TATSU_VERSION = {version!r}
+
+'''
+
+
+def ebnf_sha256(grammar):
+    """Return the SHA-256 digest of the grammar text."""
+    return hashlib.sha256(grammar.encode('utf-8')).hexdigest()
+
+
+def generate(grammar):
+    """Return the source code of the parser for grammar."""
+    source = tatsu.to_python_sourcecode(grammar, name='Geom')
+    # the header already enables postponed annotations, and __future__
+    # imports are only allowed at the top of the module
+    source = source.replace('from __future__ import annotations\n', '')
+    return header.format(sha=ebnf_sha256(grammar),
+                         version=tatsu.__version__) + source
+
+
+def main():
+    with open(ebnf_path, encoding='utf-8') as ebnf:
+        grammar = ebnf.read()
+    with open(parser_path, 'w', encoding='utf-8') as out:
+        out.write(generate(grammar))
+    print('wrote {}'.format(parser_path))
+
+
+if __name__ == '__main__':
+    main()
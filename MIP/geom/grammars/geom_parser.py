@@ -0,0 +1,237 @@
+# Generated from geom.ebnf by `python -m MIP.geom.grammars.generate`.
+# Do not edit by hand.
+from __future__ import annotations
+
+EBNF_SHA256 = '2c379b3bcb257e02eb0e742f6e23ee81636cea35d7911ed536429c7a11b1012e'
+TATSU_VERSION = '5.8.3'
+
+#!/usr/bin/env python
+
+# CAVEAT UTILITOR
+#
+# This file was automatically generated by TatSu.
+#
+#    https://pypi.python.org/pypi/tatsu/
+#
+# Any changes you make to it will be overwritten the next time
+# the file is generated.
+
+
+import sys
+
+from tatsu.buffering import Buffer
+from tatsu.parsing import Parser
+from tatsu.parsing import tatsumasu
+from tatsu.parsing import leftrec, nomemo, isname # noqa
+from tatsu.infos import ParserConfig
+from tatsu.util import re, generic_main  # noqa
+
+
+KEYWORDS = {}  # type: ignore
+
+
+class GeomBuffer(Buffer):
+    def __init__(self, text, /, config: ParserConfig = None, **settings):
+        config = ParserConfig.new(
+            config,
+            owner=self,
+            whitespace=None,
+            nameguard=None,
+            comments_re='(?!)',
+            eol_comments_re='(?!)',
+            ignorecase=False,
+            namechars='',
+            parseinfo=False,
+        )
+        config = config.replace(**settings)
+        super().__init__(text, config=config)
+
+
+class GeomParser(Parser):
+    def __init__(self, /, config: ParserConfig = None, **settings):
+        config = ParserConfig.new(
+            config,
+            owner=self,
+            whitespace=None,
+            nameguard=None,
+            comments_re='(?!)',
+            eol_comments_re='(?!)',
+            ignorecase=False,
+            namechars='',
+            parseinfo=False,
+            keywords=KEYWORDS,
+            start='start',
+        )
+        config = config.replace(**settings)
+        super().__init__(config=config)
+
+    @tatsumasu()
+    @nomemo
+    def _start_(self):  # noqa
+        self._union_()
+        self._check_eof()
+
+    @tatsumasu()
+    @leftrec
+    def _union_(self):  # noqa
+        with self._choice():
+            with self._option():
+                self._union_()
+                self.name_last_node('l')
+                self._token(':')
+                self.name_last_node('o')
+                self._isect_()
+                self.name_last_node('r')
+
+                self._define(
+                    ['l', 'o', 'r'],
+                    []
+                )
+            with self._option():
+                self._isect_()
+                self.name_last_node('o')
+            self._error(
+                'expecting one of: '
+                '<isect> <operand> <union>'
+            )
+
+    @tatsumasu()
+    @leftrec
+    def _isect_(self):  # noqa
+        with self._choice():
+            with self._option():
+                self._isect_()
+                self.name_last_node('l')
+                self._token('*')
+                self.name_last_node('o')
+                self._operand_()
+                self.name_last_node('r')
+
+                self._define(
+                    ['l', 'o', 'r'],
+                    []
+                )
+            with self._option():
+                self._operand_()
+                self.name_last_node('o')
+            self._error(
+                'expecting one of: '
+                "'(' '^(' '_(' <cell> <isect> <operand>"
+                '<surface>'
+            )
+
+    @tatsumasu()
+    def _operand_(self):  # noqa
+        with self._choice():
+            with self._option():
+                self._cell_()
+                self.name_last_node('o')
+            with self._option():
+                self._surface_()
+                self.name_last_node('o')
+            with self._option():
+                self._token('_(')
+                self.name_last_node('l')
+                self._compl_()
+                self.name_last_node('o')
+                self._token(')')
+                self.name_last_node('r')
+
+                self._define(
+                    ['l', 'o', 'r'],
+                    []
+                )
+            with self._option():
+                self._token('(')
+                self.name_last_node('l')
+                self._union_()
+                self.name_last_node('o')
+                self._token(')')
+                self.name_last_node('r')
+
+                self._define(
+                    ['l', 'o', 'r'],
+                    []
+                )
+            with self._option():
+                self._token('^(')
+                self.name_last_node('l')
+                self._complcell_()
+                self.name_last_node('o')
+                self._token(')')
+                self.name_last_node('r')
+
+                self._define(
+                    ['l', 'o', 'r'],
+                    []
+                )
+            self._error(
+                'expecting one of: '
+                "'(' '^(' '_(' <cell> <surface>"
+                '[-+]{0,1}\\d+(?:\\.\\d)? _\\d+'
+            )
+
+    @tatsumasu()
+    def _compl_(self):  # noqa
+        self._union_()
+
+    @tatsumasu()
+    def _surface_(self):  # noqa
+        self._pattern('[-+]{0,1}\\d+(?:\\.\\d)?')
+
+    @tatsumasu()
+    def _cell_(self):  # noqa
+        self._pattern('_\\d+')
+
+    @tatsumasu()
+    def _complcell_(self):  # noqa
+        self._pattern('\\d+')
+
+
+class GeomSemantics:
+    def start(self, ast):  # noqa
+        return ast
+
+    def union(self, ast):  # noqa
+        return ast
+
+    def isect(self, ast):  # noqa
+        return ast
+
+    def operand(self, ast):  # noqa
+        return ast
+
+    def compl(self, ast):  # noqa
+        return ast
+
+    def surface(self, ast):  # noqa
+        return ast
+
+    def cell(self, ast):  # noqa
+        return ast
+
+    def complcell(self, ast):  # noqa
+        return ast
+
+
+def main(filename, **kwargs):
+    if not filename or filename == '-':
+        text = sys.stdin.read()
+    else:
+        with open(filename) as f:
+            text = f.read()
+    parser = GeomParser()
+    return parser.parse(
+        text,
+        filename=filename,
+        **kwargs
+    )
+
+
+if __name__ == '__main__':
+    import json
+    from tatsu.util import asjson
+
+    ast = generic_main(main, GeomParser, name='Geom')
+    data = asjson(ast)
+    print(json.dumps(data, indent=2))
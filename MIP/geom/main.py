@@ -27,14 +27,11 @@ def extract_surfaces(ast):
     if ast[0] == '^':
         return s
 
-    if isinstance(ast[1], tuple):
-        s.update(extract_surfaces(ast[1]))
-    else:
-        s.add(abs(ast[1]))
-    if isinstance(ast[2], tuple):
-        s.update(extract_surfaces(ast[2]))
-    else:
-        s.add(abs(ast[2]))
+    for arg in ast[1:]:
+        if isinstance(arg, tuple):
+            s.update(extract_surfaces(arg))
+        else:
+            s.add(abs(arg))
     return s
 
 
@@ -51,14 +48,11 @@ def extract_surfaces_list(ast):
     if ast[0] == '^':
         return l
 
-    if isinstance(ast[1], tuple):
-        l.extend(extract_surfaces_list(ast[1]))
-    else:
-        l.append(ast[1])
-    if isinstance(ast[2], tuple):
-        l.extend(extract_surfaces_list(ast[2]))
-    else:
-        l.append(ast[2])
+    for arg in ast[1:]:
+        if isinstance(arg, tuple):
+            l.extend(extract_surfaces_list(arg))
+        else:
+            l.append(arg)
     return l
 
 def replace_surfaces(ast, dic):
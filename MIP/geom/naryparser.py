@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Hand-written parser for MCNP cell geometry descriptions.
+
+This is an alternative to the TatSu grammar in ``grammars/geom.ebnf``. It
+accepts the same language and produces the same kind of AST (made of
+:class:`~.semantics.Surface`, :class:`~.semantics.Cell` and
+:class:`~.semantics.GeomExpression` objects), with one difference: chains of
+the same operator are collected in a single n-ary node. For example, ``1 -2
+3`` is parsed as ``('*', 1, -2, 3)`` instead of ``('*', ('*', 1, -2), 3)``.
+Parenthesised subexpressions are kept as separate nodes.
+
+The geometry is tokenized directly, without the regular-expression rewriting
+done by :func:`~.parsegeom.normalize`. Blanks denote intersection, ``:``
+denotes union and intersection binds tighter than union. Nesting is handled
+with an explicit stack, so deeply nested geometries do not hit the recursion
+limit.
+"""
+
+import re
+
+from .semantics import Surface, Cell, GeomExpression
+
+
+class GeomParseError(ValueError):
+    """Raised when a geometry description cannot be parsed."""
+
+
+re_token = re.compile(r'''\s*(?:
+    (?P<surf>[-+]?\d+(?:\.\d)?)
+    |\#\s*(?P<compl_cell>\d+)
+    |(?P<compl_open>\#\s*\()
+    |(?P<open>\()
+    |(?P<close>\))
+    |(?P<union>:)
+    |_(?P<cell>\d+)
+    )''', re.VERBOSE)
+re_blank = re.compile(r'\s*')
+
+# characters that may not immediately follow a surface number
+surf_glue = frozenset('0123456789.+-')
+
+
+def _chain(op, items):
+    """Return the n-ary node joining items with op, or the item itself if
+    there is only one."""
+    if len(items) == 1:
+        return items[0]
+    return GeomExpression((op,) + tuple(items))
+
+
+class _Frame:
+    """One level of parenthesis nesting."""
+
+    __slots__ = ('kind', 'pos', 'terms', 'factors')
+
+    def __init__(self, kind, pos):
+        self.kind = kind
+        self.pos = pos
+        self.terms = []
+        self.factors = []
+
+    def close(self, geom, pos):
+        if not self.factors:
+            raise GeomParseError(
+                'Missing operand at position {} in {!r}'.format(pos, geom))
+        self.terms.append(_chain('*', self.factors))
+        return _chain(':', self.terms)
+
+
+def parse(geom):
+    """
+    Parse the geometry description geom and return its n-ary AST.
+
+    >>> parse('1 -2 3')
+    ('*', Surface(1, None), Surface(-2, None), Surface(3, None))
+    >>> parse('1 : 2 3 : #(4 : 5.1)')[0]
+    ':'
+    >>> parse('#12')
+    ('^', '12')
+    >>> parse('1-2')
+    Traceback (most recent call last):
+    ...
+    MIP.geom.naryparser.GeomParseError: Missing blank after surface at position 0 in '1-2'
+    """
+    stack = [_Frame(None, 0)]
+    frame = stack[-1]
+    pos = 0
+    end = len(geom.rstrip())
+    while pos < end:
+        m = re_token.match(geom, pos)
+        if m is None:
+            pos = re_blank.match(geom, pos).end()
+            raise GeomParseError('Unexpected character {!r} at position {} '
+                                 'in {!r}'.format(geom[pos], pos, geom))
+        kind = m.lastgroup
+        pos = m.end()
+        if kind == 'surf':
+            if pos < len(geom) and geom[pos] in surf_glue:
+                raise GeomParseError('Missing blank after surface at '
+                                     'position {} in {!r}'
+                                     .format(m.start(kind), geom))
+            surf = m.group(kind)
+            if '.' in surf:
+                frame.factors.append(Surface(*surf.split('.')))
+            else:
+                frame.factors.append(Surface(surf))
+        elif kind == 'compl_cell':
+            frame.factors.append(
+                GeomExpression(('^', Cell(m.group(kind)))))
+        elif kind == 'cell':
+            frame.factors.append(Cell(m.group(kind)))
+        elif kind == 'open' or kind == 'compl_open':
+            frame = _Frame(kind, m.start(kind))
+            stack.append(frame)
+        elif kind == 'union':
+            if not frame.factors:
+                raise GeomParseError('Missing operand at position {} in {!r}'
+                                     .format(m.start(kind), geom))
+            frame.terms.append(_chain('*', frame.factors))
+            frame.factors = []
+        else:  # close
+            if len(stack) == 1:
+                raise GeomParseError('Unbalanced parenthesis at position {} '
+                                     'in {!r}'.format(m.start(kind), geom))
+            expr = stack.pop().close(geom, m.start(kind))
+            if frame.kind == 'compl_open':
+                expr = expr.inverse()
+            frame = stack[-1]
+            frame.factors.append(expr)
+    if len(stack) > 1:
+        raise GeomParseError('Unbalanced parenthesis at position {} in {!r}'
+                             .format(frame.pos, geom))
+    return frame.close(geom, pos)
@@ -3,17 +3,39 @@
 
 from pkgutil import get_data
 import re
-from codecs import open
-import tatsu
-from tatsu.ast import AST
+from collections import OrderedDict
+from warnings import warn
 
 from .semantics import GeomSemantics
+from . import naryparser
 
-from os import path
 
+# TatSu parser for the geometry grammar, built on first use by get_parser
+_parser = None
 
-grammar = get_data('MIP.geom.grammars', 'geom.ebnf').decode('utf-8')
-parser = tatsu.compile(grammar)  # , left_recurion=False)
+
+def get_parser():
+    """
+    Return the TatSu parser for the geometry grammar.
+
+    The parser generated from ``grammars/geom.ebnf`` (see
+    :mod:`.grammars.generate`) is used, unless it does not work with the
+    installed TatSu version; in that case a warning is emitted and the
+    grammar is compiled.
+    """
+    global _parser
+    if _parser is None:
+        try:
+            from .grammars.geom_parser import GeomParser
+            _parser = GeomParser()
+        except (ImportError, SyntaxError, TypeError, AttributeError) as err:
+            import tatsu
+            warn('cannot use the generated geometry parser with TatSu {} '
+                 '({}: {}); compiling the grammar instead'
+                 .format(tatsu.__version__, type(err).__name__, err))
+            grammar = get_data('MIP.geom.grammars', 'geom.ebnf')
+            _parser = tatsu.compile(grammar.decode('utf-8'))
+    return _parser
 
 # patterns to replace space denoting intersection with '*'
 re_union = re.compile(r'\s*:\s*')
@@ -55,12 +77,98 @@ def normalize(geom):
     return g
 
 
-def get_ast(geom):
+def parse_tatsu(geom):
+    """Parse geom with the TatSu grammar. Returns a binary AST."""
+    g = normalize(geom)
+    return get_parser().parse(g, semantics=GeomSemantics())
+
+
+# Available parser backends. Both return the same kind of AST, but the
+# ``nary`` backend collects chains of the same operator in a single node.
+backends = {
+    'tatsu': parse_tatsu,
+    'nary': naryparser.parse,
+}
+
+
+class ASTCache:
+    """
+    Bounded cache of geometry ASTs, keyed by parser backend and geometry text.
+
+    Runs of whitespace in the geometry are collapsed before lookup, so cells
+    that differ only in layout share the same entry. The least recently used
+    entry is evicted when the cache holds more than maxsize ASTs.
+
+    The cached ASTs are shared by all the cells with the same geometry, so
+    they must be treated as immutable: code that needs to modify a geometry
+    must build a new AST instead.
+
+    >>> cache = ASTCache(maxsize=2)
+    >>> a = get_ast('1 -2', cache=cache)
+    >>> a is get_ast('  1   -2 ', cache=cache)
+    True
+    >>> cache
+    ASTCache(hits=1, misses=1, size=1, maxsize=2)
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._asts = OrderedDict()
+
+    def get(self, geom, backend, parse):
+        """Return the AST of geom, calling parse(geom) on a miss."""
+        key = (backend, ' '.join(geom.split()))
+        try:
+            ast = self._asts[key]
+        except KeyError:
+            self.misses += 1
+            ast = parse(geom)
+            self._asts[key] = ast
+            if len(self._asts) > self.maxsize:
+                self._asts.popitem(last=False)
+            return ast
+        self.hits += 1
+        self._asts.move_to_end(key)
+        return ast
+
+    def clear(self):
+        """Drop all the cached ASTs and reset the counters."""
+        self._asts.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._asts)
+
+    def __repr__(self):
+        return 'ASTCache(hits={}, misses={}, size={}, maxsize={})'.format(
+            self.hits, self.misses, len(self), self.maxsize)
+
+
+# default cache used by get_ast
+ast_cache = ASTCache()
+
+
+def get_ast(geom, backend='tatsu', cache=ast_cache):
+    """
+    Return the AST of geometry description geom, parsed with the given
+    backend (one of the keys of :data:`backends`).
+
+    ASTs are looked up in cache first (see :class:`ASTCache`); pass
+    ``cache=None`` to always parse.
+    """
     if 'like' in geom.lower():
         return geom.split()[1]
-    g = normalize(geom)
-    ast = parser.parse(g, semantics=GeomSemantics())
-    return ast
+    try:
+        parse = backends[backend]
+    except KeyError:
+        raise ValueError('Unknown geometry parser backend {!r}, expected one '
+                         'of {}'.format(backend, ', '.join(backends))) from None
+    if cache is None:
+        return parse(geom)
+    return cache.get(geom, backend, parse)
 
 
 def modify_ast(ast, d):
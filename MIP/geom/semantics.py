@@ -1,5 +1,3 @@
-from tatsu.ast import AST
-
 class Cell(str):
     def evaluate(self):
         return str(self)
@@ -60,20 +58,23 @@ class Surface:
 
 class GeomExpression(tuple):
     """
-    Any binary operation. Can be inversed.
+    Any binary or n-ary operation. Can be inversed.
     """
 
     def inverse(self):
         if self[0] == '*':
-            return GeomExpression((':', self[1].inverse(), self[2].inverse()))
+            return GeomExpression((':',) + tuple(arg.inverse()
+                                                 for arg in self[1:]))
         elif self[0] == ':':
-            return GeomExpression(('*', self[1].inverse(), self[2].inverse()))
+            return GeomExpression(('*',) + tuple(arg.inverse()
+                                                 for arg in self[1:]))
         else:
             return self[0].inverse()
 
     def evaluate(self):
         if self[0] in '*:':
-            return '({} {} {})'.format(self[1].evaluate(), self[0], self[2].evaluate())
+            sep = ' {} '.format(self[0])
+            return '({})'.format(sep.join(arg.evaluate() for arg in self[1:]))
         else:
             return str(self[0])
 
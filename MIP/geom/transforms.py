@@ -32,14 +32,13 @@ def get_transforms(input, lim=None):
     """
     d = OrderedDict()
     n = 0
-    for c in input.cards(blocks='d', skipcomments=True):
+    for c in input.data_cards('tr', '*tr'):
         name, dtype, params = c.parts()
-        if dtype.lower() in ('tr', '*tr'):
-            name, params = normalize_transform(name, dtype, params)
-            d[name] = params
-            n += 1
-            if lim and n > lim:
-                break
+        name, params = normalize_transform(name, dtype, params)
+        d[name] = params
+        n += 1
+        if lim and n > lim:
+            break
     return d
 
 
@@ -56,18 +56,25 @@ class BIDClass:
 
 bid = BIDClass()
 
+# Regular expresison for blank line delimiter
+re_bld = re.compile(r'^\s*$', re.MULTILINE)
+re_bld_bytes = re.compile(br'^\s*$', re.MULTILINE)
+
 
 def get_block_positions(text, firstblock=None):
     """
     Returns a dictionary with tuple of indices that identify block start and
     end lines.
+
+    `text` can also be a bytes-like object (e.g. a memory-mapped file) in an
+    ASCII-compatible encoding. In this case the indices are byte offsets.
     """
 
     # Resulting dictionary
     dres = {}
 
-    # Regular expresison for blank line delimiter
-    bld = re.compile(r'^\s*$', re.MULTILINE)
+    binary = not isinstance(text, str)
+    bld = re_bld_bytes if binary else re_bld
 
     # Re.split() does not split on empty matches. Therefore, match positions
     # are searched and blocks are build manually.
@@ -87,7 +94,8 @@ def get_block_positions(text, firstblock=None):
     # Line count. Starts form 1, to be consistent with vim's G
     line = 1
     # Check if message block exists
-    if text[:20].split()[0].lower() == 'message:':
+    message = b'message:' if binary else 'message:'
+    if text[:20].split()[0].lower() == message:
         dres['m'] = bi[0], line
         line += utils.nol(text, *bi[0])
         bi.pop(0)
@@ -10,20 +10,32 @@ re_comment = re.compile(r'^\s{0,4}[cC](\s|$)')
 re_continuation_spaces = re.compile(r'^\s{5,}')
 re_continuation_prev = re.compile(r'[^$]*&\s*($|\$.*$)')
 
+# Same as above, for lines that have not been decoded
+re_comment_bytes = re.compile(br'^\s{0,4}[cC](\s|$)')
+re_continuation_spaces_bytes = re.compile(br'^\s{5,}')
+re_continuation_prev_bytes = re.compile(br'[^$]*&\s*($|\$.*$)')
+
+
+# Line boundaries recognized by str.splitlines()
+line_boundaries = '\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+
 
 # Function used at two places below
-def _yield(c1, n1, f, c2, n2):
+def _yield(c1, n1, f, c2, n2, s1=None, s2=None):
     if c1:
-        yield c1, n1, 'card'
+        yield (c1, n1, 'card') if s1 is None else (c1, n1, 'card', s1)
     if not f and c2:
-        yield c2, n2, 'cmnt'
+        yield (c2, n2, 'cmnt') if s2 is None else (c2, n2, 'cmnt', s2)
 
 
-def get_cards(block, skipcomments=False):
+def get_cards(block, skipcomments=False, spans=False):
     """
     Split text in `block` into cards. Return card text, line number in the block
     and type ('card' or 'cmnt').
 
+    If `spans` is True, a fourth element is returned: the pair of offsets in
+    `block` where the card (including its C-comments) starts and ends.
+
     The `block` represents one block of MCNP input file, which in general
     consists of one or more cards and zero or more comment lines.
 
@@ -49,37 +61,130 @@ def get_cards(block, skipcomments=False):
     n_card = 0
     n_cmnt = 0
 
+    # Offsets where the card and block of comments start and end. They are
+    # only passed to _yield if spans are requested.
+    s_card = e_card = 0
+    s_cmnt = e_cmnt = 0
+
     lprev = None  # previous card line
-    for n, l in enumerate(block.splitlines()):
+    pos = 0  # offset of the current line in the block
+    for n, raw in enumerate(block.splitlines(True)):
+        l = raw.rstrip(line_boundaries)
+        start, pos = pos, pos + len(raw)
         # if comment, then  add to block of comments
         # if continuation, then append block of comment this line to current
         # card
         # if new card, then yield current card or current block of comments and
         # create a new current card
         if re_comment.match(l):
+            if not cmnt:
+                s_cmnt = start
             cmnt.append(l)
+            e_cmnt = pos
         elif is_continuation(l, lprev):
             if not skipcomments:
                 card.extend(cmnt)
             cmnt = []
             n_cmnt = n + 1
             card.append(l)
+            e_card = pos
             lprev = l
         else:
             # this must be begin of a new card
-            for r in _yield(card, n_card, skipcomments, cmnt, n_cmnt):
+            for r in _yield(card, n_card, skipcomments, cmnt, n_cmnt,
+                            *_spans(spans, s_card, e_card, s_cmnt, e_cmnt)):
                 yield r
             cmnt = []
             n_cmnt = n + 1
             card = [l]
             n_card = n
+            s_card, e_card = start, pos
             lprev = l
     # At the end of block, yield the last card and comments (this code must be
     # the same as in `else` clause above)
-    for r in _yield(card, n_card, skipcomments, cmnt, n_cmnt):
+    for r in _yield(card, n_card, skipcomments, cmnt, n_cmnt,
+                    *_spans(spans, s_card, e_card, s_cmnt, e_cmnt)):
         yield r
 
 
+def _spans(spans, s_card, e_card, s_cmnt, e_cmnt):
+    if not spans:
+        return None, None
+    return (s_card, e_card), (s_cmnt, e_cmnt)
+
+
+def get_card_spans(buf, start, end, skipcomments=False):
+    """
+    Split the region [start, end) of `buf` into cards, without decoding it.
+    Return the line number in the region, the type ('card' or 'cmnt') and the
+    span of each card, as a pair of offsets in `buf`.
+
+    This is the counterpart of get_cards() for bytes-like objects (e.g. a
+    memory-mapped input file) in an ASCII-compatible encoding. Lines must be
+    terminated by '\\n' or '\\r\\n'.
+
+    Since the comment lines are not returned, the lines of a card can be
+    recovered from its span with card_lines().
+    """
+    # Line numbers and spans of the current card and block of comments
+    n_card = n_cmnt = 0
+    s_card = e_card = 0
+    s_cmnt = e_cmnt = 0
+    card = cmnt = False
+
+    lprev = None  # previous card line
+    n = 0
+    pos = start
+    while pos < end:
+        e = buf.find(b'\n', pos, end)
+        e = end if e == -1 else e + 1
+        l = buf[pos:e].rstrip(b'\r\n')
+        s, pos = pos, e
+        if re_comment_bytes.match(l):
+            if not cmnt:
+                s_cmnt = s
+            cmnt = True
+            e_cmnt = pos
+        elif is_continuation_bytes(l, lprev):
+            cmnt = False
+            n_cmnt = n + 1
+            e_card = pos
+            lprev = l
+        else:
+            # this must be begin of a new card
+            if card:
+                yield n_card, 'card', (s_card, e_card)
+            if not skipcomments and cmnt:
+                yield n_cmnt, 'cmnt', (s_cmnt, e_cmnt)
+            cmnt = False
+            n_cmnt = n + 1
+            card = True
+            n_card = n
+            s_card, e_card = s, pos
+            lprev = l
+        n += 1
+    if card:
+        yield n_card, 'card', (s_card, e_card)
+    if not skipcomments and cmnt:
+        yield n_cmnt, 'cmnt', (s_cmnt, e_cmnt)
+
+
+def card_lines(text, skipcomments=False):
+    """
+    Return the lines of the decoded card `text`, as get_cards() would.
+
+    `text` is the decoded span of a card returned by get_card_spans(). If
+    `skipcomments` is True, the C-comments are removed.
+    """
+    lines = [l.rstrip('\r') for l in text.split('\n')]
+    if lines and not lines[-1]:
+        # text ends with a new-line
+        lines.pop()
+    if skipcomments:
+        lines = [l for l in lines if not re_comment.match(l)]
+    return lines
+
+
 def expand_tabs(line):
     r'''Expand tabs in a line.
 
@@ -125,3 +230,14 @@ def is_continuation(l, prev=None):
     elif prev and re_continuation_prev.match(prev):
         return True
     return False
+
+
+def is_continuation_bytes(l, prev=None):
+    """
+    Same as is_continuation(), for lines that have not been decoded.
+    """
+    if re_continuation_spaces_bytes.match(l.expandtabs(8)):
+        return True
+    elif prev and re_continuation_prev_bytes.match(prev):
+        return True
+    return False
@@ -12,7 +12,7 @@ def split(txt):
     return m.groups()
 
 
-def expand_data_card(tokens, *, expected=None, dtype='float'):
+def expand_data_card(tokens, *, expected=None, dtype='float', array=False):
     '''Expand the numerical data described by `tokens` into a full list of
     numbers, without any abbreviation.
 
@@ -22,10 +22,16 @@ def expand_data_card(tokens, *, expected=None, dtype='float'):
         tokens as possible should be parsed.
     :param str dtype: the type of the elements of the resulting list, as a
         string. Possible values: ``'int'``, ``'float'`` (default).
+    :param bool array: if true, return the expanded data as a NumPy array
+        instead of a list. Skipped entries (``J``) are represented by NaN, so
+        this requires ``dtype='float'`` if the data contain any.
     :returns: a pair consisting of a list of expanded data, with type `dtype`,
         and the number of tokens consumed.
     :rtype: (list, int)
 
+    Tokens without any abbreviation are converted in a single pass, without
+    going through the expansion loop.
+
     Examples:
 
     >>> expand_data_card(['1', '3M', '2R'])
@@ -65,16 +71,41 @@ def expand_data_card(tokens, *, expected=None, dtype='float'):
     >>> expand_data_card(['1', '2I', '4', '3M', 'other'],
     ...                  dtype='int', expected=5)
     ([1, 2, 3, 4, 12], 4)
+
+    Returning an array:
+
+    >>> expand_data_card(['1', '2I', '4', '0.5', '2J'], array=True)
+    (array([1. , 2. , 3. , 4. , 0.5, nan, nan]), 5)
     '''
     if dtype == 'int':
         conv = round
+        np_dtype = int
     elif dtype == 'float':
         conv = float
+        np_dtype = float
     else:
         raise ValueError('unrecognized dtype: {}'.format(dtype))
 
+    if array:
+        # numpy is only needed here; keep it out of the import of MIP.mip
+        import numpy as np  # pylint: disable=import-outside-toplevel
+
+    tokens = [token.strip().lower() for token in tokens]
+    head = tokens if expected is None else tokens[:expected]
+    if not any(token[-1].isalpha() for token in head):
+        # fast path: no abbreviations
+        if expected is not None and len(head) != expected:
+            raise ValueError('expected exactly {:d} items in data card, '
+                             'found {:d}'.format(expected, len(head)))
+        if array:
+            values = np.array(head, dtype=float)
+            if np_dtype is int:
+                values = np.rint(values).astype(int)
+            return values, len(head)
+        return [conv(float(token)) for token in head], len(head)
+
     result = []
-    tokens = [token.strip().lower() for token in reversed(tokens)]
+    tokens.reverse()
     consumed = 0
     while tokens and (expected is None or len(result) < expected):
         token = tokens.pop()
@@ -102,6 +133,12 @@ def expand_data_card(tokens, *, expected=None, dtype='float'):
     if expected is not None and len(result) != expected:
         raise ValueError('expected exactly {:d} items in data card, found {:d}'
                          .format(expected, len(result)))
+    if array:
+        values = np.array([np.nan if res is None else res for res in result],
+                          dtype=float)
+        if np_dtype is int:
+            values = np.rint(values).astype(int)
+        return values, consumed
     return [conv(res) if res is not None else None for res in result], consumed
 
 
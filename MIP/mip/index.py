@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Index of the cards of an MCNP input file.
+
+The cell, surface and data blocks are split into cards only once. Consumers
+that look for a specific kind of data card (materials, transformations,
+importances) then query the index instead of walking the whole data block
+again.
+"""
+
+import re
+from collections import OrderedDict
+
+from . import datacard
+
+# Blocks covered by the index
+indexed_blocks = 'csd'
+
+re_comment = re.compile(r'[$&]')
+
+
+def data_key(card):
+    """
+    Return the key under which the data card `card` is indexed.
+
+    The key is the lower-case card type, including the star prefix, if any
+    (e.g. 'm', 'tr', '*tr', 'imp:n'). Only the first line of the card is
+    looked at, so that cards that are never requested need not be decoded.
+    """
+    line = re_comment.split(card.first_line(), 1)[0]
+    m = datacard.re_data.search(line)
+    if m is None:
+        return ''
+    typ, _, star, _ = m.groups()
+    return (star + typ).strip().lower()
+
+
+class CardIndex:
+    """
+    Index of the cards in the cell, surface and data blocks.
+
+    The index keeps the cards of each block in input order, and groups the data
+    cards by their type. Each card caches its content and parts, so the
+    comments are stripped at most once per card.
+    """
+    def __init__(self, cards):
+        self.by_block = OrderedDict((b, []) for b in indexed_blocks)
+        self.by_type = OrderedDict()
+        for card in cards:
+            self.by_block[card.type].append(card)
+            if card.type == 'd':
+                self.by_type.setdefault(data_key(card), []).append(card)
+        return
+
+    def block(self, b):
+        """
+        Return the list of cards in block `b`.
+        """
+        return self.by_block.get(b, [])
+
+    def data_types(self):
+        """
+        Return the types of the data cards present in the input, in order of
+        first appearance.
+        """
+        return list(self.by_type)
+
+    def data_cards(self, *types):
+        """
+        Return the list of data cards whose type is one of `types`, in input
+        order.
+        """
+        if len(types) == 1:
+            return list(self.by_type.get(types[0], []))
+        cards = [c for t in set(types) for c in self.by_type.get(t, [])]
+        cards.sort(key=lambda c: c.position)
+        return cards
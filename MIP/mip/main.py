@@ -1,8 +1,12 @@
 import re
+import mmap
+import string
+import locale
 from functools import wraps
 
 from .blocks import get_block_positions
-from .cards import get_cards
+from .cards import get_cards, get_card_spans, card_lines
+from .index import CardIndex, indexed_blocks
 
 from . import cellcard
 from . import surfacecard
@@ -33,12 +37,25 @@ class Card:
     The methods helps to get a content of a card (stripping out the comments)
     and split a card into logical parts.
     """
-    def __init__(self, lines=[], position=0, type=None):
+    __slots__ = ('lines', 'position', 'type', 'span', '_content', '_parts')
+
+    def __init__(self, lines=[], position=0, type=None, span=None):
         self.lines = lines
         self.position = position
         self.type = type
+        # Offsets of the card in the input text
+        self.span = span
+        # Cached results of content() and parts()
+        self._content = None
+        self._parts = None
         return
 
+    def first_line(self):
+        """
+        Return the first line of the card.
+        """
+        return self.lines[0]
+
     @card_debugger
     def content(self):
         """
@@ -46,12 +63,14 @@ class Card:
 
         From a list of lines representing a card with comments, extract only
         meaningfull part (i.e. remove all comments and extra-spaces). The result
-        is a one-line string.
+        is a one-line string. It is computed once and cached in the card.
 
         It is assumed that 1-st and last lines in the list are not comment lines
         (i.e.  that this text is obtained from
         cards.get_cards(skipcomments=True) generator.
         """
+        if self._content is not None:
+            return self._content
 
         # Remove in-line comments denoted by $ or &
         res = []
@@ -61,6 +80,7 @@ class Card:
         # Remove multiple spaces
         res = ' '.join(res)
         res = re_spaces.sub(' ', res)
+        self._content = res
         return res
 
     @card_debugger
@@ -78,7 +98,14 @@ class Card:
             parameters.
 
             A data card is splitted into its name, type and parameters.
+
+        The result is computed once and cached in the card.
         """
+        if self._parts is None:
+            self._parts = self._split()
+        return self._parts
+
+    def _split(self):
         if self.type == 'c':
             name, mat, geom, opts = cellcard.split(self.content())
             return name, mat, geom, opts
@@ -95,6 +122,69 @@ class Card:
             raise NotImplementedError
 
 
+class LazyCard(Card):
+    """
+    Card of a memory-mapped input file.
+
+    Only the position of the card in the input buffer is stored. The lines of
+    the card are decoded from the buffer when they are needed, and they are not
+    kept in memory (the content and the parts are, see Card).
+    """
+    __slots__ = ('buf', 'encoding', 'skipcomments')
+
+    def __init__(self, buf, encoding, skipcomments, position=0, type=None,
+                 span=None):
+        self.buf = buf
+        self.encoding = encoding
+        self.skipcomments = skipcomments
+        self.position = position
+        self.type = type
+        self.span = span
+        self._content = None
+        self._parts = None
+        return
+
+    @property
+    def lines(self):
+        text = self.buf[slice(*self.span)].decode(self.encoding)
+        return card_lines(text, skipcomments=self.skipcomments)
+
+    def first_line(self):
+        """
+        Return the first line of the card, decoding only this line.
+        """
+        start, end = self.span
+        eol = self.buf.find(b'\n', start, end)
+        if eol == -1:
+            eol = end
+        return self.buf[start:eol].decode(self.encoding).rstrip('\r')
+
+
+def map_file(fname, encoding):
+    """
+    Return a read-only memory map of file `fname`.
+
+    Block and card boundaries are searched for directly in the bytes of the
+    map, so the encoding of the file must be ASCII-compatible (e.g. utf-8 or
+    latin1).
+    """
+    try:
+        ascii_compatible = (string.printable.encode(encoding)
+                            == string.printable.encode('ascii'))
+    except UnicodeError:
+        ascii_compatible = False
+    if not ascii_compatible:
+        raise ValueError('Cannot memory-map an input file with encoding '
+                         '{!r}: the encoding is not ASCII-compatible'
+                         .format(encoding))
+    with open(fname, 'rb') as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            return b''
+
+
 class MIP:
     """
     Class to read general structure of an MCNP input file.
@@ -102,22 +192,93 @@ class MIP:
     When created a new instance, it reads the content of the specified input
     file.  Methods of the class help to access separate blocks and cards of the
     input file.
-    """
-    def __init__(self, fname, firstblock=None, encoding=None):
 
-        # Text from the input file
-        self.text = open(fname, 'r', encoding=encoding).read()
+    If `mapped` is True, the input file is memory-mapped instead of being read.
+    Blocks and cards are delimited on the raw bytes, and only the cards that
+    are actually requested are decoded (see LazyCard).
+    """
+    def __init__(self, fname, firstblock=None, encoding=None, mapped=False):
+
+        self.mapped = mapped
+        if mapped:
+            # Encoding used to decode the cards; same default as open()
+            if encoding is None:
+                encoding = locale.getpreferredencoding(False)
+            self.encoding = encoding
+            # Memory-mapped input file
+            self.buf = map_file(fname, encoding)
+            self._text = None
+        else:
+            self.encoding = encoding
+            # Text from the input file
+            self._text = open(fname, 'r', encoding=encoding).read()
+            self.buf = self._text
 
         # Dictioary of indices describing position of blocks
-        self.bi = get_block_positions(self.text, firstblock=firstblock)
+        self.bi = get_block_positions(self.buf, firstblock=firstblock)
+
+        # Index of the cards, built on first use
+        self._index = None
         return
 
+    def index(self):
+        """
+        Return the CardIndex of the cell, surface and data blocks.
+
+        The index is built on first call, by splitting the blocks into cards
+        only once.
+        """
+        if self._index is None:
+            self._index = CardIndex(self._scan_cards(indexed_blocks, True))
+        return self._index
+
+    def data_cards(self, *types):
+        """
+        Return the data cards of the given types (e.g. 'm', 'tr'), in input
+        order.
+        """
+        return self.index().data_cards(*types)
+
+    @property
+    def text(self):
+        """
+        Text from the input file.
+
+        For memory-mapped files, the whole file is decoded on each access.
+        """
+        if self._text is not None:
+            return self._text
+        return self.buf[:].decode(self.encoding)
+
+    def close(self):
+        """
+        Release the memory map of the input file, if any.
+        """
+        if self.mapped and isinstance(self.buf, mmap.mmap):
+            self._index = None
+            self.buf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _slice(self, ii):
+        """
+        Return the decoded text between the given indices.
+        """
+        if self.mapped:
+            return self.buf[slice(*ii)].decode(self.encoding)
+        return self.buf[slice(*ii)]
+
     def block(self, bid):
         """
         Return text of the specififed block.
         """
         ii, l = self.bi[bid]
-        return l, self.text[slice(*ii)]
+        return l, self._slice(ii)
 
     def blocks(self, blocks='mtcsd'):
         """
@@ -126,7 +287,7 @@ class MIP:
         for b in blocks:
             if b in self.bi:
                 ii, l = self.bi[b]
-                yield b, l, self.text[slice(*ii)]
+                yield b, l, self._slice(ii)
 
     def cards(self, blocks='csd', skipcomments=False):
         """
@@ -134,13 +295,42 @@ class MIP:
         user.
 
         The c-comment lines between cards can be skipped if `skipcomments` is
-        True.
+        True. In this case the cards of the cell, surface and data blocks are
+        served from the index.
+        """
+        if skipcomments and all(b in indexed_blocks for b in blocks):
+            index = self.index()
+            for b in blocks:
+                for c in index.block(b):
+                    yield c
+            return
+        for c in self._scan_cards(blocks, skipcomments):
+            yield c
+
+    def _scan_cards(self, blocks, skipcomments):
+        """
+        Split the specified blocks into instances of Card class.
         """
+        if self.mapped:
+            for b in blocks:
+                if b not in self.bi:
+                    continue
+                (i0, i1), n0 = self.bi[b]
+                for n, t, span in get_card_spans(self.buf, i0, i1,
+                                                 skipcomments=skipcomments):
+                    if t == 'card':
+                        t = b
+                    yield LazyCard(self.buf, self.encoding, skipcomments,
+                                   position=n0 + n, type=t, span=span)
+            return
         for b, n0, txt in self.blocks(blocks):
-            for c, n, t in get_cards(txt, skipcomments=skipcomments):
+            i0 = self.bi[b][0][0]
+            for c, n, t, (s, e) in get_cards(txt, skipcomments=skipcomments,
+                                             spans=True):
                 if t == 'card':
                     t = b
-                yield Card(lines=c, position=n0 + n, type=t)
+                yield Card(lines=c, position=n0 + n, type=t,
+                           span=(i0 + s, i0 + e))
 
 
 if __name__ == '__main__':
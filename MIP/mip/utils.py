@@ -1,5 +1,11 @@
 import re
 
+re_newlines = re.compile('[\r\n]+')
+re_newlines_bytes = re.compile(b'[\r\n]+')
+
+# Size of the chunks used to count characters in bytes-like objects
+chunk_size = 1 << 24
+
 
 def shorten(s, N=80):
     """
@@ -15,21 +21,42 @@ def shorten(s, N=80):
 def newlineindex(mlstring, start=0):
     """
     Return two indices, for the end of the 1-st line and start of the next one.
+
+    `mlstring` can be a string or a bytes-like object.
     """
-    r = re.compile('[\r\n]+')
+    r = re_newlines if isinstance(mlstring, str) else re_newlines_bytes
     m = r.search(mlstring, start)
     return m.start(), m.end()
 
 
+def count(txt, sub, start, end):
+    """
+    Return the number of occurrences of `sub` in txt[start:end].
+
+    Unlike str.count(), it also works on bytes-like objects without a count
+    method (e.g. mmap), by counting in chunks of bounded size. `sub` must be a
+    single character.
+    """
+    if hasattr(txt, 'count'):
+        return txt.count(sub, start, end)
+    n = 0
+    for i in range(start, end, chunk_size):
+        n += txt[i:min(i + chunk_size, end)].count(sub)
+    return n
+
+
 def nol(txt, start=None, end=None):
     """
     Return number of lines in the multi-line string txt.
+
+    `txt` can be a string or a bytes-like object.
     """
     if start is None:
         start = 0
     if end is None:
         end = len(txt)
-    if '\r' in txt:
-        return txt.count('\r', start, end) + 1
+    cr, lf = ('\r', '\n') if isinstance(txt, str) else (b'\r', b'\n')
+    if txt.find(cr) != -1:
+        return count(txt, cr, start, end) + 1
     else:
-        return txt.count('\n', start, end) + 1
+        return count(txt, lf, start, end) + 1
@@ -0,0 +1,109 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Benchmark the cell geometry parser backends of :mod:`MIP.geom.parsegeom`.
+
+Run from the repository root::
+
+    python benchmarks/bench_geom_parser.py [--repeat N] [--size N]
+
+The backends are timed on all the cells of the integration-test decks and on
+synthetic cells made of ``--size`` surfaces.
+'''
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+from MIP import mip
+from MIP.geom.cells import get_cells
+from MIP.geom.parsegeom import backends, get_ast
+
+
+DATA_DIR = (Path(__file__).parents[1] / 't4_geom_convert' / 'IntegrationTests'
+            / 'data')
+
+
+def deck_geometries():
+    '''Return the geometries of all the cells of the integration-test decks.'''
+    geoms = []
+    for path in sorted(DATA_DIR.glob('*.imcnp')):
+        encoding = 'latin1' if 'latin1' in path.name else 'utf-8'
+        cells = get_cells(mip.MIP(str(path), encoding=encoding))
+        geoms.extend(geom for _, geom, _ in cells.values())
+    return geoms
+
+
+def synthetic_geometries(size):
+    '''Return a few synthetic cells with `size` surfaces each.'''
+    surfs = [str(i if i % 2 else -i) for i in range(1, size + 1)]
+    groups = [' '.join(surfs[i:i + 10]) for i in range(0, size, 10)]
+    return {
+        'intersection': [' '.join(surfs)],
+        'union': [' : '.join(surfs)],
+        'union of intersections': [' : '.join(f'({group})'
+                                              for group in groups)],
+        'complements': [' '.join(f'#({group})' for group in groups)],
+    }
+
+
+def time_backend(backend, geoms, repeat):
+    '''Return the best time to parse all the geometries with the backend, or
+    the exception raised by the backend.'''
+    def run():
+        for geom in geoms:
+            get_ast(geom, backend)
+    try:
+        return min(timeit.repeat(run, number=1, repeat=repeat))
+    except Exception as err:  # pylint: disable=broad-except
+        return err
+
+
+def report(name, geoms, repeat):
+    '''Time all backends on the geometries and print the results.'''
+    times = {backend: time_backend(backend, geoms, repeat)
+             for backend in backends}
+    cols = []
+    for backend, time in times.items():
+        if isinstance(time, BaseException):
+            cols.append(f'{backend}: failed ({type(time).__name__})')
+        else:
+            cols.append(f'{backend}: {time * 1e3:10.2f} ms')
+    if all(isinstance(time, float) for time in times.values()):
+        cols.append(f'speedup: {times["tatsu"] / times["nary"]:6.1f}x')
+    print(f'{name:<30}', '   '.join(cols))
+
+
+def main(argv):
+    '''Run the benchmark.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of repetitions (the best time is kept)')
+    parser.add_argument('--size', type=int, default=10000,
+                        help='number of surfaces in the synthetic cells')
+    args = parser.parse_args(argv)
+
+    geoms = deck_geometries()
+    report(f'decks ({len(geoms)} cells)', geoms, args.repeat)
+    for name, geoms in synthetic_geometries(args.size).items():
+        report(name, geoms, args.repeat)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
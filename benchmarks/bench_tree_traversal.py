@@ -0,0 +1,192 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Benchmark the explicit-stack traversals of :class:`~.GeomTree`.
+
+Run from the repository root::
+
+    python benchmarks/bench_tree_traversal.py [--repeat N] [--depth N]
+
+Each traversal mode of :class:`~.GeomTree` (pre-order, post-order, fold and
+rebuild) is timed against the equivalent recursive function, on a chain of
+binary intersections ``--depth`` levels deep (the shape produced by the
+left-recursive grammar) and on a flat n-ary intersection of the same size.
+The recursive functions run in a thread with a large stack and a raised
+recursion limit, which is what the converter would have to do without the
+explicit-stack traversals. Times are reported per node.
+'''
+
+import argparse
+import sys
+import threading
+import timeit
+
+from t4_geom_convert.Kernel.Volume.GeomTree import GeomTree, LEAF
+
+
+def deep_tree(depth):
+    '''Return a chain of `depth` binary intersections.'''
+    ast = 1
+    for surf in range(2, depth + 2):
+        ast = ('*', ast, surf)
+    return GeomTree.from_ast(ast)
+
+
+def flat_tree(depth):
+    '''Return an intersection of `depth` + 1 surfaces.'''
+    return GeomTree.from_ast(('*',) + tuple(range(1, depth + 2)))
+
+
+def rec_preorder(tree, node, visit):
+    '''Recursive pre-order traversal.'''
+    visit(node)
+    if tree.opcodes[node] != LEAF:
+        for arg in tree.args(node):
+            rec_preorder(tree, arg, visit)
+
+
+def rec_postorder(tree, node, visit):
+    '''Recursive post-order traversal.'''
+    if tree.opcodes[node] != LEAF:
+        for arg in tree.args(node):
+            rec_postorder(tree, arg, visit)
+    visit(node)
+
+
+def rec_fold(tree, node):
+    '''Recursive sum of the leaves.'''
+    if tree.opcodes[node] == LEAF:
+        return tree.leaves[node]
+    return sum(rec_fold(tree, arg) for arg in tree.args(node))
+
+
+def rec_rebuild(tree, node, new_tree):
+    '''Recursive copy of `tree` with negated leaves.'''
+    if tree.opcodes[node] == LEAF:
+        return new_tree.add_leaf(-tree.leaves[node])
+    args = [rec_rebuild(tree, arg, new_tree) for arg in tree.args(node)]
+    return new_tree.add_node(tree.opcodes[node], args, tree.keys[node])
+
+
+def stack_preorder(tree, visit):
+    '''Explicit-stack pre-order traversal.'''
+    for node in tree.preorder():
+        visit(node)
+
+
+def stack_postorder(tree, visit):
+    '''Explicit-stack post-order traversal.'''
+    for node in tree.postorder(tree.root):
+        visit(node)
+
+
+def stack_fold(tree):
+    '''Explicit-stack sum of the leaves.'''
+    opcodes = tree.opcodes
+    leaves = tree.leaves
+
+    def expand(node):
+        return None, tree.args(node)
+
+    def combine(node, _context, values):
+        if opcodes[node] == LEAF:
+            return leaves[node]
+        return sum(values)
+
+    return tree.fold(expand, combine)
+
+
+def stack_rebuild(tree):
+    '''Explicit-stack copy of `tree` with negated leaves.'''
+    return tree.rebuild(lambda new_tree, leaf: new_tree.add_leaf(-leaf))
+
+
+def modes(tree):
+    '''Return the pairs of (recursive, explicit-stack) functions to time.'''
+    def visit(_node):
+        pass
+    return {
+        'pre-order': (lambda: rec_preorder(tree, tree.root, visit),
+                      lambda: stack_preorder(tree, visit)),
+        'post-order': (lambda: rec_postorder(tree, tree.root, visit),
+                       lambda: stack_postorder(tree, visit)),
+        'fold': (lambda: rec_fold(tree, tree.root),
+                 lambda: stack_fold(tree)),
+        'rebuild': (lambda: rec_rebuild(tree, tree.root, GeomTree()),
+                    lambda: stack_rebuild(tree)),
+    }
+
+
+def run_with_deep_stack(func):
+    '''Run `func` in a thread with a large stack and a raised recursion limit,
+    and return its result or the exception that it raised.'''
+    result = []
+
+    def target():
+        try:
+            result.append(func())
+        except Exception as err:  # pylint: disable=broad-except
+            result.append(err)
+
+    old_limit = sys.getrecursionlimit()
+    old_size = threading.stack_size(1 << 30)
+    sys.setrecursionlimit(max(old_limit, 1_000_000))
+    try:
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(old_size)
+        sys.setrecursionlimit(old_limit)
+    return result[0]
+
+
+def report(name, tree, repeat):
+    '''Time all modes on the tree and print the results.'''
+    print(f'{name} ({len(tree)} nodes)')
+    for mode, (recursive, explicit) in modes(tree).items():
+        rec_time = run_with_deep_stack(
+            lambda func=recursive: min(timeit.repeat(func, number=1,
+                                                     repeat=repeat)))
+        stack_time = min(timeit.repeat(explicit, number=1, repeat=repeat))
+        cols = [f'explicit stack: {stack_time / len(tree) * 1e9:8.1f} ns/node']
+        if isinstance(rec_time, BaseException):
+            cols.append(f'recursive: failed ({type(rec_time).__name__})')
+        else:
+            cols.append(f'recursive: {rec_time / len(tree) * 1e9:8.1f} '
+                        'ns/node')
+            cols.append(f'ratio: {stack_time / rec_time:5.2f}')
+        print(f'  {mode:<12}', '   '.join(cols))
+
+
+def main(argv):
+    '''Run the benchmark.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of repetitions (the best time is kept)')
+    parser.add_argument('--depth', type=int, default=100000,
+                        help='depth of the deep tree')
+    args = parser.parse_args(argv)
+
+    report(f'deep tree (depth {args.depth})', deep_tree(args.depth),
+           args.repeat)
+    report('flat tree', flat_tree(args.depth), args.repeat)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -76,6 +76,34 @@ def test_convert(mcnp_i, tmp_path):
     do_conversion(mcnp_i, tmp_path, conv_opts)
 
 
+def t4_body(t4_o):
+    '''Return the contents of a TRIPOLI-4 file, without the header.'''
+    return t4_o.read_text().split('\n', 3)[3]
+
+
+@foreach_data(mcnp_i=lambda path: str(path).endswith('.imcnp'))
+def test_convert_mmap(mcnp_i, tmp_path):
+    '''Test that memory-mapping the input file does not change the result of
+    the conversion.'''
+    conv_opts, _, _, _ = get_options(mcnp_i)
+    t4_o = do_conversion(mcnp_i, tmp_path, conv_opts)
+    mmap_path = tmp_path / 'mmap'
+    mmap_path.mkdir()
+    t4_mmap = do_conversion(mcnp_i, mmap_path, conv_opts + ['--mmap'])
+    assert t4_body(t4_mmap) == t4_body(t4_o)
+
+
+@pytest.mark.parametrize('opts', [[], ['--mmap']], ids=['read', 'mmap'])
+def test_wrong_encoding(tmp_path, opts):
+    '''Test that an input file that cannot be decoded yields an error
+    suggesting the ``-e`` option, even if the cards are decoded lazily.'''
+    mcnp_i = tmp_path / 'latin1.imcnp'
+    mcnp_i.write_bytes('title\n1 0 -1 imp:n=1 $ caf\xe9\n2 0 1 imp:n=0\n\n'
+                       '1 SO 10\n\n'.encode('latin1'))
+    with pytest.raises(UnicodeError, match='-e'):
+        do_conversion(mcnp_i, tmp_path, ['-e', 'utf-8'] + opts)
+
+
 def do_test_oracle(mcnp_i, tmp_path, mcnp, oracle, oracle_zero_tolerance):
     '''Actually perform a conversion test, followed by an oracle test.'''
     conv_opts, oracle_opts, tolerance, fail_if_outside = get_options(mcnp_i)
@@ -129,6 +157,87 @@ def test_density_zeros(datadir, tmp_path):
     assert 'm2_-1.0 ' in t4_text, t4_text
 
 
+def test_repeated_subtrees(datadir, tmp_path):
+    '''Test that the conversion of :file:`repeated_subtrees.imcnp` emits only
+    one volume for the union that appears in all the cells.'''
+    mcnp_i = datadir / 'repeated_subtrees.imcnp'
+    conv_opts, _, _, _ = get_options(mcnp_i)
+    t4_o = do_conversion(mcnp_i, tmp_path, conv_opts)
+    t4_text = t4_o.read_text()
+    unions = [line for line in t4_text.splitlines()
+              if line.startswith('VOLU') and 'UNION' in line]
+    assert len(unions) == 1, t4_text
+
+
+@pytest.mark.parametrize('deck', ['replace.imcnp', 'zero_isotopes.imcnp'])
+def test_simplification(datadir, tmp_path, deck):
+    '''Test that the simplification absorbs the ``(6 : -4) (3 : -6)``
+    operands of cell 2001, so that the cell is converted to a single EQUA
+    volume and only one volume is emitted per cell.'''
+    mcnp_i = datadir / deck
+    conv_opts, _, _, _ = get_options(mcnp_i)
+    t4_o = do_conversion(mcnp_i, tmp_path, conv_opts)
+    t4_text = t4_o.read_text()
+    volumes = [line for line in t4_text.splitlines()
+               if line.startswith('VOLU')]
+    assert len(volumes) == 4, t4_text
+    assert 'VOLU 2001 EQUA PLUS 1 3 MINUS 2 1 4 ENDV' in volumes, t4_text
+
+
+def test_repeated_complements(datadir, tmp_path, capsys):
+    '''Test that the conversion of :file:`repeated_complements.imcnp` builds
+    the complement of each cell only once.'''
+    mcnp_i = datadir / 'repeated_complements.imcnp'
+    conv_opts, _, _, _ = get_options(mcnp_i)
+    do_conversion(mcnp_i, tmp_path, conv_opts)
+    out = capsys.readouterr().out
+    assert 'built 3 cell complements, reused 3 times' in out, out
+
+
+def test_nested_fill(datadir, tmp_path, capsys):
+    '''Test that the conversion of :file:`nested_fill.imcnp` expands the
+    assembly universe only once, although it fills two cells.'''
+    mcnp_i = datadir / 'nested_fill.imcnp'
+    conv_opts, _, _, _ = get_options(mcnp_i)
+    do_conversion(mcnp_i, tmp_path, conv_opts)
+    out = capsys.readouterr().out
+    assert 'expanded 3 universe instances, reused 1 times' in out, out
+
+
+def test_nested_fill_volumes(datadir, tmp_path):
+    '''Test that sharing the expanded universes does not prevent inlining:
+    the conversion of :file:`nested_fill.imcnp` emits no more volumes than
+    expanding the universes separately for each fill site.'''
+    mcnp_i = datadir / 'nested_fill.imcnp'
+    conv_opts, _, _, _ = get_options(mcnp_i)
+    t4_o = do_conversion(mcnp_i, tmp_path, conv_opts)
+    t4_text = t4_o.read_text()
+    volumes = [line for line in t4_text.splitlines()
+               if line.startswith('VOLU')]
+    assert len(volumes) <= 11, t4_text
+
+
+def test_lattice_pruning(datadir, tmp_path, capsys):
+    '''Test that the conversion of :file:`lattice_hex.imcnp` skips the lattice
+    elements that lie outside the filled cylinder.'''
+    mcnp_i = datadir / 'lattice_hex.imcnp'
+    conv_opts, _, _, _ = get_options(mcnp_i)
+    do_conversion(mcnp_i, tmp_path, conv_opts)
+    out = capsys.readouterr().out
+    assert 'skipped 12 lattice elements' in out, out
+
+
+def test_lattice_inference(datadir, tmp_path, capsys):
+    '''Test that the conversion of :file:`lattice_inferred.imcnp` infers the
+    bounds of the lattice, which has no ``--lattice`` option.'''
+    mcnp_i = datadir / 'lattice_inferred.imcnp'
+    do_conversion(mcnp_i, tmp_path, [])
+    out = capsys.readouterr().out
+    assert '--lattice 1,-2:2,-5:5' in out, out
+    # only the elements in the [-1, 1]x[-4, 4] range intersect the sphere
+    assert 'skipped 28 lattice elements' in out, out
+
+
 def test_parse_outside_points(datadir):
     '''Test that :func:`~.parse_outside_points` correctly returns the number of
     points outside the geometry.'''
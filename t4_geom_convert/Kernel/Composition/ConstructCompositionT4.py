@@ -21,7 +21,7 @@ from warnings import warn
 from collections import OrderedDict
 from math import fsum
 
-from ..Utils import normalize_float
+from ..Utils import normalize_float, parse_floats
 from .CCompositionT4 import CCompositionT4
 from .CompositionConversionMCNPToT4 import compositionConversionMCNPToT4
 
@@ -35,7 +35,7 @@ def constructCompositionT4(mcnp_parser, dic_cell_mcnp):
         densities = set()
         for cell_id, cell in dic_cell_mcnp.items():
             if (cell.importance <= 0. or cell.universe != 0
-                    or cell.fillid is not None):
+                    or cell.fillid is not None or cell.fictive):
                 continue
             if int(cell.materialID) != key:
                 continue
@@ -93,11 +93,7 @@ def rescale_fractions(fractions, concentration):
     :returns: a list of ``(isotope, concentration)`` pairs, as strings
     :rtype: list((str, str))
     '''
-    concs = []
-    total_fractions = fsum(float(normalize_float(frac))
-                           for _, frac in fractions)
-    for isotope, frac in fractions:
-        conc = float(normalize_float(frac)) * concentration / total_fractions
-        conc_str = f'{conc:.15e}'
-        concs.append((isotope, conc_str))
-    return concs
+    values = parse_floats([frac for _, frac in fractions])
+    concs = values * concentration / fsum(values)
+    return [(isotope, f'{conc:.15e}')
+            for (isotope, _), conc in zip(fractions, concs)]
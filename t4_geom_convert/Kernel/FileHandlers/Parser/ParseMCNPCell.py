@@ -17,18 +17,22 @@
 #
 # vim: set fileencoding=utf-8 :
 
+import os
 import re
-import pickle
 from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 import tatsu.exceptions
 
 from MIP.geom.cells import get_cells, get_cell_importances
-from MIP.geom.parsegeom import get_ast
+from MIP.geom.parsegeom import get_ast, ast_cache
+from MIP.geom.naryparser import GeomParseError
 from MIP.geom.transforms import to_cos
 from MIP.mip.datacard import expand_data_card
 from ...Progress import Progress
 from ...Volume.CellMCNP import CellMCNP
+from ...Volume.GeomTree import GeomTree
 from ...Volume.Lattice import parse_ranges, LatticeSpec
 from ...Transformation.Transformation import (get_mcnp_transforms,
                                               normalize_transform)
@@ -39,25 +43,30 @@ class ParseMCNPCellError(Exception):
     '''An exception class for errors in MCNP cell parsing.'''
 
 
-class MissingLatticeOptError(Exception):
-    '''An exception class to raise when the ``--lattice`` option is missing.'''
-
-
 class ParseMCNPCell:
     '''Class that parses the CELLS block.'''
 
     LIKE_RE = re.compile(r'like\s+(\d+)\s+but')
 
-    def __init__(self, mcnp_parser, cell_cache_path, lattice_params):
+    def __init__(self, mcnp_parser, store, lattice_params,
+                 geom_parser='tatsu', jobs=1):
         '''
         Constructor
         :param: f_inputMCNP : input file of MCNP
+        :param store: if not `None`, a :class:`~.ParseStore` where the parsed
+            cells are looked up and saved
+        :param str geom_parser: the backend used to parse cell geometries
+            (see :data:`MIP.geom.parsegeom.backends`)
+        :param int jobs: the number of worker processes used to parse the
+            cells; 0 means one per CPU
         '''
         self.mcnp_parser = mcnp_parser
-        self.cell_cache_path = cell_cache_path
+        self.store = store
         self.lattice_params = lattice_params.copy()
+        self.geom_parser = geom_parser
+        self.jobs = jobs if jobs > 0 else os.cpu_count()
         self.importances = self.parse_importance_cards()
-        self.transforms = get_mcnp_transforms(self.mcnp_parser)
+        self.transforms = get_mcnp_transforms(self.mcnp_parser, store)
         for transform in self.transforms.values():
             if len(transform) == 13 and int(transform[-1]) != 1:
                 raise NotImplementedError('affine transformations with m!=1 '
@@ -67,14 +76,15 @@ class ParseMCNPCell:
         '''Parse any importance cards and return the maximum importance value
         for each cell.
 
-        :returns: the maximum importances.
-        :rtype: list(float)
+        :returns: the maximum importances; `None` for the cells that are
+            skipped (J) in all the importance cards.
+        :rtype: list(float or None)
         '''
         importance_cards = get_cell_importances(self.mcnp_parser)
         if not importance_cards:
             return []
         # here all the lists, dicts, etc. have at least one element
-        importances = [expand_data_card(card)[0]
+        importances = [expand_data_card(card, array=True)[0]
                        for card in importance_cards.values()]
         lens = [len(importance) for importance in importances]
         if any(len_ != lens[0] for len_ in lens):
@@ -83,10 +93,20 @@ class ParseMCNPCell:
             msg = ('All the importance cards (`IMP:*\') must have the same '
                    f'number of elements.\n{diagn}')
             raise ParseMCNPCellError(msg)
-        if len(lens) == 1:
-            return importances[0]
-        max_importances = [max(*values) for values in zip(*importances)]
-        return max_importances
+        # J entries are NaN; skip them and take the values from the other
+        # cards
+        max_importances = np.fmax.reduce(importances, axis=0)
+        return [None if np.isnan(importance) else importance
+                for importance in max_importances.tolist()]
+
+    def __getstate__(self):
+        '''Leave out the MCNP parser and the parse store when pickling (e.g.
+        to send the object to worker processes); the parser may hold an open
+        memory map, and neither is needed to parse a single cell.'''
+        state = self.__dict__.copy()
+        state['mcnp_parser'] = None
+        state['store'] = None
+        return state
 
     def parse(self):
         '''
@@ -95,62 +115,173 @@ class ParseMCNPCell:
         :return: dictionary which contains the ID of the cells as a key
         and as a value, a object from the :class:`~.CellMCNP` class.
         '''
-        if self.cell_cache_path is None:
-            dict_cell, skipped_cells = self.parse_all_cells()
-        else:
-            try:
-                with self.cell_cache_path.open('rb') as dicfile:
-                    abspath = self.cell_cache_path.resolve()
-                    print(f'reading MCNP cells from file {abspath}...', end='')
-                    dict_cell, skipped_cells = pickle.load(dicfile)
-                    print(' done')
-            except IOError:
-                dict_cell, skipped_cells = self.parse_all_cells()
-                with self.cell_cache_path.open('wb') as dicfile:
-                    abspath = self.cell_cache_path.resolve()
-                    print(f'writing MCNP cells to file {abspath}...', end='')
-                    pickle.dump((dict_cell, skipped_cells), dicfile)
-                    print(' done')
-        return dict_cell, skipped_cells
+        return self.parse_all_cells()
 
     def parse_all_cells(self):
         '''Actually parse the cells.'''
         dict_cell = OrderedDict()
         skipped_cells = []
-        parsed_cells = get_cells(self.mcnp_parser, lim=None)
+        parsed_cells = self.resolve_likes(get_cells(self.mcnp_parser,
+                                                    lim=None))
+        if self.jobs > 1 and len(parsed_cells) > 1:
+            cells = self.parse_cells_parallel(parsed_cells)
+        else:
+            cells = self.parse_cells_serial(parsed_cells)
         with Progress('parsing MCNP cell',
                       len(parsed_cells), max(parsed_cells)) as progress:
-            for rank, (key, parsed_cell) in enumerate(parsed_cells.items()):
+            for rank, (key, cell) in enumerate(cells):
                 progress.update(rank, key)
-                lat_opt = self.lattice_params.get(key, None)
-                try:
-                    cell = self.parse_one_cell(parsed_cells, rank, lat_opt,
-                                               parsed_cell)
-                except ParseMCNPCellError as err:
-                    msg = f'{err} (in cell {key})'
-                    raise ParseMCNPCellError(msg) from None
-                except MissingLatticeOptError as err:
-                    msg = f'{err} for cell {key}'
-                    raise MissingLatticeOptError(msg) from None
-                except tatsu.exceptions.ParseException as err:
-                    msg = (f'TatSu parsing failed for cell {key}. Check the '
-                           'syntax of this cell.'.format(key))
-                    raise ParseMCNPCellError(msg) from err
                 if cell.importance == 0:
                     skipped_cells.append(key)
                 dict_cell[key] = cell
         return dict_cell, skipped_cells
 
-    def parse_one_cell(self, parsed_cells, rank, lat_opt, parsed_cell):
-        '''Handle the ``LIKE n BUT`` syntax, delegate the real parsing to
-        :meth:`parse_one_cell_worker`.'''
-        match_like = self.LIKE_RE.search(parsed_cell[1].lower())
-        while match_like:
-            like_id = int(float(match_like.group(1)))
-            like_cell = parsed_cells[like_id]
-            parsed_cell = self.apply_but(like_cell, parsed_cell[2])
-            match_like = self.LIKE_RE.search(parsed_cell[1].lower())
-        return self.parse_one_cell_worker(rank, lat_opt, parsed_cell)
+    def parse_cells_serial(self, parsed_cells):
+        '''Parse the cells one by one, yield ``(key, cell)`` pairs.'''
+        for rank, (key, parsed_cell) in enumerate(parsed_cells.items()):
+            store_key = self.store_key(rank, key, parsed_cell)
+            cell = self.stored_cell(store_key)
+            if cell is None:
+                cell = self.parse_cell(rank, key, parsed_cell)
+                self.store_cell(store_key, cell)
+            yield key, cell
+
+    def parse_cells_parallel(self, parsed_cells):
+        '''Parse the cells in a pool of :attr:`jobs` worker processes, yield
+        ``(key, cell)`` pairs in the original order.
+
+        The cells found in the parse store are not sent to the workers. Errors
+        are raised at the position of the failing cell, with the same messages
+        as :meth:`parse_cells_serial`.
+        '''
+        entries = []
+        tasks = []
+        for rank, (key, parsed_cell) in enumerate(parsed_cells.items()):
+            store_key = self.store_key(rank, key, parsed_cell)
+            cell = self.stored_cell(store_key)
+            entries.append((key, cell, store_key))
+            if cell is None:
+                tasks.append((rank, key, parsed_cell))
+
+        chunk_size = max(1, min(256, len(tasks) // (4 * self.jobs)))
+        chunks = [tasks[i:i + chunk_size]
+                  for i in range(0, len(tasks), chunk_size)]
+
+        def parsed(executor):
+            for results, hits, misses in executor.map(_parse_chunk, chunks):
+                ast_cache.hits += hits
+                ast_cache.misses += misses
+                for _, cell in results:
+                    if isinstance(cell, Exception):
+                        raise cell
+                    yield cell
+
+        with ProcessPoolExecutor(self.jobs, initializer=_init_worker,
+                                 initargs=(self,)) as executor:
+            parsed_iter = parsed(executor)
+            for key, cell, store_key in entries:
+                if cell is None:
+                    cell = next(parsed_iter)
+                    self.store_cell(store_key, cell)
+                yield key, cell
+
+    def store_key(self, rank, key, parsed_cell):
+        '''Return the parse-store key of a cell (with ``LIKE n BUT`` already
+        resolved), or `None` if there is no store.
+
+        The key covers the content of the cell and everything its parse
+        result depends on: the geometry parser, the importance from the data
+        block, the ``--lattice`` option and, for cells that may refer to TR
+        cards, the transformations.
+        '''
+        if self.store is None:
+            return None
+        importance = (self.importances[rank] if rank < len(self.importances)
+                      else None)
+        options = parsed_cell[2].lower()
+        if 'trcl' in options or 'fill' in options:
+            transforms = self.transforms
+        else:
+            transforms = None
+        return self.store.key('cell', key, self.geom_parser, *parsed_cell,
+                              importance, self.lattice_params.get(key, None),
+                              transforms)
+
+    def stored_cell(self, store_key):
+        '''Return the stored cell for the given key, or `None`.'''
+        if store_key is None:
+            return None
+        return self.store.get(store_key)
+
+    def store_cell(self, store_key, cell):
+        '''Save a parsed cell in the store, if any.'''
+        if store_key is not None:
+            self.store.put(store_key, cell)
+
+    def parse_cell(self, rank, key, parsed_cell):
+        '''Parse one cell (with ``LIKE n BUT`` already resolved), adding
+        the cell ID to the error messages.'''
+        lat_opt = self.lattice_params.get(key, None)
+        try:
+            return self.parse_one_cell_worker(rank, lat_opt, parsed_cell)
+        except ParseMCNPCellError as err:
+            msg = f'{err} (in cell {key})'
+            raise ParseMCNPCellError(msg) from None
+        except tatsu.exceptions.ParseException as err:
+            msg = (f'TatSu parsing failed for cell {key}. Check the '
+                   'syntax of this cell.'.format(key))
+            raise ParseMCNPCellError(msg) from err
+        except GeomParseError as err:
+            msg = (f'Parsing failed for cell {key}: {err}. Check the '
+                   'syntax of this cell.')
+            raise ParseMCNPCellError(msg) from err
+
+    def resolve_likes(self, parsed_cells):
+        '''Resolve all the ``LIKE n BUT`` references.
+
+        The references form a graph, which is resolved in topological order:
+        each cell is resolved exactly once, after the cell it refers to, by
+        appending its ``BUT`` options to the options of the resolved target.
+
+        :param parsed_cells: the ``(material, geometry, options)`` triples
+            for all the cells, as returned by
+            :func:`MIP.geom.cells.get_cells`
+        :returns: the same dictionary, where the ``LIKE n BUT`` cells have
+            been replaced by the resolved triples
+        :raises ParseMCNPCellError: if a cell refers to a missing cell or if
+            the references contain a cycle
+        '''
+        resolved = {}
+        for key in parsed_cells:
+            # follow the references until a resolved or a plain cell
+            chain = []
+            on_chain = set()
+            cur = key
+            while cur not in resolved:
+                parsed_cell = parsed_cells[cur]
+                match_like = self.LIKE_RE.search(parsed_cell[1].lower())
+                if match_like is None:
+                    resolved[cur] = parsed_cell
+                    break
+                like_id = int(float(match_like.group(1)))
+                chain.append((cur, like_id))
+                on_chain.add(cur)
+                if like_id in on_chain:
+                    cycle = [cell for cell, _ in chain]
+                    cycle = cycle[cycle.index(like_id):] + [like_id]
+                    msg = ('circular LIKE n BUT references: '
+                           + ' -> '.join(map(str, cycle)))
+                    raise ParseMCNPCellError(msg)
+                if like_id not in parsed_cells:
+                    msg = (f'LIKE {like_id} BUT refers to a missing cell (in '
+                           f'cell {cur})')
+                    raise ParseMCNPCellError(msg)
+                cur = like_id
+            # unwind the chain, targets first
+            for cur, like_id in reversed(chain):
+                resolved[cur] = self.apply_but(resolved[like_id],
+                                               parsed_cells[cur][2])
+        return OrderedDict((key, resolved[key]) for key in parsed_cells)
 
     def parse_one_cell_worker(self, rank, lat_opt, parsed_cell):
         '''Parse one cell, return new :class:`~.CellMCNP` object.'''
@@ -158,7 +289,7 @@ class ParseMCNPCell:
 
         material_id, density = self.parse_material(material)
 
-        ast_mcnp = get_ast(geometry)
+        ast_mcnp = GeomTree.from_ast(get_ast(geometry, self.geom_parser))
 
         option = re.sub(' *: *', ':', option)
         option = (option.lower().replace('(', ' ').replace(')', ' ')
@@ -214,8 +345,9 @@ class ParseMCNPCell:
             f_univs_arg = kws['f_univs']
             if isinstance(f_univs_arg, int):
                 if lat_opt is None:
-                    msg = 'no --lattice option provided'
-                    raise MissingLatticeOptError(msg) from None
+                    # the bounds will be inferred from the filled cells (see
+                    # CellConversion.develop_lattice)
+                    return LatticeSpec(None, [f_univs_arg])
                 kws['f_bounds'] = lat_opt
                 kws['f_univs'] = [f_univs_arg] * lat_opt.size()
             return LatticeSpec(kws['f_bounds'], kws['f_univs'])
@@ -339,3 +471,34 @@ class ParseMCNPCell:
             trcl_params = [float(x) for x in trcl_params]
             trcl_params[3:] = list(map(to_cos, trcl_params[3:12]))
         return tuple(trcl_params)
+
+
+# The :class:`ParseMCNPCell` object used by the worker processes of
+# :meth:`ParseMCNPCell.parse_cells_parallel`.
+_WORKER_PARSER = None
+
+
+def _init_worker(parser):
+    '''Initialize a worker process of the cell-parsing pool.'''
+    global _WORKER_PARSER  # pylint: disable=global-statement
+    _WORKER_PARSER = parser
+
+
+def _parse_chunk(chunk):
+    '''Parse a chunk of ``(rank, key, parsed_cell)`` tasks in a worker
+    process.
+
+    :returns: the list of ``(key, cell)`` pairs, stopping at the first cell
+        that fails (whose exception takes the place of the cell), and the
+        number of AST cache hits and misses.
+    '''
+    hits, misses = ast_cache.hits, ast_cache.misses
+    results = []
+    for rank, key, parsed_cell in chunk:
+        try:
+            cell = _WORKER_PARSER.parse_cell(rank, key, parsed_cell)
+        except Exception as err:  # pylint: disable=broad-except
+            results.append((key, err))
+            break
+        results.append((key, cell))
+    return results, ast_cache.hits - hits, ast_cache.misses - misses
@@ -30,22 +30,28 @@ from ...VectUtils import planeParamsFromPoints
 from ...Surface import MacroBodies as MB
 
 
-def parseMCNPSurface(mcnp_parser):
+def parseMCNPSurface(mcnp_parser, store=None):
     '''Function that recovers the information of each line of the block
     SURFACE.
 
+    :param store: if not `None`, a :class:`~.ParseStore` where the parsed
+        surfaces are looked up and saved
     :return: dictionary with keys given by the ID of the surfaces, as a
         ``MIP`` Surface, and value given by lists of `(:class:`~.SurfaceMCNP`,
         int)` pairs. The integer represents the side of the subsurface.
     '''
     surface_parsed = get_surfaces(mcnp_parser, lim=None)
-    transform_parsed = get_mcnp_transforms(mcnp_parser)
+    transform_parsed = get_mcnp_transforms(mcnp_parser, store)
     dict_surface = CollectionDict()
     with Progress('parsing MCNP surface',
                   len(surface_parsed), max(surface_parsed)) as progress:
         for i, (key, surface) in enumerate(surface_parsed.items()):
             progress.update(i, key)
-            mcnp_surfs = to_surfaces_mcnp(key, surface, transform_parsed)
+            if store is None:
+                mcnp_surfs = to_surfaces_mcnp(key, surface, transform_parsed)
+            else:
+                mcnp_surfs = to_surfaces_mcnp_stored(key, surface,
+                                                     transform_parsed, store)
             dict_surface[key] = mcnp_surfs
 
     return dict_surface
@@ -121,6 +127,19 @@ def to_surfaces_macro(key, bound_cond,  # pylint: disable=too-many-arguments
     return mcnp_surfs
 
 
+def to_surfaces_mcnp_stored(key, parsed_surface, transform_parsed, store):
+    '''Like :func:`to_surfaces_mcnp`, but reuse the result in the store if
+    neither the surface card nor its transformation have changed.'''
+    transform_id = parsed_surface[1]
+    transform = transform_parsed[int(transform_id)] if transform_id else None
+    store_key = store.key('surface', key, parsed_surface, transform)
+    mcnp_surfs = store.get(store_key)
+    if mcnp_surfs is None:
+        mcnp_surfs = to_surfaces_mcnp(key, parsed_surface, transform_parsed)
+        store.put(store_key, mcnp_surfs)
+    return mcnp_surfs
+
+
 def to_surfaces_mcnp(key, parsed_surface, transform_parsed):
     '''Convert the parsed surface into a collection of
     :class:`~.SurfaceMCNP`.
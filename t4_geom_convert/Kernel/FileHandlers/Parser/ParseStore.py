@@ -0,0 +1,133 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''An on-disk store of per-card parse results, for incremental parsing.
+
+Each parse result (a :class:`~.CellMCNP`, the list of
+:class:`~.SurfaceMCNP` objects for a surface card, the parameters of a
+transformation) is stored under a key computed by hashing the normalized
+content of the card together with everything else that the result depends
+on: the TR cards it refers to, the target of ``LIKE n BUT`` references, the
+relevant command-line options, and so on. When the converter is run again on
+a modified input file, only the cards whose key has changed are parsed again.
+'''
+
+import hashlib
+import os
+import pickle
+
+from .... import __version__
+
+
+class ParseStore:
+    '''A store of parse results, keyed by content hash and backed by a file.
+
+    The stored objects are pickled when they are :meth:`put` in the store
+    and unpickled on every :meth:`get`, so the objects returned by the store
+    can be freely modified by the caller.
+
+    >>> store = ParseStore(None)
+    >>> key = ParseStore.key('surface', 1, 'so', [2.0])
+    >>> store.get(key) is None
+    True
+    >>> store.put(key, ['result'])
+    >>> store.get(key)
+    ['result']
+    >>> store.hits, store.misses
+    (1, 1)
+    '''
+
+    #: bump this number whenever the layout of the stored results changes
+    FORMAT = 3
+
+    def __init__(self, path):
+        '''Open the store backed by the file at `path` (a
+        :class:`pathlib.Path`). A missing, unreadable or outdated file is
+        treated as an empty store. If `path` is `None`, the store lives in
+        memory only.'''
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._old = {}
+        self._new = {}
+        if path is None:
+            return
+        try:
+            with path.open('rb') as store_file:
+                header, entries = pickle.load(store_file)
+        except Exception:  # pylint: disable=broad-except
+            return
+        if header == self.header():
+            self._old = entries
+
+    @classmethod
+    def header(cls):
+        '''Identify the format of the store and the version of the code that
+        produced the results.'''
+        return ('t4_geom_convert parse store', cls.FORMAT, __version__)
+
+    @staticmethod
+    def key(*parts):
+        '''Compute the key for a parse result that depends on `parts`.
+
+        The parts must have a deterministic :func:`repr`. Strings are
+        normalized by collapsing runs of whitespace, so that changes in the
+        layout of a card do not invalidate its result.
+
+        >>> (ParseStore.key('cell', 1, '0  -1\\n    2')
+        ...  == ParseStore.key('cell', 1, '0 -1 2'))
+        True
+        '''
+        norm = tuple(' '.join(part.split()) if isinstance(part, str) else part
+                     for part in parts)
+        return hashlib.sha256(repr(norm).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        '''Return a copy of the result stored under `key`, or `None`.'''
+        data = self._new.get(key)
+        if data is None:
+            data = self._old.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._new[key] = data
+        self.hits += 1
+        return pickle.loads(data)
+
+    def put(self, key, value):
+        '''Store a copy of `value` under `key`.'''
+        self._new[key] = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def save(self):
+        '''Write the store to disk.
+
+        Only the results that were used or added since the store was opened
+        are kept, so the results for cards that were removed or modified do
+        not accumulate.
+        '''
+        if self.path is None:
+            return
+        abspath = self.path.resolve()
+        print(f'writing parse store to file {abspath} ({self.hits} cards '
+              f'reused, {self.misses} parsed)...', end='', flush=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with tmp_path.open('wb') as store_file:
+            pickle.dump((self.header(), self._new), store_file,
+                        pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        print(' done', flush=True)
@@ -17,12 +17,13 @@
 #
 # vim: set fileencoding=utf-8 :
 
-import pickle
 from pathlib import Path
 
 from ...Progress import Progress
+from ..Parser.ParseStore import ParseStore
 from ...Surface.ConstructSurfaceT4 import construct_surface_t4
 from ...Surface.Duplicates import remove_duplicate_surfaces, renumber_surfaces
+from ...Surface.SurfaceStore import SurfaceStore
 from ...Volume.ConstructVolumeT4 import (construct_volume_t4,
                                          remove_empty_volumes,
                                          remove_unused_volumes,
@@ -31,72 +32,44 @@ from ...Volume.ConstructVolumeT4 import (construct_volume_t4,
 
 def convertMCNPGeometry(mcnp_parser, lattice_params, args):
     '''Convert an MCNP geometry to T4.'''
-    input_file = Path(args.input)
-    t4_vol_cache_path = input_file.with_suffix('.volumes.cache')
-    t4_surf_cache_path = input_file.with_suffix('.surfaces.cache')
     if args.cache:
-        mcnp_cell_cache_path = input_file.with_suffix('.mcnp.cache')
+        store_path = Path(args.input).with_suffix('.parse.cache')
+        store = ParseStore(store_path)
     else:
-        mcnp_cell_cache_path = None
+        store = None
 
-    if not args.cache:
-        surf_conv = construct_surface_t4(mcnp_parser)
-    else:
-        try:
-            with t4_surf_cache_path.open('rb') as dicfile:
-                abspath = t4_surf_cache_path.resolve()
-                print(f'reading surfaces from file {abs_path}...',
-                      end='', flush=True)
-                surf_conv = pickle.load(dicfile)
-                print(' done', flush=True)
-        except:
-            surf_conv = construct_surface_t4(mcnp_parser)
-            with t4_surf_cache_path.open('wb') as dicfile:
-                abspath = t4_surf_cache_path.resolve()
-                print(f'writing surfaces to file {abspath}...',
-                      end='', flush=True)
-                pickle.dump(surf_conv, dicfile)
-                print(' done', flush=True)
-    dic_surface_t4, dic_surface_mcnp = surf_conv
-
-    if not args.cache:
-        vol_conv = construct_volume_t4(mcnp_parser, lattice_params,
-                                       mcnp_cell_cache_path,
-                                       dic_surface_t4,
-                                       dic_surface_mcnp,
-                                       args.always_inline_filled,
-                                       args.always_inline_filling,
-                                       args.max_inline_score)
-    else:
-        try:
-            with t4_vol_cache_path.open('rb') as dicfile:
-                abspath = t4_vol_cache_path.resolve()
-                print(f'reading TRIPOLI-4 volumes from file {abspath}...',
-                      end='', flush=True)
-                vol_conv = pickle.load(dicfile)
-                print(' done', flush=True)
-        except:
-            vol_conv = construct_volume_t4(mcnp_parser, lattice_params,
-                                           mcnp_cell_cache_path,
-                                           dic_surface_t4,
-                                           dic_surface_mcnp,
-                                           args.always_inline_filled,
-                                           args.always_inline_filling,
-                                           args.max_inline_score)
-            with t4_vol_cache_path.open('wb') as dicfile:
-                abspath = t4_vol_cache_path.resolve()
-                print(f'writing cells to file {abspath}...',
-                      end='', flush=True)
-                pickle.dump(vol_conv, dicfile)
-                print(' done', flush=True)
+    dic_surface_t4, dic_surface_mcnp = construct_surface_t4(mcnp_parser, store)
+    (dic_volume, mcnp_new_dict, dic_surface_t4, skipped_cells,
+     union_ids) = construct_volume_t4(mcnp_parser, lattice_params, store,
+                                      dic_surface_t4,
+                                      dic_surface_mcnp,
+                                      args.always_inline_filled,
+                                      args.always_inline_filling,
+                                      args.max_inline_score,
+                                      args.geometry_parser,
+                                      args.jobs,
+                                      args.verbose)
+    if store is not None:
+        store.save()
 
-    dic_volume, mcnp_new_dict, dic_surface_t4, skipped_cells, union_ids = vol_conv
+    # no other reference to the dictionary of SurfaceT4 objects is left, so
+    # it is freed as soon as the store replaces it
+    dic_surface_t4 = SurfaceStore(dic_surface_t4)
     if not args.skip_deduplication:
-        dic_surface_t4, renumber = remove_duplicate_surfaces(dic_surface_t4)
+        dic_surface_t4, renumber, stats = remove_duplicate_surfaces(
+            dic_surface_t4, args.dedup_rel_tol, args.dedup_abs_tol)
         dic_volume = renumber_surfaces(dic_volume, renumber)
+        union_ids = tuple(renumber[key] for key in union_ids)
+        if stats.exact or stats.close:
+            print(f'removed {stats.exact + stats.close} duplicate surfaces '
+                  f'({stats.close} equal within the tolerance, '
+                  f'{stats.flipped} with opposite orientation)')
 
     remove_empty_volumes(dic_volume, union_ids)
-    remove_unused_volumes(dic_volume)
+    swept = remove_unused_volumes(dic_volume)
+    if swept.volumes:
+        print(f'removed {swept.volumes} unused fictive volumes '
+              f'({swept.surfaces} surfaces no longer used)')
 
     return (dic_surface_mcnp, dic_surface_t4, dic_volume, mcnp_new_dict,
             skipped_cells)
@@ -110,9 +83,9 @@ def writeT4Geometry(dic_surface_t4, dic_volume, skipped_cells, ofile):
                   len(surf_used), max(surf_used)) as progress:
         ofile.write("LANG ENGLISH\n\nGEOMETRY\n\n"
                     "TITLE title\n\nHASH_TABLE\n\n")
-        for i, key in enumerate(sorted(surf_used)):
+        for i, (key, surf) in enumerate(
+                dic_surface_t4.select(surf_used).items()):
             progress.update(i, key)
-            surf = dic_surface_t4[key]
             transform = surf.transform_block()
             transform_kw = ''
             if transform is not None:
@@ -18,42 +18,211 @@
 # vim: set fileencoding=utf-8 :
 '''This module contains utilities to simplify surface dictionaries.'''
 
+from collections import namedtuple
+from itertools import product
+from math import floor, isclose
+
+import numpy as np
+
 from ..Progress import Progress
-from .CollectionDict import CollectionDict
+from .SurfaceT4 import canonical_params
+from .SurfaceStore import transform_key
+
+
+DuplicateStats = namedtuple('DuplicateStats', 'exact close flipped')
+DuplicateStats.__doc__ = '''Number of surfaces removed by
+:func:`remove_duplicate_surfaces` because they were identical to another
+surface (`exact`) or equal within the tolerance (`close`); `flipped` counts
+how many of them had the opposite orientation of the surface that replaced
+them.'''
 
 
-def remove_duplicate_surfaces(surfs):
-    '''This function that detects duplicate surfaces from a surface dictionary,
-    removes them and provides a dictionary where the IDs of the deleted
-    surfaces are associated with the ID of the surface that replaced them.'''
+def remove_duplicate_surfaces(surfs, rel_tol=0., abs_tol=0.):
+    '''This function that detects duplicate surfaces from a
+    :class:`~.SurfaceStore`, removes them and provides a dictionary where the
+    IDs of the deleted surfaces are associated with the ID of the surface that
+    replaced them. The ID is negated if the replacing surface has the opposite
+    orientation, i.e. if its positive side is the negative side of the deleted
+    surface.
+
+    Two surfaces are duplicates if they have the same transformation and the
+    same canonical type (see :meth:`~.SurfaceT4.canonical`), and if all their
+    canonical parameters are close within the given tolerances (see
+    :func:`math.isclose`). The orientation of the canonical form ignores the
+    coefficients that are smaller than the tolerance, so that rounding
+    residues do not prevent surfaces from matching. Each surface is replaced
+    by the first surface (in ID order) that it matches.
+
+    :returns: the store of the remaining surfaces, the renumbering
+        dictionary and a :class:`DuplicateStats` object.
+    '''
     renumbering = {}
-    new_surfs = CollectionDict()
-    surf_to_id = {}
+    kept = []
+    n_exact, n_close, n_flipped = 0, 0, 0
+    groups = canonical_groups(surfs, max(rel_tol, abs_tol))
 
-    with Progress('detecting duplicates for surface',
-                  len(surfs), max(surfs)) as progress:
-        for i, (key, surf) in enumerate(sorted(surfs.items())):
-            progress.update(i, key)
-            if surf in surf_to_id:
-                renumbering[key] = surf_to_id[surf]
-            else:
-                new_surfs[key] = surf
-                renumbering[key] = key
-                surf_to_id[surf] = key
+    with Progress('detecting duplicates in surface group',
+                  len(groups), len(groups)) as progress:
+        for i, (keys, params, signs) in enumerate(groups):
+            progress.update(i, i + 1)
+            targets, exact = match_rows(keys, params, rel_tol, abs_tol)
+            removed = targets != np.arange(len(keys))
+            flipped = signs != signs[targets]
+            new_keys = np.where(flipped, -keys[targets], keys[targets])
+            renumbering.update(zip(keys.tolist(), new_keys.tolist()))
+            kept.append(keys[~removed])
+            n_exact += int(np.count_nonzero(removed & exact))
+            n_close += int(np.count_nonzero(removed & ~exact))
+            n_flipped += int(np.count_nonzero(removed & flipped))
+
+    new_surfs = surfs.select(np.concatenate(kept + [np.empty(0, dtype=int)]))
+    return new_surfs, renumbering, DuplicateStats(n_exact, n_close,
+                                                  n_flipped)
+
+
+def canonical_groups(surfs, tol=0.):
+    '''Return the canonical forms of the surfaces of the
+    :class:`~.SurfaceStore` `surfs`, grouped by canonical type, number of
+    parameters and transformation. Coefficients smaller than `tol` times the
+    largest coefficient do not determine the orientation of the surfaces.
+
+    :returns: a list of ``(keys, params, signs)`` triples of arrays, with one
+        row per surface (see :func:`~.canonical_params`)
+    '''
+    parts = {}
+    for group in surfs.groups:
+        type_surface, params, signs = canonical_params(group.type_surface,
+                                                       group.params, tol)
+        key = (type_surface, params.shape[1], transform_key(group.transform))
+        parts.setdefault(key, []).append((group.keys, params, signs))
+    return [tuple(np.concatenate(column) for column in zip(*part))
+            for part in parts.values()]
+
+
+def match_rows(keys, params, rel_tol, abs_tol):
+    '''Find the duplicate rows in a group of surfaces.
 
-    return new_surfs, renumbering
+    Identical rows are found by sorting the parameter matrix with
+    :func:`numpy.lexsort`; only the first row (in ID order) of each set of
+    identical rows is then looked up in a :class:`SurfaceHash`, if the
+    tolerances are not zero.
+
+    >>> keys = np.array([4, 1, 3, 2])
+    >>> params = np.array([[1., 2.], [1., 2.], [1., 2. + 1e-12], [0., 0.]])
+    >>> match_rows(keys, params, 0., 0.)
+    (array([1, 1, 2, 3]), array([ True,  True,  True,  True]))
+    >>> match_rows(keys, params, 1e-10, 0.)
+    (array([1, 1, 1, 3]), array([ True,  True, False,  True]))
+
+    :param keys: the array of the surface IDs
+    :param params: the matrix of the canonical parameters
+    :returns: the array of the indices of the rows that replace each row, and
+        a boolean array telling if the replacing row is identical
+    '''
+    n_rows = len(keys)
+    order = np.lexsort((keys,) + tuple(params.T[::-1]))
+    sorted_params = params[order]
+    starts = np.ones(n_rows, dtype=bool)
+    starts[1:] = np.any(sorted_params[1:] != sorted_params[:-1], axis=1)
+    firsts = order[starts]
+    identical = np.empty(n_rows, dtype=int)
+    identical[order] = firsts[np.cumsum(starts) - 1]
+    if rel_tol == 0. and abs_tol == 0.:
+        return identical, np.ones(n_rows, dtype=bool)
+
+    firsts = firsts[np.argsort(keys[firsts])]
+    surf_hash = SurfaceHash(params[firsts], rel_tol, abs_tol)
+    targets = np.arange(n_rows)
+    for row, row_params in zip(firsts.tolist(), params[firsts].tolist()):
+        match = surf_hash.find(row_params)
+        if match is None:
+            surf_hash.add((keys[row], row), row_params)
+        else:
+            targets[row] = match[1]
+    targets = targets[identical]
+    return targets, targets == identical
+
+
+class SurfaceHash:
+    '''A spatial hash for looking up the surfaces whose parameters are close to
+    those of a given surface.
+
+    The hash holds the canonical parameters of surfaces belonging to the same
+    group (see :func:`canonical_groups`). They are quantized on a grid whose
+    step is much larger than the tolerance, so that any match lies in the
+    bucket of the looked up surface or, for the parameters that lie close to a
+    cell boundary, in the adjacent bucket. The candidates found in the buckets
+    are then confirmed with :func:`math.isclose`.
+
+    >>> spheres = [[float(x), 0., 0., 1.] for x in range(5)]
+    >>> surf_hash = SurfaceHash(np.array(spheres), 1e-9, 1e-9)
+    >>> for i, sphere in enumerate(spheres):
+    ...     surf_hash.add(i, sphere)
+    >>> surf_hash.find([3. + 1e-12, 0., 0., 1.])
+    3
+    >>> surf_hash.find([3. + 1e-6, 0., 0., 1.]) is None
+    True
+    '''
+
+    #: ratio between the grid step and the largest tolerance of each parameter
+    STEP_FACTOR = 64.
+
+    def __init__(self, params, rel_tol, abs_tol):
+        '''Prepare a hash for the given surfaces (which are not added).
+
+        :param params: the parameters of the surfaces that will be added to the
+            hash, as a matrix; they are used to compute the grid steps
+        :param float rel_tol: the relative tolerance
+        :param float abs_tol: the absolute tolerance
+        '''
+        self.rel_tol = rel_tol
+        self.abs_tol = abs_tol
+        scales = np.abs(params).max(axis=0)
+        self.steps = (self.STEP_FACTOR
+                      * np.maximum(abs_tol, rel_tol * scales)).tolist()
+        self.buckets = {}
+
+    def add(self, key, params):
+        '''Add the surface with ID `key` and the given parameters to the
+        hash.'''
+        cell = tuple(param if step == 0. else floor(param / step)
+                     for param, step in zip(params, self.steps))
+        self.buckets.setdefault(cell, []).append((key, params))
+
+    def find(self, params):
+        '''Return the smallest ID of the surfaces that match the given
+        parameters within the tolerance, or `None`.'''
+        cells = []
+        for param, step in zip(params, self.steps):
+            if step == 0.:
+                cells.append((param,))
+                continue
+            radius = 2. * max(self.abs_tol, self.rel_tol * abs(param))
+            low = floor((param - radius) / step)
+            high = floor((param + radius) / step)
+            cells.append((low,) if low == high else (low, high))
+        return min((key for cell in product(*cells)
+                    for key, other in self.buckets.get(cell, ())
+                    if all(isclose(param, other_param,
+                                   rel_tol=self.rel_tol, abs_tol=self.abs_tol)
+                           for param, other_param in zip(params, other))),
+                   default=None)
 
 
 def renumber_surfaces(volus, renumbering):
-    '''Apply the given surface renumbering to the volume definitions.'''
+    '''Apply the given surface renumbering to the volume definitions.
+
+    A negative ID in `renumbering` means that the new surface has the opposite
+    orientation, so the surface moves from the positive to the negative sides
+    of the volume, or vice versa.'''
     volus = volus.copy()
 
     with Progress('renumbering surfaces in cell',
                   len(volus), max(volus)) as progress:
         for i, (key, volu) in enumerate(volus.items()):
             progress.update(i, key)
-            new_pluses = set(renumbering[s] for s in volu.pluses)
-            new_minuses = set(renumbering[s] for s in volu.minuses)
-            volu.pluses = new_pluses
-            volu.minuses = new_minuses
+            signed = ([renumbering[s] for s in volu.pluses]
+                      + [-renumbering[s] for s in volu.minuses])
+            volu.pluses = set(s for s in signed if s > 0)
+            volu.minuses = set(-s for s in signed if s < 0)
     return volus
@@ -0,0 +1,222 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Module containing the definition of the :class:`SurfaceStore` class.'''
+
+from collections.abc import Mapping
+
+import numpy as np
+
+from .SurfaceT4 import SurfaceT4
+
+
+def transform_key(transform):
+    '''Return a hashable key for the transformation of a
+    :class:`~.SurfaceT4`.'''
+    if transform is None:
+        return None
+    return tuple(transform[0].flat), tuple(transform[1].flat)
+
+
+class SurfaceGroup:  # pylint: disable=too-few-public-methods
+    '''The surfaces of a :class:`SurfaceStore` that have the same type, number
+    of parameters and transformation.
+
+    The surface IDs, the parameters and the provenance indices are stored as
+    NumPy arrays, with one row per surface. The parameters are stored as
+    floats; a boolean mask remembers which ones were integers, so that they
+    are written out in their original form.
+    '''
+
+    __slots__ = ('type_surface', 'transform', 'keys', 'params', 'integers',
+                 'origins')
+
+    def __init__(self, type_surface, transform, keys, params, integers,
+                 origins):
+        '''Constructor.
+
+        :param type_surface: the type of the surfaces
+        :param transform: the transformation of the surfaces (see
+            :class:`~.SurfaceT4`)
+        :param keys: the array of the surface IDs
+        :param params: the ``(n, n_params)`` array of the parameters
+        :param integers: the ``(n, n_params)`` boolean array of the
+            parameters that were given as integers
+        :param origins: the array of the indices of the provenance of each
+            surface in :attr:`SurfaceStore.origins`
+        '''
+        self.type_surface = type_surface
+        self.transform = transform
+        self.keys = keys
+        self.params = params
+        self.integers = integers
+        self.origins = origins
+
+    def take(self, rows):
+        '''Return a new group containing the given rows (as an index array or
+        a boolean mask).'''
+        return SurfaceGroup(self.type_surface, self.transform, self.keys[rows],
+                            self.params[rows], self.integers[rows],
+                            self.origins[rows])
+
+    def row_params(self, row):
+        '''Return the parameters of the given row as a list, with the integer
+        parameters converted back to :class:`int`.'''
+        return [int(value) if integer else value
+                for value, integer in zip(self.params[row].tolist(),
+                                          self.integers[row].tolist())]
+
+    def param_lists(self):
+        '''Return the parameters of all the rows as a list of lists, with the
+        integer parameters converted back to :class:`int`.'''
+        if not self.integers.any():
+            return self.params.tolist()
+        values = self.params.astype(object)
+        values[self.integers] = self.params[self.integers].astype(int).tolist()
+        return values.tolist()
+
+
+class SurfaceStore(Mapping):
+    '''A columnar, read-only dictionary of T4 surfaces.
+
+    Holding millions of :class:`~.SurfaceT4` objects takes several times more
+    memory than their parameters. This class stores the surfaces in
+    :class:`SurfaceGroup` objects, one for each combination of surface type,
+    number of parameters and transformation, and the provenances
+    (:attr:`~.SurfaceT4.idorigin`) are stored only once. The
+    :class:`~.SurfaceT4` objects returned by the dictionary interface are
+    created on the fly.
+
+    The store is built from the dictionary produced by the cell conversion, so
+    it does not lower the peak memory of the conversion itself; it lowers the
+    memory held by the surfaces during deduplication and writing.
+
+    >>> from .ESurfaceTypeT4 import ESurfaceTypeT4 as T4S
+    >>> store = SurfaceStore({3: SurfaceT4(T4S.PLANEX, [1.], ['a']),
+    ...                       1: SurfaceT4(T4S.SPHERE, [0., 0., 0., 2.], ['a']),
+    ...                       2: SurfaceT4(T4S.PLANEX, [-1], ['b'])})
+    >>> len(store.groups), len(store.origins)
+    (2, 2)
+    >>> store[2]
+    SurfaceT4(<ESurfaceTypeT4.PLANEX: 1>, (-1,), ('b',), None)
+    >>> [(key, str(surf)) for key, surf in store.items()]
+    [(1, 'SPHERE 0.0 0.0 0.0 2.0'), (2, 'PLANEX -1'), (3, 'PLANEX 1.0')]
+    >>> sorted(store.select([1, 3]))
+    [1, 3]
+    '''
+
+    def __init__(self, surfs=None):
+        '''Build a store containing the surfaces of the dictionary `surfs`.'''
+        self.origins = []
+        self.groups = []
+        origin_ids = {}
+        columns = {}
+        for key, surf in (surfs or {}).items():
+            group = (surf.type_surface, len(surf.param_surface),
+                     transform_key(surf.transform))
+            if group not in columns:
+                columns[group] = (surf.transform, [], [], [], [])
+            _, keys, params, integers, origins = columns[group]
+            origin = tuple(surf.idorigin)
+            if origin not in origin_ids:
+                origin_ids[origin] = len(self.origins)
+                self.origins.append(origin)
+            keys.append(key)
+            params.extend(surf.param_surface)
+            integers.extend(isinstance(param, int)
+                            for param in surf.param_surface)
+            origins.append(origin_ids[origin])
+        for (type_surface, n_params, _), (transform, keys, params, integers,
+                                         origins) in columns.items():
+            self.groups.append(SurfaceGroup(
+                type_surface, transform, np.array(keys, dtype=int),
+                np.array(params, dtype=float).reshape(-1, n_params),
+                np.array(integers, dtype=bool).reshape(-1, n_params),
+                np.array(origins, dtype=int)))
+        self._build_index()
+
+    @classmethod
+    def from_groups(cls, groups, origins):
+        '''Build a store from a list of :class:`SurfaceGroup` objects and the
+        list of provenances that they refer to.'''
+        store = cls()
+        store.groups = [group for group in groups if len(group.keys) > 0]
+        store.origins = origins
+        store._build_index()
+        return store
+
+    def _build_index(self):
+        '''Build the sorted index of the surface IDs.'''
+        keys = np.concatenate([group.keys for group in self.groups]
+                              + [np.empty(0, dtype=int)])
+        group_ids = np.concatenate(
+            [np.full(len(group.keys), i) for i, group in enumerate(self.groups)]
+            + [np.empty(0, dtype=int)])
+        rows = np.concatenate([np.arange(len(group.keys))
+                               for group in self.groups]
+                              + [np.empty(0, dtype=int)])
+        order = np.argsort(keys, kind='stable')
+        self.ids = keys[order]
+        self.group_ids = group_ids[order]
+        self.rows = rows[order]
+
+    def view(self, group_id, row):
+        '''Return the :class:`~.SurfaceT4` stored in the given row of the given
+        group.'''
+        group = self.groups[group_id]
+        return SurfaceT4(group.type_surface, group.row_params(row),
+                         self.origins[group.origins[row]], group.transform)
+
+    def __getitem__(self, key):
+        i = np.searchsorted(self.ids, key)
+        if i == len(self.ids) or self.ids[i] != key:
+            raise KeyError(key)
+        return self.view(self.group_ids[i], self.rows[i])
+
+    def __iter__(self):
+        yield from self.ids.tolist()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, key):
+        i = np.searchsorted(self.ids, key)
+        return i < len(self.ids) and self.ids[i] == key
+
+    def items(self):
+        '''Yield the ``(ID, surface)`` pairs in increasing ID order.'''
+        params = [group.param_lists() for group in self.groups]
+        for key, group_id, row in zip(self.ids.tolist(),
+                                      self.group_ids.tolist(),
+                                      self.rows.tolist()):
+            group = self.groups[group_id]
+            yield key, SurfaceT4(group.type_surface, params[group_id][row],
+                                 self.origins[group.origins[row]],
+                                 group.transform)
+
+    def values(self):
+        '''Yield the surfaces in increasing ID order.'''
+        for _, surf in self.items():
+            yield surf
+
+    def select(self, keys):
+        '''Return a new store containing only the surfaces whose IDs are in
+        `keys`.'''
+        keys = np.fromiter(keys, dtype=int)
+        return self.from_groups([group.take(np.isin(group.keys, keys))
+                                 for group in self.groups], self.origins)
@@ -23,11 +23,16 @@ import numpy as np
 
 from .ESurfaceTypeT4 import ESurfaceTypeT4 as T4S
 
+#: The axis-aligned plane types and the index of their normal axis.
+AXIS_PLANES = {T4S.PLANEX: 0, T4S.PLANEY: 1, T4S.PLANEZ: 2}
+
 
 class SurfaceT4:
     '''Class that contains the information of the TRIPOLI-4 ``SURF``
     keyword.'''
 
+    __slots__ = ('type_surface', 'param_surface', 'idorigin', 'transform')
+
     def __init__(self, type_surface, param_surface, idorigin=None,
                  transform=None):
         '''Constructor.
@@ -74,6 +79,49 @@ class SurfaceT4:
             return ' // ' + '; '.join(map(str, self.idorigin))
         return ''
 
+    def canonical(self, tol=0.):
+        '''Return the canonical form of the surface, as a ``(type, params,
+        sign)`` triple.
+
+        Two surfaces coincide (possibly with opposite orientations) if and
+        only if they have the same canonical type and parameters. The `sign`
+        is ``-1`` if the positive side of the surface is the negative side of
+        the canonical surface, and ``1`` otherwise. Axis-aligned planes are
+        represented as generic planes, and the parameters of planes and
+        quadrics are scaled so that their first significant coefficient is
+        positive (and, for quadrics, so that the largest coefficient is 1 in
+        absolute value):
+
+        >>> SurfaceT4(T4S.PLANEX, [4.]).canonical()
+        (<ESurfaceTypeT4.PLANE: 4>, (1.0, 0.0, 0.0, -4.0), 1)
+        >>> SurfaceT4(T4S.PLANE, [-1., 0., 0., 4.]).canonical()
+        (<ESurfaceTypeT4.PLANE: 4>, (1.0, 0.0, 0.0, -4.0), -1)
+        >>> SurfaceT4(T4S.QUAD, [0., 0., 0., 0., 0., 0., 0., -2., 0., 1.]
+        ...           ).canonical()
+        (<ESurfaceTypeT4.QUAD: 14>, (0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0, \
+0.0, -0.5), -1)
+
+        The other surfaces cannot be flipped, and they are their own
+        canonical form:
+
+        >>> SurfaceT4(T4S.SPHERE, [0, 0, 0, 1]).canonical()
+        (<ESurfaceTypeT4.SPHERE: 5>, (0.0, 0.0, 0.0, 1.0), 1)
+
+        A coefficient is significant if its absolute value exceeds `tol` times
+        the largest absolute value of the coefficients. A non-zero `tol` makes
+        the orientation insensitive to rounding residues:
+
+        >>> SurfaceT4(T4S.PLANE, [-6e-17, 1., 0., -2.]).canonical()[2]
+        -1
+        >>> SurfaceT4(T4S.PLANE, [-6e-17, 1., 0., -2.]).canonical(1e-10)[2]
+        1
+
+        :param float tol: the relative threshold for significant coefficients
+        '''
+        type_surface, params, signs = canonical_params(
+            self.type_surface, [self.param_surface], tol)
+        return type_surface, tuple(params[0].tolist()), int(signs[0])
+
     def __eq__(self, other):
         # idorigin intentionally omitted
         if self.transform is None:
@@ -97,3 +145,45 @@ class SurfaceT4:
         return hash((self.type_surface, self.param_surface,
                      tuple(self.transform[0].flat),
                      tuple(self.transform[1].flat)))
+
+
+def canonical_params(type_surface, params, tol=0.):
+    '''Return the canonical form of a batch of surfaces of the same type (see
+    :meth:`SurfaceT4.canonical`).
+
+    >>> canonical_params(T4S.PLANEY, [[1.], [-2.]])
+    (<ESurfaceTypeT4.PLANE: 4>, array([[ 0.,  1.,  0., -1.],
+           [ 0.,  1.,  0.,  2.]]), array([1, 1]))
+
+    :param type_surface: the type of the surfaces
+    :param params: the parameters of the surfaces, one row per surface
+    :param float tol: the relative threshold for significant coefficients
+    :returns: the canonical type, the canonical parameters (as a matrix) and
+        the array of the signs
+    '''
+    params = np.asarray(params, dtype=float)
+    n_surfs = len(params)
+    signs = np.ones(n_surfs, dtype=int)
+    if type_surface in AXIS_PLANES:
+        canon = np.zeros((n_surfs, 4))
+        canon[:, AXIS_PLANES[type_surface]] = 1.
+        canon[:, 3] = -params[:, 0]
+        # adding 0. turns negative zeros into positive zeros
+        return T4S.PLANE, canon + 0., signs
+    if type_surface == T4S.PLANE:
+        coeffs = params[:, :3]
+        scales = np.ones(n_surfs)
+    elif type_surface == T4S.QUAD:
+        coeffs = params
+        scales = np.abs(params).max(axis=1)
+        scales[scales == 0.] = 1.
+    else:
+        return type_surface, params, signs
+    # the orientation is given by the first coefficient that is not a
+    # rounding residue
+    magnitudes = np.abs(coeffs)
+    thresholds = tol * magnitudes.max(axis=1)
+    significant = magnitudes > thresholds[:, np.newaxis]
+    lead = coeffs[np.arange(n_surfs), np.argmax(significant, axis=1)]
+    signs[lead < 0.] = -1
+    return type_surface, params / (signs * scales)[:, np.newaxis] + 0., signs
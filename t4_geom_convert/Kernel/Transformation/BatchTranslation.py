@@ -0,0 +1,178 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Translation of surfaces by many vectors at once.
+
+The elements of a lattice only differ from the base element by a translation.
+The functions in this module compute the parameters of the translated surfaces
+for all the lattice elements at once, with a few NumPy operations per surface,
+instead of transforming and converting the surfaces one lattice element at a
+time.
+'''
+
+import numpy as np
+
+from ..Surface.ESurfaceTypeMCNP import ESurfaceTypeMCNP as MS
+from ..Surface.ESurfaceTypeT4 import ESurfaceTypeT4 as T4S
+from ..Surface.SurfaceMCNP import SurfaceMCNP
+from ..Surface.SurfaceT4 import SurfaceT4
+from ..Surface.SurfaceCollection import SurfaceCollection
+from ..Surface.ConversionSurfaceMCNPToT4 import conversion_surface_params
+from .Transformation import transformation
+
+#: The T4 surface types whose first parameters are the coordinates of the
+#: reference point of the MCNP surface, and the indices of those coordinates.
+CENTER_COORDS = {
+    T4S.SPHERE: (0, 1, 2),
+    T4S.CYLX: (1, 2),
+    T4S.CYLY: (0, 2),
+    T4S.CYLZ: (0, 1),
+    T4S.CYL: (0, 1, 2),
+    T4S.CONEX: (0, 1, 2),
+    T4S.CONEY: (0, 1, 2),
+    T4S.CONEZ: (0, 1, 2),
+    T4S.CONE: (0, 1, 2),
+    T4S.TORUSX: (0, 1, 2),
+    T4S.TORUSY: (0, 1, 2),
+    T4S.TORUSZ: (0, 1, 2),
+}
+
+IDENTITY = [1., 0., 0., 0., 1., 0., 0., 0., 1.]
+
+
+def translate_surfaces(key, mcnp_surfs, translations):
+    '''Translate a (possibly composite) MCNP surface by each of the given
+    vectors and convert the results to T4 surfaces.
+
+    :param key: the MCNP surface
+    :param mcnp_surfs: the ``(SurfaceMCNP, side)`` pairs describing the
+        surface
+    :param translations: the translation vectors, as an ``(n, 3)`` array
+    :returns: a list of `n` pairs, each made of a :class:`~.SurfaceCollection`
+        and of the list of the translated ``(SurfaceMCNP, side)`` pairs
+    '''
+    t4_colls = [[] for _ in translations]
+    new_mcnp_surfs = [[] for _ in translations]
+    for surf, side in mcnp_surfs:
+        translated = translate_surface(key, surf, translations)
+        for i, (t4_coll, new_surf) in enumerate(translated):
+            t4_colls[i].append((t4_coll, side))
+            new_mcnp_surfs[i].append((new_surf, side))
+    return [(SurfaceCollection.join(colls), surfs)
+            for colls, surfs in zip(t4_colls, new_mcnp_surfs)]
+
+
+def translate_surface(key, surface, translations):
+    '''Translate the MCNP surface `surface` by each of the given vectors.
+
+    The result is the same as calling :func:`~.transformation` and
+    :func:`~.conversion_surface_params` for each translation. Quadrics and
+    tilted tori are actually processed this way; the parameters of the other
+    surfaces are computed for all the translations at once.
+
+    >>> from t4_geom_convert.Kernel.Surface.ESurfaceTypeMCNP import \
+ESurfaceTypeMCNP as MS
+    >>> cyl = SurfaceMCNP('', MS.C_Z, ((1., 2., 0.), (0., 0., 1.)), [3.])
+    >>> translated = translate_surface(1, cyl, np.array([[0., 0., 0.],
+    ...                                                  [1., 1., 1.]]))
+    >>> [str(coll[0][0]) for coll, _ in translated]
+    ['CYLZ 1.0 2.0 3.0', 'CYLZ 2.0 3.0 3.0']
+    >>> [surf.param_surface for _, surf in translated]
+    [((1.0, 2.0, 0.0), (0.0, 0.0, 1.0)), ((2.0, 3.0, 1.0), (0.0, 0.0, 1.0))]
+
+    :param key: the MCNP surface
+    :param SurfaceMCNP surface: an MCNP surface
+    :param translations: the translation vectors, as an ``(n, 3)`` array
+    :returns: a list of `n` pairs, each made of a :class:`~.SurfaceCollection`
+        and of the translated :class:`~.SurfaceMCNP`
+    '''
+    base = conversion_surface_params(key, surface)
+    if (surface.type_surface in (MS.SQ, MS.GQ)
+            or any(surf.transform is not None for surf, _ in base)):
+        return [_translate_one(key, surface, translation)
+                for translation in translations.tolist()]
+
+    point, direction = surface.param_surface
+    # this is what transformation() does with an identity matrix; it turns
+    # negative zeros into positive zeros
+    direction = tuple(coord + 0. for coord in direction)
+    points = translations + (np.array(point, dtype=float) + 0.)
+    columns = [(surf.type_surface,
+                translated_params(surf, points, direction).tolist(),
+                surf.idorigin, side)
+               for surf, side in base]
+    compl_param = list(surface.compl_param)
+    results = []
+    for i, new_point in enumerate(points.tolist()):
+        t4_coll = SurfaceCollection([(SurfaceT4(type_surface, params[i],
+                                                idorigin), side)
+                                     for type_surface, params, idorigin, side
+                                     in columns])
+        new_surf = SurfaceMCNP(surface.boundary_cond, surface.type_surface,
+                               (tuple(new_point), direction), compl_param,
+                               surface.idorigin)
+        results.append((t4_coll, new_surf))
+    return results
+
+
+def translated_params(surf, points, direction):
+    '''Return the parameters of the T4 surface `surf` when the reference point
+    of the MCNP surface it was converted from is moved to each of `points`.
+
+    >>> from t4_geom_convert.Kernel.Surface.ESurfaceTypeT4 import \
+ESurfaceTypeT4 as T4S
+    >>> plane = SurfaceT4(T4S.PLANE, [0., 0.6, 0.8, -2.])
+    >>> translated_params(plane, np.array([[0., 0., 2.5], [0., 5., 0.]]),
+    ...                   (0., 0.6, 0.8))
+    array([[ 0. ,  0.6,  0.8, -2. ],
+           [ 0. ,  0.6,  0.8, -3. ]])
+
+    :param SurfaceT4 surf: the T4 surface for the untranslated MCNP surface
+    :param points: the translated reference points, as an ``(n, 3)`` array
+    :param direction: the direction vector of the MCNP surface
+    :returns: an array with one row of parameters per point
+    '''
+    type_surface = surf.type_surface
+    coords = CENTER_COORDS.get(type_surface, None)
+    if coords is not None:
+        params = np.tile(np.array(surf.param_surface, dtype=float),
+                         (len(points), 1))
+        params[:, :len(coords)] = points[:, coords]
+        return params
+
+    # planes; see convert_plane() and convert_cone()
+    u_x, u_y, u_z = direction
+    pos = -(u_x * points[:, 0] + u_y * points[:, 1] + u_z * points[:, 2])
+    if type_surface == T4S.PLANEX:
+        return (-pos / u_x)[:, np.newaxis]
+    if type_surface == T4S.PLANEY:
+        return (-pos / u_y)[:, np.newaxis]
+    if type_surface == T4S.PLANEZ:
+        return (-pos / u_z)[:, np.newaxis]
+    if type_surface == T4S.PLANE:
+        params = np.empty((len(points), 4))
+        params[:, :3] = direction
+        params[:, 3] = pos
+        return params
+    raise ValueError(f'cannot translate surfaces of type {type_surface}')
+
+
+def _translate_one(key, surface, translation):
+    '''Translate a single surface with the generic transformation code.'''
+    new_surf = transformation(translation + IDENTITY, surface)
+    return conversion_surface_params(key, new_surf), new_surf
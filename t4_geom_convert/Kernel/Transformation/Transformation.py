@@ -23,7 +23,8 @@ from collections import OrderedDict
 import numpy as np
 
 from MIP.geom.forcad import transform_frame
-from MIP.geom.transforms import get_transforms
+from MIP.geom.transforms import get_transforms, transform_point
+from MIP.geom.transforms import normalize_transform as mip_normalize_transform
 
 from ..Surface.SurfaceMCNP import SurfaceMCNP
 from .TransformationQuad import transformation_quad
@@ -34,17 +35,22 @@ from ..VectUtils import (transpose, matrix_rows, scal, renorm, vdiff, vect,
                          mag2, mag, rescale)
 
 
-def get_mcnp_transforms(parser):
+def get_mcnp_transforms(parser, store=None):
     '''Return the dictionary of parsed MCNP transformation, in a canonical,
     12-parameter form.
 
     :param parser: the MCNP parser
+    :param store: if not `None`, a :class:`~.ParseStore` where the parsed
+        transformations are looked up and saved
     :returns: a dictionary associating each transformation number to a list of
         12 transformation parameters.
     '''
-    mcnp_transforms = get_transforms(parser)
+    if store is None:
+        mcnp_transforms = get_transforms(parser).items()
+    else:
+        mcnp_transforms = _get_transforms_stored(parser, store)
     transforms = OrderedDict()
-    for transf_id, transf in mcnp_transforms.items():
+    for transf_id, transf in mcnp_transforms:
         try:
             transf = normalize_transform(transf)
         except TransformationError as err:
@@ -55,6 +61,19 @@ def get_mcnp_transforms(parser):
     return transforms
 
 
+def _get_transforms_stored(parser, store):
+    '''Yield the ``(id, params)`` pairs of the MCNP transformations, reusing
+    the results in the store for the unchanged TR cards.'''
+    for card in parser.data_cards('tr', '*tr'):
+        name, dtype, params = card.parts()
+        key = store.key('transform', name, dtype, params)
+        parsed = store.get(key)
+        if parsed is None:
+            parsed = mip_normalize_transform(name, dtype, params)
+            store.put(key, parsed)
+        yield parsed
+
+
 def normalize_transform(transf):
     '''Return a normalized, 12-param version of the affine transformation.
     '''
@@ -430,6 +449,41 @@ def compose_transform(trans1, trans2):
     return [*vec_c, *mat_c.ravel()]
 
 
+def chain_transforms(transforms):
+    '''Compose the given transformations, with the same convention as
+    :func:`transformation` (the first transformation is applied first), and
+    return the result as a tuple, or `None` if there is nothing to compose.
+
+    Applying the result is equivalent to applying the transformations one
+    after the other:
+
+    >>> from MIP.geom.transforms import transform_point
+    >>> quarter = [1., 2., 3., 0., 1., 0., -1., 0., 0., 0., 0., 1.]
+    >>> tilt = [0., 0., 1., 0., 0., 1., 0., 1., 0., -1., 0., 0.]
+    >>> chain_transforms([quarter, None, tilt])
+    (-3.0, 2.0, 2.0, 0.0, 1.0, 0.0, 0.0, 0.0, -1.0, -1.0, 0.0, 0.0)
+    >>> point = (0.5, 0.25, 2.0)
+    >>> transform_point(transform_point(point, quarter), tilt)
+    (-5.0, 2.5, 1.75)
+    >>> transform_point(point, chain_transforms([quarter, tilt]))
+    (-5.0, 2.5, 1.75)
+    >>> chain_transforms([[], None]) is None
+    True
+    '''
+    result = None
+    for transform in transforms:
+        if not transform:
+            continue
+        if result is None:
+            result = tuple(float(param) for param in transform)
+            continue
+        offset = transform_point(result[:3], transform)
+        mat1 = np.array(result[3:12], dtype=float).reshape(3, 3)
+        mat2 = np.array(transform[3:12], dtype=float).reshape(3, 3)
+        result = (*map(float, offset), *(mat1 @ mat2).ravel().tolist())
+    return result
+
+
 def to_numpy(trans):
     '''Split a transformation into a `NumPy` 3x3 matrix and a vector.
 
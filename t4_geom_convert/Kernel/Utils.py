@@ -19,11 +19,23 @@
 
 import re
 
+import numpy as np
+
+
+# numbers that normalize_float leaves untouched: no exponent, no trailing
+# zeros after the decimal point and no trailing decimal point
+re_plain_number = re.compile(r'[-+]?(?:[0-9]+|[0-9]*\.[0-9]*[1-9])')
+re_trailing_zeros = re.compile(r'^([-+]?[0-9]*\.[0-9]*[1-9])0+$')
+re_fortran_exponent = re.compile(
+    r'^([-+]?([0-9]+(\.[0-9]*)?|[0-9]*\.[0-9]+))([-+][0-9]+)$')
+re_exponent_letter = re.compile(r'[eEdD]')
+
 
 def normalize_float(number):
     '''Return a normalized version of the given float, removing any trailing
-    zeros, except one if it is the only digit after the decimal point. Also
-    normalizes the Fortran scientific notation (``1.2-4 == 1.2e-4``).
+    zeros of a number without exponent, except one if it is the only digit
+    after the decimal point. Also normalizes the Fortran scientific notation
+    (``1.2-4 == 1.2e-4``).
 
     :rtype: str
 
@@ -57,6 +69,14 @@ def normalize_float(number):
     '1.e-2'
     >>> normalize_float('6.3023-5')
     '6.3023e-5'
+    >>> normalize_float('1.5-10')
+    '1.5e-10'
+    >>> normalize_float('1.5+00')
+    '1.5e+00'
+    >>> normalize_float('1.5-0')
+    '1.5e-0'
+    >>> normalize_float('1.50-10')
+    '1.50e-10'
     >>> normalize_float('-5e-4')
     '-5e-4'
     >>> normalize_float('-5E-4')
@@ -68,11 +88,38 @@ def normalize_float(number):
     >>> normalize_float('-5d4')
     '-5e4'
     '''
-    norm = re.sub(r'^([-+]?[0-9]*\.[0-9]*[^0])0+$', r'\1', number)
+    if re_plain_number.fullmatch(number):
+        return number
+    norm = re_trailing_zeros.sub(r'\1', number)
     if norm[-1] == '.':
         norm += '0'
-    norm = re.sub(r'^([-+]?([0-9]+(\.[0-9]*)?|[0-9]*\.[0-9]+))([-+][0-9]+)$',
-                  r'\1e\4',
-                  norm)
-    norm = re.sub(r'[eEdD]', 'e', norm)
-    return norm
+    norm = re_fortran_exponent.sub(r'\1e\4', norm)
+    return re_exponent_letter.sub('e', norm)
+
+
+def normalize_floats(numbers):
+    '''Apply :func:`normalize_float` to a sequence of numbers.
+
+    Plain numbers (the vast majority in practice) are recognized by a single
+    regular-expression match and returned unchanged.
+
+    :rtype: list(str)
+
+    >>> normalize_floats(['1', '1.2000', '6.4-2', '.5', '3.'])
+    ['1', '1.2', '6.4e-2', '.5', '3.0']
+    '''
+    plain = re_plain_number.fullmatch
+    return [number if plain(number) else normalize_float(number)
+            for number in numbers]
+
+
+def parse_floats(numbers):
+    '''Parse a sequence of numbers, possibly in Fortran notation, into a NumPy
+    array of floats.
+
+    :rtype: numpy.ndarray
+
+    >>> parse_floats(['1', '6.4-2', '-5d1']).tolist()
+    [1.0, 0.064, -50.0]
+    '''
+    return np.array(normalize_floats(numbers), dtype=float)
@@ -0,0 +1,512 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Axis-aligned bounding boxes for surfaces, MCNP cells and T4 volumes.
+
+The boxes are computed by interval arithmetic and are conservative: the
+region described by a half-space, a cell or a volume is always contained in
+its box, but the box may be larger than necessary (in particular, it is
+unbounded along the directions where a half-space is not bounded by a simple
+rule). Intersections of regions are bounded by the intersection of the boxes,
+and unions by their hull.
+'''
+
+from math import inf, sqrt
+
+import numpy as np
+
+from ..Surface.ESurfaceTypeT4 import ESurfaceTypeT4 as T4S
+from ..Surface.ConversionSurfaceMCNPToT4 import conversion_surface_params
+from .GeomTree import LEAF, INTE, UNION
+from .TreeFunctions import isCellRef
+
+
+class AABB:
+    '''An axis-aligned bounding box, described by its lower and upper
+    corners. The coordinates may be infinite. All the empty boxes compare
+    equal.
+
+    >>> box = AABB((0, 0, 0), (1, 2, 3))
+    >>> box & AABB((0.5, -inf, -inf), (inf, inf, inf))
+    AABB((0.5, 0.0, 0.0), (1.0, 2.0, 3.0))
+    >>> box | AABB((-1, 0, 0), (0, 0, 0))
+    AABB((-1.0, 0.0, 0.0), (1.0, 2.0, 3.0))
+    >>> (box & AABB((2, 0, 0), (3, 1, 1))).is_empty()
+    True
+    '''
+
+    __slots__ = ('lower', 'upper')
+
+    def __init__(self, lower, upper):
+        lower = tuple(float(coord) for coord in lower)
+        upper = tuple(float(coord) for coord in upper)
+        if any(low > up for low, up in zip(lower, upper)):
+            lower, upper = (inf, inf, inf), (-inf, -inf, -inf)
+        self.lower = lower
+        self.upper = upper
+
+    @classmethod
+    def full(cls):
+        '''Return the box covering the whole space.'''
+        return cls((-inf, -inf, -inf), (inf, inf, inf))
+
+    @classmethod
+    def empty(cls):
+        '''Return an empty box.'''
+        return cls((inf, inf, inf), (-inf, -inf, -inf))
+
+    @classmethod
+    def slab(cls, axis, low, up):
+        '''Return the box of the points whose `axis`-th coordinate lies
+        between `low` and `up`.
+
+        >>> AABB.slab(1, -inf, 2)
+        AABB((-inf, -inf, -inf), (inf, 2.0, inf))
+        '''
+        lower = [-inf, -inf, -inf]
+        upper = [inf, inf, inf]
+        lower[axis] = low
+        upper[axis] = up
+        return cls(lower, upper)
+
+    @classmethod
+    def around(cls, center, half_widths):
+        '''Return the box centered on `center` with the given half-widths.'''
+        return cls((c - w for c, w in zip(center, half_widths)),
+                   (c + w for c, w in zip(center, half_widths)))
+
+    def is_empty(self):
+        '''Return `True` if the box is empty.'''
+        return self.lower[0] > self.upper[0]
+
+    def is_bounded(self):
+        '''Return `True` if all the coordinates of the box are finite.
+
+        >>> AABB.empty().is_bounded()
+        True
+        >>> AABB.slab(0, 0, 1).is_bounded()
+        False
+        '''
+        return self.is_empty() or all(-inf < coord < inf for coord
+                                      in self.lower + self.upper)
+
+    def contains(self, point):
+        '''Return `True` if `point` lies in the (closed) box.'''
+        return all(low <= coord <= up for low, coord, up
+                   in zip(self.lower, point, self.upper))
+
+    def __and__(self, other):
+        return AABB(map(max, self.lower, other.lower),
+                    map(min, self.upper, other.upper))
+
+    def __or__(self, other):
+        return AABB(map(min, self.lower, other.lower),
+                    map(max, self.upper, other.upper))
+
+    def transformed(self, translation, matrix):
+        '''Return the box of the image of this box under the affine map
+        ``x -> matrix . x + translation``.
+
+        >>> rot = ((0, -1, 0), (1, 0, 0), (0, 0, 1))
+        >>> AABB((0, 0, 0), (1, 2, inf)).transformed((1, 0, 0), rot)
+        AABB((-1.0, 0.0, 0.0), (1.0, 1.0, inf))
+        '''
+        if self.is_empty():
+            return self
+        lower = []
+        upper = []
+        for row, shift in zip(matrix, translation):
+            low = up = float(shift)
+            for coeff, box_low, box_up in zip(row, self.lower, self.upper):
+                if coeff == 0:
+                    # avoid 0 * inf
+                    continue
+                ends = (coeff * box_low, coeff * box_up)
+                low += min(ends)
+                up += max(ends)
+            lower.append(low)
+            upper.append(up)
+        return AABB(lower, upper)
+
+    def support(self, direction):
+        '''Return the maximum of the scalar product of `direction` with the
+        points of the box (``-inf`` if the box is empty).
+
+        >>> AABB((0, 0, 0), (1, 2, inf)).support((1, -1, 0))
+        1.0
+        >>> AABB((0, 0, 0), (1, 2, inf)).support((0, 0, 1))
+        inf
+        '''
+        if self.is_empty():
+            return -inf
+        value = 0.
+        for coeff, low, up in zip(direction, self.lower, self.upper):
+            if coeff != 0:
+                value += max(coeff * low, coeff * up)
+        return value
+
+    def __eq__(self, other):
+        if not isinstance(other, AABB):
+            return NotImplemented
+        return self.lower == other.lower and self.upper == other.upper
+
+    def __hash__(self):
+        return hash((self.lower, self.upper))
+
+    def __repr__(self):
+        return f'AABB({self.lower!r}, {self.upper!r})'
+
+
+def transform_box(box, transform, inverse=False):
+    '''Return the box of the image of `box` under an MCNP transformation
+    (12 parameters: the translation and the rotation matrix, row by row), with
+    the same convention as :func:`~.Transformation.transformation`. If
+    `inverse` is true, apply the inverse transformation instead.
+
+    >>> quarter = (1, 2, 3, 0, 1, 0, -1, 0, 0, 0, 0, 1)
+    >>> box = AABB((1, 0, 0), (2, 1, 1))
+    >>> transform_box(box, quarter)
+    AABB((0.0, 3.0, 3.0), (1.0, 4.0, 4.0))
+    >>> transform_box(transform_box(box, quarter), quarter, inverse=True)
+    AABB((1.0, 0.0, 0.0), (2.0, 1.0, 1.0))
+    '''
+    translation = np.array(transform[:3], dtype=float)
+    matrix = np.array(transform[3:12], dtype=float).reshape(3, 3)
+    if inverse:
+        return box.transformed(-matrix.dot(translation), matrix)
+    return box.transformed(translation, matrix.T)
+
+
+def half_space_box(surf, side):
+    '''Return the bounding box of the half-space lying on the given `side`
+    (``1`` or ``-1``) of the :class:`~.SurfaceT4` `surf`.
+
+    >>> from ..Surface.SurfaceT4 import SurfaceT4
+    >>> half_space_box(SurfaceT4(T4S.SPHERE, (0, 0, 1, 2)), -1)
+    AABB((-2.0, -2.0, -1.0), (2.0, 2.0, 3.0))
+    >>> half_space_box(SurfaceT4(T4S.SPHERE, (0, 0, 1, 2)), 1)
+    AABB((-inf, -inf, -inf), (inf, inf, inf))
+    >>> half_space_box(SurfaceT4(T4S.PLANEY, (3,)), -1)
+    AABB((-inf, -inf, -inf), (inf, 3.0, inf))
+    '''
+    type_surf = surf.type_surface
+    params = [float(param) for param in surf.param_surface]
+    box = _HALF_SPACES.get(type_surf, _unbounded)(params, side)
+    if surf.transform is not None:
+        box = box.transformed(*surf.transform)
+    return box
+
+
+def collection_box(surf_coll, sign):
+    '''Return the bounding box of the region lying on the side of sign `sign`
+    of the :class:`~.SurfaceCollection` `surf_coll`.
+
+    The negative side of a collection is the intersection of the negative
+    sides of its surfaces, and the positive side is the union of the positive
+    sides (see :meth:`~.CellConversion.pot_expand_surfs`).
+    '''
+    if sign < 0:
+        box = AABB.full()
+        for surf, side in surf_coll:
+            box &= half_space_box(surf, -side)
+        return box
+    box = AABB.empty()
+    for surf, side in surf_coll:
+        box |= half_space_box(surf, side)
+    return box
+
+
+def mcnp_half_space_box(surf, side):
+    '''Return the bounding box of the half-space lying on the given `side` of
+    the :class:`~.SurfaceMCNP` `surf`, computed from its conversion to T4.'''
+    return collection_box(conversion_surface_params(0, surf), side)
+
+
+def _unbounded(_params, _side):
+    return AABB.full()
+
+
+def _plane_axis(axis):
+    def box(params, side):
+        if side > 0:
+            return AABB.slab(axis, params[0], inf)
+        return AABB.slab(axis, -inf, params[0])
+    return box
+
+
+def _plane(params, side):
+    # a x + b y + c z + d > 0 is bounded only if the plane is orthogonal to
+    # one of the axes
+    normal, offset = params[:3], params[3]
+    axes = [axis for axis, coeff in enumerate(normal) if coeff != 0]
+    if len(axes) != 1:
+        return AABB.full()
+    axis = axes[0]
+    position = -offset / normal[axis]
+    if (normal[axis] > 0) == (side > 0):
+        return AABB.slab(axis, position, inf)
+    return AABB.slab(axis, -inf, position)
+
+
+def _sphere(params, side):
+    if side > 0:
+        return AABB.full()
+    radius = params[3]
+    return AABB.around(params[:3], (radius, radius, radius))
+
+
+def _cylinder_axis(axis):
+    def box(params, side):
+        if side > 0:
+            return AABB.full()
+        center = list(params[:2])
+        center.insert(axis, 0.)
+        radius = params[2]
+        half_widths = [radius, radius]
+        half_widths.insert(axis, inf)
+        return AABB.around(center, half_widths)
+    return box
+
+
+def _cylinder(params, side):
+    if side > 0:
+        return AABB.full()
+    center, radius, direction = params[:3], params[3], params[4:7]
+    # the cylinder is unbounded along the axes that are not orthogonal to its
+    # direction
+    half_widths = [radius if coord == 0 else inf for coord in direction]
+    return AABB.around(center, half_widths)
+
+
+def _torus_axis(axis):
+    def box(params, side):
+        if side > 0:
+            return AABB.full()
+        center, major, minor = params[:3], params[3], max(params[4:6])
+        half_widths = [major + minor] * 3
+        half_widths[axis] = minor
+        return AABB.around(center, half_widths)
+    return box
+
+
+def _quadric(params, side):
+    # the region params < 0 (or params > 0) is bounded only if it is the
+    # inside of an ellipsoid
+    if side > 0:
+        params = [-param for param in params]
+    a, b, c, d, e, f, g, h, j, k = params
+    quad = np.array([[a, d / 2, f / 2],
+                     [d / 2, b, e / 2],
+                     [f / 2, e / 2, c]])
+    eigenvalues = np.linalg.eigvalsh(quad)
+    # degenerate quadrics (e.g. elliptic cylinders) may have a small positive
+    # eigenvalue because of rounding errors
+    if eigenvalues[0] <= 1e-10 * np.max(np.abs(eigenvalues)):
+        return AABB.full()
+    linear = np.array([g, h, j])
+    center = -0.5 * np.linalg.solve(quad, linear)
+    value = 0.5 * linear.dot(center) + k
+    if value >= 0:
+        return AABB.empty()
+    inv_diag = np.diag(np.linalg.inv(quad))
+    return AABB.around(center, [sqrt(-value * coeff) for coeff in inv_diag])
+
+
+_HALF_SPACES = {
+    T4S.PLANEX: _plane_axis(0),
+    T4S.PLANEY: _plane_axis(1),
+    T4S.PLANEZ: _plane_axis(2),
+    T4S.PLANE: _plane,
+    T4S.SPHERE: _sphere,
+    T4S.CYLX: _cylinder_axis(0),
+    T4S.CYLY: _cylinder_axis(1),
+    T4S.CYLZ: _cylinder_axis(2),
+    T4S.CYL: _cylinder,
+    T4S.QUAD: _quadric,
+    T4S.TORUSX: _torus_axis(0),
+    T4S.TORUSY: _torus_axis(1),
+    T4S.TORUSZ: _torus_axis(2),
+    # the inside of a cone has two nappes, the outside is unbounded
+}
+
+
+def tree_box(tree, leaf_box):
+    '''Return the bounding box of a :class:`~.GeomTree`. Complements are
+    conservatively bounded by the full space.
+
+    :param leaf_box: a function returning the bounding box of a leaf
+    '''
+    opcodes = tree.opcodes
+
+    def expand(node):
+        if opcodes[node] in (INTE, UNION):
+            return None, tree.args(node)
+        return None, ()
+
+    def combine(node, _context, boxes):
+        opcode = opcodes[node]
+        if opcode == LEAF:
+            return leaf_box(tree.leaves[node])
+        if opcode == INTE:
+            box = AABB.full()
+            for arg_box in boxes:
+                box &= arg_box
+            return box
+        if opcode == UNION:
+            box = AABB.empty()
+            for arg_box in boxes:
+                box |= arg_box
+            return box
+        return AABB.full()
+
+    return tree.fold(expand, combine)
+
+
+class CellBoxes:
+    '''Compute the bounding boxes of MCNP cells, and cache them per cell and
+    per surface.
+
+    The boxes are computed from the current geometry of the cells; if the
+    geometry of a cell changes, its box must be discarded with
+    :meth:`invalidate`.
+    '''
+
+    def __init__(self, dic_cell_mcnp, dic_surface_t4):
+        '''
+        :param dic_cell_mcnp: the dictionary of :class:`~.CellMCNP` objects
+        :param dic_surface_t4: the dictionary associating MCNP surface IDs to
+            the :class:`~.SurfaceCollection` objects resulting from their
+            conversion
+        '''
+        self.dic_cell_mcnp = dic_cell_mcnp
+        self.dic_surface_t4 = dic_surface_t4
+        self.cell_cache = {}
+        self.surface_cache = {}
+
+    def surface(self, surface):
+        '''Return the bounding box of the half-space described by a signed
+        MCNP surface (a :class:`~MIP.geom.semantics.Surface` object).'''
+        cache_key = (surface.surface, surface.sub)
+        box = self.surface_cache.get(cache_key, None)
+        if box is not None:
+            return box
+        surf_coll = self.dic_surface_t4[abs(surface.surface)]
+        sign = 1 if surface.surface > 0 else -1
+        if surface.sub is None:
+            box = collection_box(surf_coll, sign)
+        else:
+            surf, side = surf_coll[surface.sub - 1]
+            box = half_space_box(surf, sign * side)
+        self.surface_cache[cache_key] = box
+        return box
+
+    def leaf(self, leaf):
+        '''Return the bounding box of a leaf of a cell geometry.'''
+        if isCellRef(leaf):
+            return self.cell(leaf.cell)
+        return self.surface(leaf)
+
+    def tree(self, tree):
+        '''Return the bounding box of a cell geometry.'''
+        return tree_box(tree, self.leaf)
+
+    def cell(self, key):
+        '''Return the bounding box of the cell `key`.'''
+        box = self.cell_cache.get(key, None)
+        if box is None:
+            box = self.tree(self.dic_cell_mcnp[key].geometry)
+            self.cell_cache[key] = box
+        return box
+
+    def invalidate(self, key=None):
+        '''Discard the cached box of the cell `key` (of all the cells, by
+        default).'''
+        if key is None:
+            self.cell_cache.clear()
+        else:
+            self.cell_cache.pop(key, None)
+
+
+class VolumeBoxes:
+    '''Compute the bounding boxes of T4 volumes, and cache them per volume and
+    per surface.'''
+
+    def __init__(self, dic_volume, dic_surface):
+        '''
+        :param dic_volume: the dictionary of :class:`~.VolumeT4` objects
+        :param dic_surface: the dictionary of the (numbered)
+            :class:`~.SurfaceT4` objects
+        '''
+        self.dic_volume = dic_volume
+        self.dic_surface = dic_surface
+        self.volume_cache = {}
+        self.surface_cache = {}
+
+    def surface(self, surf_id):
+        '''Return the bounding box of the half-space described by a signed T4
+        surface ID.'''
+        box = self.surface_cache.get(surf_id, None)
+        if box is None:
+            box = half_space_box(self.dic_surface[abs(surf_id)],
+                                 1 if surf_id > 0 else -1)
+            self.surface_cache[surf_id] = box
+        return box
+
+    def equa(self, volume):
+        '''Return the bounding box of the ``EQUA`` part of `volume`.'''
+        box = AABB.full()
+        for surf_id in volume.pluses:
+            box &= self.surface(surf_id)
+        for surf_id in volume.minuses:
+            box &= self.surface(-surf_id)
+        return box
+
+    def volume(self, key):
+        '''Return the bounding box of the volume `key`.'''
+        cache = self.volume_cache
+        box = cache.get(key, None)
+        if box is not None:
+            return box
+        # explicit-stack post-order traversal of the volume operands
+        stack = [key]
+        while stack:
+            vol_key = stack[-1]
+            if vol_key in cache:
+                stack.pop()
+                continue
+            volume = self.dic_volume[vol_key]
+            args = () if volume.ops is None else volume.ops[1]
+            missing = [arg for arg in args if arg not in cache]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            box = self.equa(volume)
+            if volume.ops is not None and volume.ops[0] == 'UNION':
+                for arg in args:
+                    box |= cache[arg]
+            else:
+                for arg in args:
+                    box &= cache[arg]
+            cache[vol_key] = box
+        return cache[key]
+
+    def invalidate(self):
+        '''Discard the cached boxes of all the volumes (the box of a volume
+        depends on the boxes of its operands).'''
+        self.volume_cache.clear()
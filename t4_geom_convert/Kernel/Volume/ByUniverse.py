@@ -23,9 +23,11 @@ from collections import defaultdict
 def by_universe(mcnp_cell_dict):
     '''Classify MCNP cells by the universe which they belong to. Return the
     classification as a dictionary associating the universe number to the list
-    of cell IDs.
+    of cell IDs. Fictive cells are not classified.
     '''
     universe_dict = defaultdict(list)
     for key, val in mcnp_cell_dict.items():
+        if val.fictive:
+            continue
         universe_dict[int(val.universe)].append(key)
     return universe_dict
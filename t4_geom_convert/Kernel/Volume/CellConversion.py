@@ -17,15 +17,25 @@
 #
 # vim: set fileencoding=utf-8 :
 
-from MIP.geom.semantics import GeomExpression, Surface
-from MIP.geom.main import extract_surfaces_list
+from array import array
+from math import ceil, floor, inf
 
-from .TreeFunctions import (isLeaf, isIntersection, isUnion, isSurface,
-                            isCellRef, largestPureIntersectionNode)
+import numpy as np
+
+from MIP.geom.semantics import Surface, Cell
+
+from .GeomTree import GeomTree, LEAF, INTE, UNION, COMPL
+from .TreeFunctions import isSurface, isCellRef, largestPureIntersectionNode
+from .Simplification import simplify
 from .VolumeT4 import VolumeT4
-from .Lattice import (LatticeSpec, latticeVector, LatticeError,
-                      squareLatticeBaseVectors, hexLatticeBaseVectors)
-from ..Transformation.Transformation import transformation, compose_transform
+from .BoundingBox import AABB, CellBoxes, transform_box
+from .Lattice import (LatticeSpec, LatticeBounds, latticeVector,
+                      latticeReciprocal, LatticeError,
+                      squareLatticeBaseVectors, hexLatticeBaseVectors,
+                      squareLatticeCenter, hexLatticeCenter)
+from ..Transformation.Transformation import (transformation, compose_transform,
+                                             chain_transforms)
+from ..Transformation.BatchTranslation import translate_surfaces
 from ..Surface.ConversionSurfaceMCNPToT4 import conversion_surface_params
 from ..Surface.SurfaceCollection import SurfaceCollection
 from .CellMCNP import CellRef
@@ -54,6 +64,30 @@ class CellConversion:
         self.convert_surface_rcache = {}
         self.cell_transform_cache = {}
         self.cell_transform_rcache = {}
+        # structural identities of the converted nodes (see
+        # GeomTree.hash_cons) and the volumes that they were converted to
+        self.node_ids = {}
+        self.convert_node_cache = {}
+        # number of geometry nodes removed by pot_optimise, by cell
+        self.removed_nodes = {}
+        # fictive cells holding the complements of the cells that appear in
+        # #n expressions, and the number of times that they were reused
+        self.complement_cache = {}
+        self.complement_rcache = {}
+        self.complement_reuses = 0
+        # number of lattice elements skipped by develop_lattice because they
+        # lie outside the cells filled with the lattice
+        self.lattice_pruned = 0
+        # bounds inferred by develop_lattice for the lattices that were not
+        # given a --lattice option, by cell
+        self.inferred_bounds = {}
+        # leaf cells of the universes expanded by pot_fill, by universe and
+        # transformation, and the number of times that they were reused
+        self.universe_cache = {}
+        self.universe_reuses = 0
+        # cells created by expand_universe for the elements of nested
+        # universes; they may be shared by several fill sites
+        self.universe_elements = set()
 
     @staticmethod
     def conv_equa(list_surface):
@@ -102,105 +136,157 @@ class CellConversion:
 
     def pot_fill(self, key, dict_universe, inline_filled=False,
                  inline_filling=False):
+        '''Develop the universe filling the cell `key` and return the IDs of
+        the new cells, one for each leaf cell of the (possibly nested)
+        universe.'''
         cell = self.dic_cell_mcnp[key]
         if cell.fillid is None:
             return [key]
-        new_cells = []
-        mcnp_key_filltr = cell.filltr
-        universe = int(cell.fillid)
-        to_process = tuple(cell
-                           for element in dict_universe[universe]
-                           for cell in self.pot_fill(element, dict_universe,
-                                                     inline_filled,
-                                                     inline_filling))
-        for element in to_process:
+        elements = self.expand_universe(int(cell.fillid),
+                                        self.fill_transform(cell),
+                                        dict_universe, inline_filled,
+                                        inline_filling)
+        return [self.fill_element(key, key, element, new_elt_key,
+                                  inline_filled, inline_filling)
+                for element, new_elt_key in elements]
+
+    def expand_universe(self, universe, transform, dict_universe,
+                        inline_filled, inline_filling):
+        '''Return the leaf cells of `universe`, moved to the frame of the
+        filled cell by `transform`, as a list of ``(element, new_elt_key)``
+        pairs: `element` is the original cell, `new_elt_key` is the ID of the
+        transformed cell.
+
+        Nested universes are expanded recursively, after composing their
+        transformations with `transform`; the expansion of each
+        ``(universe, transform)`` pair is computed only once.'''
+        cache_key = (universe, transform, inline_filled, inline_filling)
+        elements = self.universe_cache.get(cache_key, None)
+        if elements is not None:
+            self.universe_reuses += 1
+            return elements
+        cache = not inline_filling
+        elements = []
+        for element in dict_universe[universe]:
             element_cell = self.dic_cell_mcnp[element]
-            new_cell = cell.copy()
-            new_cell.fillid = None
-            new_cell.materialID = element_cell.materialID
-            new_cell.density = element_cell.density
-            new_cell.idorigin = element_cell.idorigin.copy()
-
-            new_cell.idorigin.append(
-                (element_cell.idorigin[0][0]
-                 if element_cell.idorigin else element,
-                 cell.idorigin[0][0] if cell.idorigin else key)
-            )
-
-            cache = not inline_filling
-            new_elt_key = element
-            # the MCNP logic seems to be that if a cell contains a FILL with a
-            # transformation, then any TRCL keyword attached to the cell is
-            # disregarded. This point is tested in integration tests
-            # trcl_fill.imcnp and trcl_filltr.imcnp
-            if mcnp_key_filltr:
-                new_elt_key = self.cell_transform(new_elt_key, mcnp_key_filltr,
-                                                  cache=cache)
-            elif cell.trcl:
-                for trcl in cell.trcl:
-                    new_elt_key = self.cell_transform(new_elt_key, trcl,
-                                                      cache=cache)
-            if inline_filling:
-                tree = self.dic_cell_mcnp[new_elt_key].geometry
-                if inline_filled:
-                    new_cell.geometry = ('*', cell.geometry, tree)
-                else:
-                    new_cell.geometry = ('*', CellRef(key), tree)
+            if transform is None:
+                new_elt_key = element
             else:
-                if inline_filled:
-                    new_cell.geometry = ('*', cell.geometry,
-                                         CellRef(new_elt_key))
-                else:
-                    new_cell.geometry = ('*', CellRef(key),
-                                         CellRef(new_elt_key))
-            self.new_cell_key += 1
-            self.dic_cell_mcnp[self.new_cell_key] = new_cell
-            new_cells.append(self.new_cell_key)
-        return new_cells
+                new_elt_key = self.cell_transform(element, transform,
+                                                  cache=cache)
+            if element_cell.fillid is None:
+                elements.append((element, new_elt_key))
+                continue
+            nested_transform = chain_transforms(
+                [self.fill_transform(element_cell), transform])
+            nested = self.expand_universe(int(element_cell.fillid),
+                                          nested_transform, dict_universe,
+                                          inline_filled, inline_filling)
+            for nested_elt, nested_key in nested:
+                new_key = self.fill_element(element, new_elt_key, nested_elt,
+                                            nested_key, inline_filled,
+                                            inline_filling)
+                self.universe_elements.add(new_key)
+                elements.append((new_key, new_key))
+        self.universe_cache[cache_key] = elements
+        return elements
 
-    def pot_flag(self, p_tree):
-        '''Method that takes a tree and return a tuple of tuple with flag to
-        decorate each tree in the tree.'''
-        if isLeaf(p_tree):
-            return p_tree
-        operator, *args = p_tree
-        new_args = [self.pot_flag(node) for node in args]
+    @staticmethod
+    def fill_transform(cell):
+        '''Return the transformation applied to the universe filling `cell`
+        as a tuple, or `None` if there is no transformation.'''
+        # the MCNP logic seems to be that if a cell contains a FILL with a
+        # transformation, then any TRCL keyword attached to the cell is
+        # disregarded. This point is tested in integration tests
+        # trcl_fill.imcnp and trcl_filltr.imcnp
+        if cell.filltr:
+            return chain_transforms([cell.filltr])
+        return chain_transforms(cell.trcl or [])
+
+    def fill_element(self, key, geom_key, element, new_elt_key,
+                     inline_filled, inline_filling):
+        '''Create the cell representing the intersection of the filled cell
+        `key` with a (transformed) element of the filling universe and return
+        its ID.
+
+        :param geom_key: the ID of the cell whose geometry is used for the
+            filled cell; it differs from `key` if the filled cell has been
+            transformed
+        :param element: the ID of the original element cell, which provides
+            the material and the origin of the new cell
+        :param new_elt_key: the ID of the transformed element cell
+
+        The elements of nested universes are shared by all the fill sites of
+        the universe, so their geometry is always copied into the new cell:
+        each copy is used only once, and :func:`~.inline_cells` can inline
+        the cells that it refers to as if the universe had been expanded
+        separately for each fill site.
+        '''
+        cell = self.dic_cell_mcnp[key]
+        element_cell = self.dic_cell_mcnp[element]
+        new_cell = cell.copy()
+        new_cell.fillid = None
+        new_cell.materialID = element_cell.materialID
+        new_cell.density = element_cell.density
+        new_cell.idorigin = element_cell.idorigin.copy()
+
+        new_cell.idorigin.append(
+            (element_cell.idorigin[0][0]
+             if element_cell.idorigin else element,
+             cell.idorigin[0][0] if cell.idorigin else key)
+        )
+
+        if inline_filled:
+            filled = self.dic_cell_mcnp[geom_key].geometry
+        else:
+            filled = CellRef(geom_key)
+        if inline_filling or new_elt_key in self.universe_elements:
+            filling = self.dic_cell_mcnp[new_elt_key].geometry
+        else:
+            filling = CellRef(new_elt_key)
+        new_cell.geometry = GeomTree.combine('*', filled, filling)
         self.new_cell_key += 1
-        new_tree = [self.new_cell_key, operator]
-        new_tree.extend(new_args)
-        return new_tree
+        self.dic_cell_mcnp[self.new_cell_key] = new_cell
+        return self.new_cell_key
+
+    def pot_flag(self, p_tree):
+        '''Method that takes a :class:`~.GeomTree` and returns a copy where
+        each operator node is decorated with a new key.'''
+        opcodes = p_tree.opcodes
+        keys = array('q', p_tree.keys)
+        for node in p_tree.postorder():
+            if opcodes[node] != LEAF:
+                self.new_cell_key += 1
+                keys[node] = self.new_cell_key
+        return p_tree.with_keys(keys)
 
     def pot_transform(self, p_tree, p_transf):
+        '''Apply the transformation `p_transf` to all the surfaces and cell
+        references in `p_tree`. Complemented cells are left untouched at this
+        stage (they will be handled later).'''
         if not p_transf:
             return p_tree
 
-        if not isLeaf(p_tree):
-            operator, *args = p_tree
-            if operator == '^':
-                # complements stay complements at this stage (they will be
-                # handled later)
-                return p_tree
-
-            # recursively apply the transformation to the arguments of the
-            # operator
-            new_args = [self.pot_transform(node, p_transf) for node in args]
-            new_tree = [operator]
-            new_tree.extend(new_args)
-            return tuple(new_tree)
+        new_leaves = []
+        for leaf in p_tree.leaves:
+            if isCellRef(leaf):
+                leaf = CellRef(self.cell_transform(leaf.cell, p_transf))
+            elif isSurface(leaf):
+                leaf = self.transform_surface(leaf, p_transf)
+            new_leaves.append(leaf)
+        return p_tree.with_leaves(new_leaves)
 
-        if isCellRef(p_tree):
-            new_cell_key = self.cell_transform(p_tree.cell, p_transf)
-            return CellRef(new_cell_key)
-
-        assert isSurface(p_tree)
-        surfs = self.dic_surf_mcnp[abs(p_tree)]
+    def transform_surface(self, surface, p_transf):
+        '''Apply the transformation `p_transf` to `surface`, register the
+        transformed surface and return it.'''
+        surfs = self.dic_surf_mcnp[abs(surface)]
 
         surf_colls = []
         mcnp_surfs = []
         for surface_object, side in surfs:
             new_mcnp_surf = transformation(p_transf, surface_object)
             mcnp_surfs.append((new_mcnp_surf, side))
-            surf_coll = conversion_surface_params(p_tree, new_mcnp_surf)
+            surf_coll = conversion_surface_params(surface, new_mcnp_surf)
             surf_colls.append((surf_coll, side))
 
         surf_coll = SurfaceCollection.join(surf_colls)
@@ -212,16 +298,23 @@ class CellConversion:
         self.dic_surf_t4[new_key] = surf_coll
         self.dic_surf_mcnp[new_key] = mcnp_surfs
 
-        return Surface(new_key) if p_tree >= 0 else Surface(-new_key)
-
-    def pot_convert(self, cell, matching, union_ids):
-        tup = self.pot_flag(cell.geometry)
-        expanded = self.pot_expand_surfs(tup, matching)
-        opt_tree = self.pot_optimise(expanded)
+        return Surface(new_key) if surface >= 0 else Surface(-new_key)
+
+    def pot_convert(self, cell, matching, union_ids, key=None):
+        '''Convert the MCNP cell `cell` and return the ID of the resulting
+        T4 volume, or `None` if the cell is empty. If `key` is given, the
+        number of nodes removed from the cell geometry by :meth:`pot_optimise`
+        is recorded in :attr:`removed_nodes`.'''
+        tree = self.pot_flag(cell.geometry)
+        expanded = self.pot_expand_surfs(tree, matching)
+        opt_tree, removed = self.pot_optimise(expanded)
+        if key is not None and removed:
+            self.removed_nodes[key] = removed
         if opt_tree is None:
             # the cell is empty, do not emit a converted cell
             return None
-        return self.pot_to_t4_cell(opt_tree, cell.idorigin, matching,
+        # all the volumes created for this cell share the same provenance
+        return self.pot_to_t4_cell(opt_tree, tuple(cell.idorigin), matching,
                                    union_ids)
 
     def convert_surface(self, surf, idorigin):
@@ -243,176 +336,201 @@ class CellConversion:
         if p_id is not None:
             return p_id
         mcnp_cell = self.dic_cell_mcnp[cell]
-        p_id = self.pot_convert(mcnp_cell, matching, union_ids)
+        p_id = self.pot_convert(mcnp_cell, matching, union_ids, cell)
         self.convert_cellref_cache[cell] = p_id
         return p_id
 
     def pot_to_t4_cell(self, p_tree, idorigin, matching, union_ids):
-        '''Take the tree create by :meth:`pot_flag` and fill a dictionary (of
-        VolumeT4 instance).'''
-        if isSurface(p_tree):
-            return self.convert_surface(p_tree, idorigin)
-
-        if isCellRef(p_tree):
-            return self.convert_cellref(p_tree.cell, matching, union_ids)
-
-        p_id, operator, *args = p_tree
-
-        surfs = []
-        cellrefs = []
-        nodes = []
-        for arg in args:
-            if isSurface(arg):
-                surfs.append(arg)
-            elif isCellRef(arg):
-                cellrefs.append(arg)
+        '''Take the tree created by :meth:`pot_flag` and fill a dictionary
+        (of VolumeT4 instances).
+
+        Structurally identical subtrees are converted only once, even if they
+        appear in different cells: all their occurrences refer to the same
+        (fictive) T4 volume.'''
+        opcodes = p_tree.opcodes
+        leaves = p_tree.leaves
+        node_ids = p_tree.hash_cons(self.node_ids)
+        convert_node_cache = self.convert_node_cache
+
+        def expand(node):
+            # returns the index of the largest pure intersection (for unions)
+            # and the children that must be converted before the node
+            if node_ids[node] in convert_node_cache:
+                return None, ()
+            operator = opcodes[node]
+            args = p_tree.args(node)
+            if operator == INTE:
+                return None, [arg for arg in args if opcodes[arg] != LEAF]
+            if operator != UNION:
+                raise CellConversionError('Converting cell with unexpected '
+                                          f'operator: {operator}')
+            largest = largestPureIntersectionNode(p_tree, args)
+            if largest is None:
+                return None, [arg for arg in args
+                              if not isCellRef(leaves[arg])]
+            # the largest pure intersection is converted first
+            main = args.pop(largest)
+            args.insert(0, main)
+            return largest, args
+
+        def combine(node, largest, arg_ids):
+            operator = opcodes[node]
+            if operator == LEAF:
+                leaf = leaves[node]
+                if isSurface(leaf):
+                    return self.convert_surface(leaf, idorigin)
+                return self.convert_cellref(leaf.cell, matching, union_ids)
+
+            p_id = convert_node_cache.get(node_ids[node], None)
+            if p_id is not None:
+                return p_id
+            p_id = p_tree.keys[node]
+            args = [leaves[arg] for arg in p_tree.args(node)]
+            surfs = [arg for arg in args if isSurface(arg)]
+            cellrefs = [arg for arg in args if isCellRef(arg)]
+
+            if operator == INTE:
+                pluses, minuses = self.conv_equa(surfs)
+                for cellref in cellrefs:
+                    t4_cell_id = self.convert_cellref(cellref.cell, matching,
+                                                      union_ids)
+                    arg_ids.append(t4_cell_id)
+                ops = self.conv_intersection(*arg_ids)
+                self.dic_vol_t4[p_id] = VolumeT4(pluses=pluses,
+                                                 minuses=minuses,
+                                                 ops=ops, idorigin=idorigin)
+                convert_node_cache[node_ids[node]] = p_id
+                return p_id
+
+            if largest is None:
+                for cellref in cellrefs:
+                    t4_cell_id = self.convert_cellref(cellref.cell, matching,
+                                                      union_ids)
+                    arg_ids.append(t4_cell_id)
+                pluses, minuses, ops = self.conv_union_helpers(
+                    *arg_ids, union_ids=union_ids)
             else:
-                nodes.append(arg)
-
-        if operator == '*':
-            pluses, minuses = self.conv_equa(surfs)
-
-            arg_ids = [self.pot_to_t4_cell(node, idorigin, matching, union_ids)
-                       for node in nodes]
-            for cellref in cellrefs:
-                t4_cell_id = self.convert_cellref(cellref.cell, matching,
-                                                  union_ids)
-                arg_ids.append(t4_cell_id)
-
-            ops = self.conv_intersection(*arg_ids)
-
+                main_id, *arg_ids = arg_ids
+                pluses = self.dic_vol_t4[main_id].pluses
+                minuses = self.dic_vol_t4[main_id].minuses
+                for cellref in cellrefs:
+                    t4_cell_id = self.convert_cellref(cellref.cell, matching,
+                                                      union_ids)
+                    arg_ids.append(t4_cell_id)
+                ops = self.conv_union(*arg_ids)
             self.dic_vol_t4[p_id] = VolumeT4(pluses=pluses, minuses=minuses,
                                              ops=ops, idorigin=idorigin)
+            convert_node_cache[node_ids[node]] = p_id
             return p_id
 
-        # here operator == ':'
-        if operator != ':':
-            raise CellConversionError('Converting cell with unexpected '
-                                      f'operator: {operator}')
-        largest = largestPureIntersectionNode(args)
-        if largest is None:
-            arg_ids = [self.pot_to_t4_cell(arg, idorigin, matching, union_ids)
-                       for arg in args if not isCellRef(arg)]
-            for cellref in cellrefs:
-                t4_cell_id = self.convert_cellref(cellref.cell, matching,
-                                                  union_ids)
-                arg_ids.append(t4_cell_id)
-
-            pluses, minuses, ops = self.conv_union_helpers(*arg_ids,
-                                                           union_ids=union_ids)
-        else:
-            main = args.pop(largest)
-            main_id = self.pot_to_t4_cell(main, idorigin, matching, union_ids)
-            pluses = self.dic_vol_t4[main_id].pluses
-            minuses = self.dic_vol_t4[main_id].minuses
-            arg_ids = [self.pot_to_t4_cell(arg, idorigin, matching, union_ids)
-                       for arg in args]
-            for cellref in cellrefs:
-                t4_cell_id = self.convert_cellref(cellref.cell, matching,
-                                                  union_ids)
-                arg_ids.append(t4_cell_id)
-            ops = self.conv_union(*arg_ids)
-        self.dic_vol_t4[p_id] = VolumeT4(pluses=pluses, minuses=minuses,
-                                         ops=ops, idorigin=idorigin)
-        return p_id
+        return p_tree.fold(expand, combine)
 
     def pot_optimise(self, p_tree):
-        '''Method that optimizes the MCNP cells.'''
-
-        if p_tree is None or isLeaf(p_tree):
-            return p_tree
-
-        p_id, operator, *args = p_tree
-        new_args = [self.pot_optimise(node) for node in args]
-        if operator == '*' and any(node is None for node in new_args):
-            # this cell is empty, propagate the None
-            return None
-        new_args = [node for node in new_args if node is not None]
-        new_node = [p_id, operator]
-        for node in new_args:
-            if isIntersection(node) and operator == '*':
-                new_node.extend(node[2:])
-            elif isUnion(node) and operator == ':':
-                new_node.extend(node[2:])
-            else:
-                new_node.append(node)
-
-        # we check if the cell is an intersection and contains the same surface
-        # with opposite signs; in that case we do not emit the cell at all,
-        # because it would be empty and because TRIPOLI-4 does not like
-        # surfaces to appear with both signs at the same time
-        if operator != '*':
-            return new_node
-        pluses = {surf for surf in new_node[2:]
-                  if isSurface(surf) and surf > 0}
-        minuses = {-surf for surf in new_node[2:]
-                   if isSurface(surf) and surf < 0}
-        if pluses & minuses:
-            return None
+        '''Method that optimizes the MCNP cells (see :func:`~.simplify`).
+        Returns a pair made of the optimized tree (or `None` if the cell is
+        empty) and of the number of nodes that were removed.'''
 
-        return new_node
+        if p_tree is None:
+            return p_tree, 0
+        return simplify(p_tree)
 
     def pot_expand_surfs(self, p_tree, matching):
-        '''Replace collections of surfaces with ASTs representing the
+        '''Replace collections of surfaces with nodes representing the
         intersection/union of the collection (necessary for one-nappe cones and
         macrobodies). Also replace MCNP surface IDs with T4 surface IDs.
         '''
-        if not isLeaf(p_tree):
-            p_id, operator, *args = p_tree
-            new_tree = [p_id, operator]
-            new_tree.extend(self.pot_expand_surfs(node, matching)
-                            for node in args)
-            return new_tree
-
-        if isCellRef(p_tree):
-            return p_tree
-
-        assert isSurface(p_tree)
-        t4_ids = matching[abs(p_tree.surface)]
-
-        if p_tree.sub is not None:
-            if p_tree.sub > len(t4_ids):
-                msg = (f'found facet {p_tree.sub} of surface {p_tree.surface} '
-                       f'in a cell definition, but surface {p_tree.surface} '
-                       f'does not have enough facets ({len(t4_ids)})')
-                raise CellConversionError(msg)
-            sub_surf = t4_ids[p_tree.sub - 1]
-            return sub_surf if p_tree.surface > 0 else -sub_surf
+        def expand_leaf(tree, leaf):
+            if isCellRef(leaf):
+                return tree.add_leaf(leaf)
+            assert isSurface(leaf)
+            t4_ids = matching[abs(leaf.surface)]
+
+            if leaf.sub is not None:
+                if leaf.sub > len(t4_ids):
+                    msg = (f'found facet {leaf.sub} of surface '
+                           f'{leaf.surface} in a cell definition, but '
+                           f'surface {leaf.surface} does not have enough '
+                           f'facets ({len(t4_ids)})')
+                    raise CellConversionError(msg)
+                sub_surf = t4_ids[leaf.sub - 1]
+                return tree.add_leaf(sub_surf if leaf.surface > 0
+                                     else -sub_surf)
+
+            if len(t4_ids) == 1:
+                surf = t4_ids[0]
+                return tree.add_leaf(surf if leaf.surface > 0 else -surf)
 
-        if len(t4_ids) == 1:
-            surf = t4_ids[0]
-            return surf if p_tree.surface > 0 else -surf
+            self.new_cell_key += 1
+            if leaf.surface < 0:
+                args = [tree.add_leaf(-surf) for surf in t4_ids]
+                return tree.add_node(INTE, args, self.new_cell_key)
+            args = [tree.add_leaf(surf) for surf in t4_ids]
+            return tree.add_node(UNION, args, self.new_cell_key)
 
-        self.new_cell_key += 1
-        if p_tree.surface < 0:
-            new_node = [self.new_cell_key, '*']
-            new_node.extend(-surf for surf in t4_ids)
-        else:
-            new_node = [self.new_cell_key, ':']
-            new_node.extend(surf for surf in t4_ids)
-        return GeomExpression(new_node)
+        return p_tree.rebuild(leaf_fn=expand_leaf)
 
     def pot_complement(self, tree):
-        if not isinstance(tree, (list, tuple)):
+        '''Replace the cell complements in `tree` with the inverse of the
+        geometry of the complemented cells.'''
+        if not tree.has_opcode(COMPL):
             return tree
-        if tree[0] == '^':
-            cell = self.dic_cell_mcnp[int(tree[1])]
-            if cell.lattice is not None:
-                # This is a complement of a lattice! What does that even mean
-                # We return a patently empty cell, which hopefully will later
-                # be optimised away by pot_optimise
-                surfaces = extract_surfaces_list(cell.geometry)
-                assert len(surfaces) >= 1  # otherwise things are REALLY weird
-                return ['*', surfaces[0], -surfaces[0]]
-            new_geom = self.pot_complement(cell.geometry)
-            return new_geom.inverse()
-        new_tree = [tree[0]]
-        new_tree.extend(self.pot_complement(node) for node in tree[1:])
-        result = GeomExpression(new_tree)
-        return result
+
+        def drop_cell(new_tree, leaf):
+            # the operands of the complements are replaced with their nodes
+            if isinstance(leaf, Cell):
+                return None
+            return new_tree.add_leaf(leaf)
+
+        def complement_node(new_tree, node, args):
+            if tree.opcodes[node] != COMPL:
+                return new_tree.add_node(tree.opcodes[node], args,
+                                         tree.keys[node])
+            cell_key = int(tree.leaves[tree.args(node)[0]])
+            return new_tree.graft(self.complement_cell(cell_key))
+
+        return tree.rebuild(leaf_fn=drop_cell, node_fn=complement_node)
+
+    def complement_cell(self, cell_key):
+        '''Return the tree for the complement of the given cell.
+
+        The complement of each cell is computed only once: it is stored as the
+        geometry of a new fictive cell, and the returned tree is a reference
+        to it.'''
+        cell = self.dic_cell_mcnp[cell_key]
+        if cell.lattice is not None:
+            # This is a complement of a lattice! What does that even mean
+            # We return a patently empty cell, which hopefully will later
+            # be optimised away by pot_optimise
+            surfaces = cell.geometry.surfaces()
+            assert len(surfaces) >= 1  # otherwise things are REALLY weird
+            return GeomTree.combine('*', surfaces[0], -surfaces[0])
+        comp_key = self.complement_cache.get(cell_key, None)
+        if comp_key is not None:
+            self.complement_reuses += 1
+            return GeomTree.from_ast(CellRef(comp_key))
+        geometry = self.pot_complement(cell.geometry)
+        comp_cell = cell.copy()
+        comp_cell.geometry = geometry.inverse(self.complement_leaf)
+        comp_cell.fillid = None
+        comp_cell.lattice = None
+        comp_cell.fictive = True
+        self.new_cell_key += 1
+        comp_key = self.new_cell_key
+        self.dic_cell_mcnp[comp_key] = comp_cell
+        self.complement_cache[cell_key] = comp_key
+        self.complement_rcache[comp_key] = cell_key
+        return GeomTree.from_ast(CellRef(comp_key))
+
+    def complement_leaf(self, leaf):
+        '''Return the complement of a leaf of a tree processed by
+        :meth:`pot_complement`.'''
+        if isCellRef(leaf):
+            # the complement of the complement of a cell is the cell itself
+            return CellRef(self.complement_rcache[leaf.cell])
+        return leaf.inverse()
 
     def extract_surfaces(self, cell):
-        surf_ids = extract_surfaces_list(cell.geometry)
+        surf_ids = cell.geometry.surfaces()
         return [(surf.param_surface, side if surf_id > 0 else -side)
                 for surf_id in surf_ids
                 for surf, side in self.dic_surf_mcnp[abs(surf_id)]]
@@ -433,7 +551,21 @@ class CellConversion:
             raise LatticeError(f'{err} (in cell {key})') from None
 
         # compute the base vectors of the lattice
+        parent_boxes = self.lattice_parent_boxes(cell)
         domain = cell.fillid
+        if domain.bounds is None:
+            try:
+                if cell.lattice == 1:
+                    center = squareLatticeCenter(surfaces)
+                else:
+                    center = hexLatticeCenter(surfaces)
+                bounds = self.infer_lattice_bounds(lat_base_vectors, center,
+                                                   parent_boxes)
+            except LatticeError as err:
+                raise LatticeError(f'{err} (in cell {key})') from None
+            self.inferred_bounds[key] = bounds
+            domain = domain.with_bounds(bounds)
+            cell.fillid = domain
         if len(lat_base_vectors) != len(domain.bounds):
             if len(lat_base_vectors) != domain.bounds.dims():
                 msg = ('Problem of domain definition for lattice; expected '
@@ -450,12 +582,27 @@ class CellConversion:
                            'not trivial')
                     raise LatticeError(msg)
 
+        if parent_boxes is not None:
+            cell_box = CellBoxes(self.dic_cell_mcnp,
+                                 self.dic_surf_t4).tree(cell.geometry)
+            planes = self.lattice_planes(cell, surfaces)
+
+        elements = []
         for index, universe in domain.items():
             if universe == 0:
                 continue
             transl = latticeVector(lat_base_vectors, index)
+            if parent_boxes is not None and all(
+                    self.lattice_element_misses(transl, cell_box, planes, box)
+                    for box in parent_boxes):
+                self.lattice_pruned += 1
+                continue
+            elements.append((universe, transl))
+
+        new_cell_keys = self.cell_translate(
+            key, [transl for _, transl in elements])
+        for (universe, transl), new_cell_key in zip(elements, new_cell_keys):
             trnsf = list(transl) + [1., 0., 0., 0., 1., 0., 0., 0., 1.]
-            new_cell_key = self.cell_transform(key, trnsf, cache=False)
             new_cell = self.dic_cell_mcnp[new_cell_key]
             if universe == cell.universe:
                 new_cell.fillid = None
@@ -476,6 +623,124 @@ class CellConversion:
 
         del self.dic_cell_mcnp[key]
 
+    @staticmethod
+    def infer_lattice_bounds(lat_base_vectors, center, parent_boxes):
+        '''Return the smallest index bounds covering the lattice elements
+        that may intersect the given boxes.
+
+        :param lat_base_vectors: the base vectors of the lattice
+        :param center: the center of the base element of the lattice
+        :param parent_boxes: the boxes of the filled cells, as returned by
+            :meth:`lattice_parent_boxes`
+        :raises LatticeError: if the bounds cannot be inferred
+        '''
+        if parent_boxes is None:
+            raise LatticeError('cannot infer the lattice bounds: the lattice '
+                               'universe does not fill any cell; please '
+                               'provide a --lattice option')
+        box = AABB.empty()
+        for parent_box in parent_boxes:
+            box |= parent_box
+        if box.is_empty():
+            return LatticeBounds([(0, 0)] * len(lat_base_vectors))
+        bounds = []
+        for rec_vec in latticeReciprocal(lat_base_vectors):
+            # drop the components that are only due to rounding errors, lest
+            # they multiply infinite box coordinates
+            norm = max(abs(coord) for coord in rec_vec)
+            rec_vec = tuple(coord if abs(coord) > 1e-12 * norm else 0.
+                            for coord in rec_vec)
+            offset = sum(coord * pos for coord, pos in zip(rec_vec, center))
+            low = -box.support(tuple(-coord for coord in rec_vec)) - offset
+            up = box.support(rec_vec) - offset
+            if not -inf < low <= up < inf:
+                raise LatticeError('cannot infer the lattice bounds: the '
+                                   'filled cells are unbounded along a '
+                                   'lattice direction; please provide a '
+                                   '--lattice option')
+            # the lattice elements extend by less than one lattice step from
+            # their centers
+            bounds.append((ceil(low - 1), floor(up + 1)))
+        return LatticeBounds(bounds)
+
+    def lattice_parent_boxes(self, cell):
+        '''Return the bounding boxes of the cells filled with the universe of
+        the lattice `cell`, expressed in the frame of the universe.
+
+        Return `None` if the boxes cannot be used to skip lattice elements,
+        i.e. if the universe does not fill any cell or if it appears in a
+        lattice that has not been developed yet.
+        '''
+        boxes = CellBoxes(self.dic_cell_mcnp, self.dic_surf_t4)
+        parent_boxes = []
+        for key, other in self.dic_cell_mcnp.items():
+            if isinstance(other.fillid, LatticeSpec):
+                # lattice elements may be filled with their own universe
+                if other is not cell and cell.universe in other.fillid.spec:
+                    return None
+                continue
+            if other.fillid != cell.universe:
+                continue
+            box = boxes.cell(key)
+            # see self.pot_fill(): the filling universe is transformed by FILL
+            # or, if absent, by TRCL
+            if other.filltr:
+                transforms = [other.filltr]
+            else:
+                transforms = other.trcl or []
+            for transform in reversed(transforms):
+                box = transform_box(box, transform, inverse=True)
+            parent_boxes.append(box)
+        return parent_boxes or None
+
+    def lattice_planes(self, cell, surfaces):
+        '''Return the half-spaces bounding the base element of the lattice
+        `cell`, as ``(direction, point)`` pairs describing the regions
+        ``direction . (x - point) > 0``, or an empty list if the geometry of
+        the lattice is not a plain intersection of surfaces.
+
+        :param surfaces: the surfaces of the lattice, as returned by
+            :meth:`extract_surfaces`
+        '''
+        tree = cell.geometry
+        root = tree.root
+        if tree.is_leaf(root):
+            leaf_nodes = [root]
+        elif tree.opcodes[root] == INTE:
+            leaf_nodes = tree.args(root)
+        else:
+            return []
+        for node in leaf_nodes:
+            if not tree.is_leaf(node):
+                return []
+            leaf = tree.leaves[node]
+            # the positive side of a surface collection is a union
+            if not isSurface(leaf) or (
+                    int(leaf) > 0 and len(self.dic_surf_mcnp[int(leaf)]) > 1):
+                return []
+        return [(tuple(side * coord for coord in normal), point)
+                for (point, normal), side in surfaces]
+
+    @staticmethod
+    def lattice_element_misses(transl, cell_box, planes, box):
+        '''Return `True` if the lattice element translated by `transl`
+        certainly does not intersect the box `box`.
+
+        :param cell_box: the bounding box of the base element of the lattice
+        :param planes: the half-spaces of the base element, as returned by
+            :meth:`lattice_planes`
+        '''
+        shifted = cell_box.transformed(transl, ((1, 0, 0), (0, 1, 0),
+                                                (0, 0, 1)))
+        if (shifted & box).is_empty():
+            return True
+        for direction, point in planes:
+            threshold = sum(coord * (shift + pos) for coord, shift, pos
+                            in zip(direction, transl, point))
+            if box.support(direction) <= threshold:
+                return True
+        return False
+
     def apply_trcl(self, trcls, geometry):
         '''Apply the given coordinate transformation to the given cell AST
         (`geometry`).
@@ -488,6 +753,54 @@ class CellConversion:
             geometry = self.pot_transform(geometry, trcl)
         return geometry
 
+    def cell_translate(self, cell_key, translations):
+        '''Translate `cell` by each of the given vectors, update dictionaries
+        and return the IDs of the new cells.
+
+        This is equivalent to calling :meth:`cell_transform` (without caching)
+        once per translation, but each surface of the cell is translated by
+        all the vectors at once (see :func:`~.translate_surfaces`).'''
+        if not translations:
+            return []
+        cell = self.dic_cell_mcnp[cell_key]
+        tree = cell.geometry
+        vectors = np.array(translations, dtype=float)
+        new_surfs = {}
+        for leaf in tree.leaves:
+            if not isSurface(leaf) or abs(leaf) in new_surfs:
+                continue
+            surface = abs(leaf)
+            translated = translate_surfaces(surface,
+                                            self.dic_surf_mcnp[surface],
+                                            vectors)
+            new_keys = []
+            for surf_coll, mcnp_surfs in translated:
+                for surf, _ in surf_coll.surfs[1:]:
+                    surf.idorigin = tuple(list(surf.idorigin) + ['aux surf'])
+                self.new_surf_key += 1
+                self.dic_surf_t4[self.new_surf_key] = surf_coll
+                self.dic_surf_mcnp[self.new_surf_key] = mcnp_surfs
+                new_keys.append(self.new_surf_key)
+            new_surfs[surface] = new_keys
+
+        new_cell_keys = []
+        for i, transl in enumerate(translations):
+            trnsf = list(transl) + [1., 0., 0., 0., 1., 0., 0., 0., 1.]
+            new_leaves = []
+            for leaf in tree.leaves:
+                if isCellRef(leaf):
+                    leaf = CellRef(self.cell_transform(leaf.cell, trnsf))
+                elif isSurface(leaf):
+                    new_key = new_surfs[abs(leaf)][i]
+                    leaf = Surface(new_key) if leaf >= 0 else Surface(-new_key)
+                new_leaves.append(leaf)
+            new_cell = cell.copy()
+            new_cell.geometry = tree.with_leaves(new_leaves)
+            self.new_cell_key += 1
+            self.dic_cell_mcnp[self.new_cell_key] = new_cell
+            new_cell_keys.append(self.new_cell_key)
+        return new_cell_keys
+
     def cell_transform(self, cell_key, transform, cache=True):
         '''Apply `transform` to `cell`, update dictionaries and return the ID
         of the new cell.'''
@@ -20,13 +20,15 @@
 
 from collections import defaultdict
 from ..Progress import Progress
-from .TreeFunctions import isLeaf, isCellRef, isSurface
+from .GeomTree import GeomTree
+from .TreeFunctions import isCellRef
 
 
 def find_occurrences(dic):
     '''Find occurrences of inlined cells. Returns a dictionary associating
     a cell id `key` to a list of cell ids where `key` is inlined.'''
-    key_stack = [key for key, value in dic.items() if value.universe == 0]
+    key_stack = [key for key, value in dic.items()
+                 if value.universe == 0 and not value.fictive]
     enqueued = set(key_stack)
     occurrences = defaultdict(list)
 
@@ -48,23 +50,15 @@ def extract_subcells(geometry):
     list.
 
     >>> from .CellMCNP import CellRef
-    >>> extract_subcells(['*', 1, 2])
+    >>> extract_subcells(GeomTree.from_ast(['*', 1, 2]))
     []
-    >>> extract_subcells(['*', 1, CellRef(100), 2])
+    >>> extract_subcells(GeomTree.from_ast(['*', 1, CellRef(100), 2]))
     [100]
-    >>> extract_subcells(['*', 1, CellRef(100), [':', CellRef(5), CellRef(6)]])
+    >>> extract_subcells(GeomTree.from_ast(['*', 1, CellRef(100),
+    ...                                     [':', CellRef(5), CellRef(6)]]))
     [100, 5, 6]
     '''
-    if isSurface(geometry):
-        return []
-    _operator, *args = geometry
-    subcells = []
-    for arg in args:
-        if isCellRef(arg):
-            subcells.append(arg.cell)
-        elif not isLeaf(arg):
-            subcells.extend(extract_subcells(arg))
-    return subcells
+    return [leaf.cell for leaf in geometry.leaves if isCellRef(leaf)]
 
 
 def compute_inlining_scores(dic, occurrences):
@@ -81,19 +75,18 @@ def compute_inlining_scores(dic, occurrences):
 
 
 def geometry_size(geometry):
-    '''Count the number of nodes in the given geometry.
+    '''Count the number of leaves in the given geometry.
 
     >>> from .CellMCNP import CellRef
-    >>> geometry_size(['*', 1, 2])
+    >>> geometry_size(GeomTree.from_ast(['*', 1, 2]))
     2
-    >>> geometry_size(['*', 1, CellRef(100), 2])
+    >>> geometry_size(GeomTree.from_ast(['*', 1, CellRef(100), 2]))
     3
-    >>> geometry_size(['*', 1, CellRef(100), [':', CellRef(5), CellRef(6)]])
+    >>> geometry_size(GeomTree.from_ast(['*', 1, CellRef(100),
+    ...                                  [':', CellRef(5), CellRef(6)]]))
     4
     '''
-    if isLeaf(geometry):
-        return 1
-    return sum(geometry_size(arg) for arg in geometry[1:])
+    return len(geometry.leaf_values())
 
 
 def inline_cells(dic, max_inline_score):
@@ -122,19 +115,15 @@ def inline_cells_worker(geometry, dic, to_inline):
     '''Inline the cells in the `to_inline` set in `geometry`. Returns a new
     geometry.
     '''
-    if isLeaf(geometry):
+    if not any(isCellRef(leaf) and leaf.cell in to_inline
+               for leaf in geometry.leaves):
         return geometry
-    new_geometry = [geometry[0]]
-    for arg in geometry[1:]:
-        if isCellRef(arg):
-            if arg.cell in to_inline:
-                sub_geometry = dic[arg.cell].geometry
-                new_geometry.append(inline_cells_worker(sub_geometry, dic,
-                                                        to_inline))
-            else:
-                new_geometry.append(arg)
-        elif isSurface(arg):
-            new_geometry.append(arg)
-        else:
-            new_geometry.append(inline_cells_worker(arg, dic, to_inline))
-    return new_geometry
+
+    def inline_leaf(new_geometry, leaf):
+        if isCellRef(leaf) and leaf.cell in to_inline:
+            sub_geometry = inline_cells_worker(dic[leaf.cell].geometry, dic,
+                                               to_inline)
+            return new_geometry.graft(sub_geometry)
+        return new_geometry.add_leaf(leaf)
+
+    return geometry.rebuild(leaf_fn=inline_leaf)
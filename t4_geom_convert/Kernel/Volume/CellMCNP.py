@@ -22,7 +22,8 @@ class CellMCNP:
     CELLS.'''
 
     def __init__(self, p_materialID, p_density, syntaxTreeMCNP, p_importance,
-                 p_universe, fillid, filltr, lattice, trcl, idorigin=None):
+                 p_universe, fillid, filltr, lattice, trcl, idorigin=None,
+                 fictive=False):
         '''
         Constructor
         :param: p_materialID : identity number of the material
@@ -32,6 +33,8 @@ class CellMCNP:
         :param: p_universe : universe associated to the cell
         :param: fill : directive Fill of MCNP
         :param trcl: a list of transformations to apply to this cell
+        :param fictive: whether this cell was generated by the converter and
+        must only be used through :class:`CellRef` (e.g. cell complements)
         '''
         self.materialID = p_materialID
         self.density = p_density
@@ -43,6 +46,7 @@ class CellMCNP:
         self.lattice = lattice
         self.trcl = trcl
         self.idorigin = [] if idorigin is None else idorigin.copy()
+        self.fictive = fictive
 
     def evaluateASTMCNP(self):
         '''Method evaluating the syntax tree of the geometry of a cell of MCNP.
@@ -61,13 +65,13 @@ class CellMCNP:
         return CellMCNP(self.materialID, self.density, geom_copy,
                         self.importance, self.universe, self.fillid,
                         self.filltr, self.lattice, self.trcl.copy(),
-                        self.idorigin.copy())
+                        self.idorigin.copy(), self.fictive)
 
     def __repr__(self):
         return (f'CellMCNP({self.materialID!r}, {self.density!r}, '
                 f'{self.geometry!r}, {self.importance!r}, {self.universe!r}, '
                 f'{self.fillid!r}, {self.filltr!r}, {self.lattice!r}, '
-                f'{self.trcl!r}, {self.idorigin!r})')
+                f'{self.trcl!r}, {self.idorigin!r}, {self.fictive!r})')
 
 
 class CellRef:
@@ -79,3 +83,11 @@ class CellRef:
 
     def __repr__(self):
         return f'CellRef({self.cell!r})'
+
+    def __eq__(self, other):
+        if isinstance(other, CellRef):
+            return self.cell == other.cell
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((CellRef, self.cell))
@@ -17,10 +17,9 @@
 #
 # vim: set fileencoding=utf-8 :
 
+from collections import deque, namedtuple
 from warnings import warn
 
-from MIP.geom.main import extract_surfaces_list
-
 from ..Progress import Progress
 from ..FileHandlers.Parser.ParseMCNPCell import ParseMCNPCell
 from ..Surface.SurfaceT4 import SurfaceT4
@@ -35,14 +34,22 @@ from .ByUniverse import by_universe
 from .CellInlining import inline_cells
 
 
-def construct_volume_t4(mcnp_parser, lattice_params, cell_cache_path,
+SweepStats = namedtuple('SweepStats', 'volumes surfaces')
+SweepStats.__doc__ = '''Number of volumes removed by
+:func:`remove_unused_volumes`, and number of surfaces that were only used by
+the removed volumes.'''
+
+
+def construct_volume_t4(mcnp_parser, lattice_params, store,
                         dic_surface_t4, dic_surface_mcnp, inline_filled,
-                        inline_filling, max_inline_score):
+                        inline_filling, max_inline_score,
+                        geom_parser='tatsu', jobs=1, verbose=False):
     '''A function that orchestrates the conversion steps for TRIPOLI-4
     volumes.'''
     dic_vol_t4 = DictVolumeT4()
-    mcnp_dict, skipped_cells = ParseMCNPCell(mcnp_parser, cell_cache_path,
-                                             lattice_params).parse()
+    mcnp_dict, skipped_cells = ParseMCNPCell(mcnp_parser, store,
+                                             lattice_params,
+                                             geom_parser, jobs).parse()
 
     tr_surf_ids = extract_tr_surf_ids(mcnp_dict) - set(dic_surface_mcnp)
     if tr_surf_ids:
@@ -79,22 +86,34 @@ def construct_volume_t4(mcnp_parser, lattice_params, cell_cache_path,
                 cell.geometry = conv.apply_trcl(cell.trcl, cell.geometry)
                 mcnp_dict[key] = cell
 
-    # treat complements
+    # treat complements; the complemented cells are added to mcnp_dict as
+    # fictive cells
+    cell_keys = list(mcnp_dict)
     with Progress('converting complement for cell',
-                  len(mcnp_dict), max(mcnp_dict)) as progress:
-        for i, key in enumerate(mcnp_dict):
+                  len(cell_keys), max(cell_keys)) as progress:
+        for i, key in enumerate(cell_keys):
             progress.update(i, key)
             new_geom = conv.pot_complement(mcnp_dict[key].geometry)
             mcnp_dict[key].geometry = new_geom
+    if conv.complement_reuses:
+        print(f'built {len(conv.complement_cache)} cell complements, reused '
+              f'{conv.complement_reuses} times')
 
     # treat LAT
-    lat_cells = [key for key, value in mcnp_dict.items() if value.lattice]
+    lat_cells = sort_lattices(mcnp_dict)
     if lat_cells:
         with Progress('developing lattice in cell',
                       len(lat_cells), max(lat_cells)) as progress:
             for i, key in enumerate(lat_cells):
                 progress.update(i, key)
                 conv.develop_lattice(key)
+        for key, bounds in conv.inferred_bounds.items():
+            ranges = ','.join(f'{low}:{up}' for low, up in bounds)
+            print(f'inferred lattice bounds for cell {key}: --lattice '
+                  f'{key},{ranges}')
+        if conv.lattice_pruned:
+            print(f'skipped {conv.lattice_pruned} lattice elements lying '
+                  'outside the filled cells')
 
     # treat FILL
     dict_universe = by_universe(mcnp_dict)
@@ -111,13 +130,16 @@ def construct_volume_t4(mcnp_parser, lattice_params, cell_cache_path,
                 except SurfaceConversionError as err:
                     raise SurfaceConversionError(f'{err} (while converting '
                                                  f'cell {key})') from None
+        if conv.universe_reuses:
+            print(f'expanded {len(conv.universe_cache)} universe instances, '
+                  f'reused {conv.universe_reuses} times')
 
     # consider inlining cells
     inline_cells(mcnp_dict, max_inline_score)
 
     conv_keys = [(key, value) for key, value in mcnp_dict.items()
                  if value.importance != 0 and value.universe == 0
-                 and value.fillid is None]
+                 and value.fillid is None and not value.fictive]
 
     t4_surf_numbering, matching = dic_surface_t4.number_items()
     # insert union planes into the T4 surface dictionary
@@ -135,7 +157,7 @@ def construct_volume_t4(mcnp_parser, lattice_params, cell_cache_path,
         for i, (key, val) in enumerate(conv_keys):
             progress.update(i, key)
             try:
-                j = conv.pot_convert(val, matching, union_ids)
+                j = conv.pot_convert(val, matching, union_ids, key)
             except CellConversionError as err:
                 raise CellConversionError(f'{err} (while converting cell '
                                           f'{key})') from None
@@ -145,9 +167,48 @@ def construct_volume_t4(mcnp_parser, lattice_params, cell_cache_path,
             dic_vol_t4[key] = dic_vol_t4[j].copy()
             dic_vol_t4[key].fictive = False
 
+    if conv.removed_nodes:
+        print(f'simplification removed {sum(conv.removed_nodes.values())} '
+              f'geometry nodes in {len(conv.removed_nodes)} cells')
+        if verbose:
+            for key, removed in sorted(conv.removed_nodes.items()):
+                print(f'  cell {key}: {removed} nodes removed')
+
     return dic_vol_t4, mcnp_dict, t4_surf_numbering, skipped_cells, union_ids
 
 
+def sort_lattices(mcnp_dict):
+    '''Return the keys of the lattice cells, sorted so that each lattice
+    comes after the lattices that it fills. Developing the enclosing lattices
+    first allows :meth:`~.CellConversion.develop_lattice` to see the cells
+    that each lattice fills.
+
+    >>> from .Lattice import LatticeSpec
+    >>> from .CellMCNP import CellMCNP
+    >>> def lattice(universe, fill):
+    ...     return CellMCNP(0, None, None, 1., universe,
+    ...                     LatticeSpec(None, [fill]), None, 1, [])
+    >>> sort_lattices({1: lattice(2, 3), 4: lattice(3, 5), 6: lattice(1, 2)})
+    [6, 1, 4]
+    '''
+    lat_cells = [key for key, value in mcnp_dict.items() if value.lattice]
+    enclosing = {key: [other for other in lat_cells if other != key
+                       and mcnp_dict[key].universe
+                       in mcnp_dict[other].fillid.spec]
+                 for key in lat_cells}
+    depths = {}
+
+    def depth(key):
+        if key not in depths:
+            # guard against (invalid) cyclic definitions
+            depths[key] = 0
+            depths[key] = 1 + max((depth(other) for other in enclosing[key]),
+                                  default=-1)
+        return depths[key]
+
+    return sorted(lat_cells, key=depth)
+
+
 def extract_tr_surf_ids(mcnp_dict):
     '''Return the list of MCNP surface IDs above 1000.
 
@@ -157,49 +218,77 @@ def extract_tr_surf_ids(mcnp_dict):
     '''
     tr_surf_ids = []
     for value in mcnp_dict.values():
-        surfs = extract_surfaces_list(value.geometry)
+        surfs = value.geometry.surfaces()
         tr_surf_ids.extend(abs(int(surf)) for surf in surfs if surf >= 1000)
     return set(tr_surf_ids)
 
 
 def remove_empty_volumes(dic_volume, union_ids):
-    '''Remove cells that are patently empty.'''
-    removed = set()
-    to_remove = [key for key, val in dic_volume.items() if val.empty()]
+    '''Remove cells that are patently empty.
 
-    while to_remove:
-        removed_at_this_step = set()
-        for key in to_remove:
-            val = dic_volume[key]
-            if val.ops is None or val.ops[0] != 'UNION':
-                # This volume is just an intersection with an empty volume, so we can
-                # remove it
-                del dic_volume[key]
-                removed_at_this_step.add(key)
-                continue
+    The IDs in `union_ids` may be negative if the corresponding surfaces have
+    been replaced by surfaces with the opposite orientation (see
+    :func:`~.remove_duplicate_surfaces`).
 
-            # Here val is patently empty, but it also contains a union with other
-            # volumes, so it may not be empty after all. So we replace the surface
-            # definitions with an empty volume
-            val.pluses = set([union_ids[0]])
-            val.minuses = set([union_ids[1]])
+    Emptiness is propagated through a worklist: removing a volume removes the
+    intersections that use it and drops it from the unions that use it. Each
+    volume is looked up through an index of its users, built once, so the
+    dictionary is not rescanned.
 
-        removed |= removed_at_this_step
+    >>> from .VolumeT4 import VolumeT4
+    >>> dic = DictVolumeT4()
+    >>> dic[1] = VolumeT4([1], [1])
+    >>> dic[2] = VolumeT4([2], [], ops=('INTE', (1,)))
+    >>> dic[3] = VolumeT4([3], [], ops=('INTE', (2, 5)))
+    >>> dic[4] = VolumeT4([4], [], ops=('UNION', (3, 5)), fictive=False)
+    >>> dic[5] = VolumeT4([5], [])
+    >>> dic[6] = VolumeT4([6], [6], ops=('UNION', (1, 5)), fictive=False)
+    >>> remove_empty_volumes(dic, (100, 101))
+    >>> for key, volume in dic.items():
+    ...     print(key, volume)
+    4 EQUA PLUS 1 4 UNION 1 5
+    5 EQUA PLUS 1 5 FICTIVE
+    6 EQUA PLUS 1 100 MINUS 1 101 UNION 1 5
+    '''
+    users = {}
+    for key, val in dic_volume.items():
+        if val.ops is not None:
+            for arg in val.ops[1]:
+                users.setdefault(arg, []).append(key)
 
-        # update the list of volumes that must be removed
-        to_remove = []
-        for key, val in dic_volume.items():
-            if val.ops is None:
+    to_remove = deque()
+    for key, val in dic_volume.items():
+        if not val.empty():
+            continue
+        if val.ops is not None and val.ops[0] == 'UNION':
+            # Here val is patently empty, but it also contains a union with
+            # other volumes, so it may not be empty after all. So we replace
+            # the surface definitions with an empty volume
+            pluses, minuses = CellConversion.conv_equa([union_ids[0],
+                                                        -union_ids[1]])
+            val.pluses = set(pluses)
+            val.minuses = set(minuses)
+        else:
+            to_remove.append(key)
+
+    while to_remove:
+        key = to_remove.popleft()
+        if key not in dic_volume:
+            # already removed
+            continue
+        # This volume is just an intersection with an empty volume, so we can
+        # remove it
+        del dic_volume[key]
+        for user in users.pop(key, ()):
+            user_val = dic_volume.get(user)
+            if user_val is None or user_val.ops is None:
                 continue
-            if val.ops[0] == 'INTE' and any(x in removed for x in val.ops[1]):
-                to_remove.append(key)
-            elif val.ops[0] == 'UNION':
-                new_args = tuple(cell for cell in val.ops[1]
-                                 if cell not in removed)
-                if new_args:
-                    val.ops = (val.ops[0], new_args)
-                else:
-                    val.ops = None
+            if user_val.ops[0] == 'INTE':
+                to_remove.append(user)
+            elif user_val.ops[0] == 'UNION':
+                new_args = tuple(cell for cell in user_val.ops[1]
+                                 if cell != key)
+                user_val.ops = (user_val.ops[0], new_args) if new_args else None
 
 
 def extract_used_surfaces(volumes):
@@ -211,7 +300,12 @@ def remove_unused_volumes(dic):
     '''Remove unused virtual (``FICTIVE``) volumes from the given dictionary.
     This function modifies the given dictionary in place.
 
+    The volumes are marked by a traversal of the ``ops`` references starting
+    from the non-fictive volumes, and the unmarked volumes are swept, so that
+    chains of fictive volumes that only refer to each other are removed too.
+
     :param DictVolumeT4 dic: a dictionary of :class:`~.VolumeT4` objects.
+    :returns: a :class:`SweepStats` object
 
     >>> from .VolumeT4 import VolumeT4
     >>> dic = DictVolumeT4()
@@ -221,12 +315,34 @@ def remove_unused_volumes(dic):
     >>> dic[4] = VolumeT4([], [], ops=None, fictive=True)
     >>> dic[5] = VolumeT4([], [], ops=None, fictive=False)
     >>> remove_unused_volumes(dic)
+    SweepStats(volumes=1, surfaces=0)
+    >>> sorted(list(dic.keys()))
+    [1, 2, 3, 5]
+
+    Chains of unused volumes are removed at once, and the surfaces that are
+    only used by the removed volumes are counted:
+
+    >>> dic[6] = VolumeT4([7], [], ops=['INTE', (4,)], fictive=True)
+    >>> dic[4] = VolumeT4([8], [], ops=['UNION', (3, 6)], fictive=True)
+    >>> remove_unused_volumes(dic)
+    SweepStats(volumes=2, surfaces=2)
     >>> sorted(list(dic.keys()))
     [1, 2, 3, 5]
     '''
-    fictives = set(key for key, volume in dic.items() if volume.fictive)
-    used = set(key for volume in dic.values() if volume.ops is not None
-               for args in volume.ops[1:] for key in args)
-    unused = fictives - used
+    marked = set()
+    stack = [key for key, volume in dic.items() if not volume.fictive]
+    while stack:
+        key = stack.pop()
+        if key in marked or key not in dic:
+            continue
+        marked.add(key)
+        ops = dic[key].ops
+        if ops is not None:
+            stack.extend(ops[1])
+
+    unused = [key for key in dic if key not in marked]
+    unused_surfs = (extract_used_surfaces(dic[key] for key in unused)
+                    - extract_used_surfaces(dic[key] for key in marked))
     for key in unused:
         del dic[key]
+    return SweepStats(len(unused), len(unused_surfs))
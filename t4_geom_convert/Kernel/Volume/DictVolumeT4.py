@@ -17,17 +17,19 @@
 #
 # vim: set fileencoding=utf-8 :
 
-from collections import OrderedDict
 from collections.abc import MutableMapping
 
 
 class DictVolumeT4(MutableMapping):
-    '''A simple wrapper around an :class:`collections.OrderedDict` for storing
-    :class:`~.VolumeT4` objects.'''
+    '''A simple wrapper around a :class:`dict` for storing :class:`~.VolumeT4`
+    objects. Plain dictionaries preserve the insertion order and take less
+    memory than :class:`collections.OrderedDict`.'''
+
+    __slots__ = ('dict_',)
 
     def __init__(self):
         '''Constructor'''
-        self.dict_ = OrderedDict()
+        self.dict_ = {}
 
     def __getitem__(self, key):
         return self.dict_[key]
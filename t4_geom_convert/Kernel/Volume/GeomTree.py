@@ -0,0 +1,489 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''A compact representation for cell geometry trees.
+
+A :class:`GeomTree` stores the nodes of a geometry in flat arrays, in
+post-order: the children of a node always come before the node itself, and
+the root is the last node. Nodes are designated by their index. Operator nodes
+are n-ary and their children are stored as a contiguous range of the
+`children` array; leaves (surfaces, :class:`~.CellRef` objects and the
+:class:`~MIP.geom.semantics.Cell` operands of complements) are stored in the
+`leaves` list.
+
+Trees are never modified once they have been built; the conversion passes
+construct new trees, sharing the arrays that they do not need to change.
+'''
+
+from array import array
+
+from MIP.geom.semantics import GeomExpression, Surface, Cell
+
+
+LEAF, INTE, UNION, COMPL = range(4)
+#: map from the operators used in the MIP ASTs to opcodes
+OPCODES = {'*': INTE, ':': UNION, '^': COMPL}
+#: map from opcodes to the operators used in the MIP ASTs
+OPERATORS = (None, '*', ':', '^')
+
+
+class GeomTree:
+    '''A geometry tree with n-ary operator nodes, stored in flat arrays.
+
+    :ivar opcodes: the opcode of each node (:data:`LEAF`, :data:`INTE`,
+        :data:`UNION` or :data:`COMPL`)
+    :ivar keys: the key of each node (see :meth:`with_keys`), or 0
+    :ivar first: the index in `children` of the first child of each node
+    :ivar counts: the number of children of each node
+    :ivar children: the concatenated lists of children of all the nodes
+    :ivar leaves: the leaf object of each node, or `None` for operator nodes
+    '''
+
+    __slots__ = ('opcodes', 'keys', 'first', 'counts', 'children', 'leaves')
+
+    def __init__(self):
+        self.opcodes = array('b')
+        self.keys = array('q')
+        self.first = array('q')
+        self.counts = array('q')
+        self.children = array('q')
+        self.leaves = []
+
+    def add_leaf(self, leaf):
+        '''Append a leaf and return its index.'''
+        self.opcodes.append(LEAF)
+        self.keys.append(0)
+        self.first.append(len(self.children))
+        self.counts.append(0)
+        self.leaves.append(leaf)
+        return len(self.opcodes) - 1
+
+    def add_node(self, opcode, children, key=0):
+        '''Append an operator node with the given children (a sequence of
+        node indices) and return its index.'''
+        self.opcodes.append(opcode)
+        self.keys.append(key)
+        self.first.append(len(self.children))
+        self.counts.append(len(children))
+        self.children.extend(children)
+        self.leaves.append(None)
+        return len(self.opcodes) - 1
+
+    def graft(self, other):
+        '''Append all the nodes of the tree `other` and return the index of
+        its root.'''
+        offset = len(self.opcodes)
+        child_offset = len(self.children)
+        self.opcodes.extend(other.opcodes)
+        self.keys.extend(other.keys)
+        self.first.extend(first + child_offset for first in other.first)
+        self.counts.extend(other.counts)
+        self.children.extend(child + offset for child in other.children)
+        self.leaves.extend(other.leaves)
+        return len(self.opcodes) - 1
+
+    @classmethod
+    def combine(cls, operator, *operands):
+        '''Build the tree applying `operator` (``'*'`` or ``':'``) to the
+        operands, which may be trees or leaves.
+
+        >>> from MIP.geom.semantics import Surface
+        >>> tree = GeomTree.from_ast(('*', Surface(1), Surface(2)))
+        >>> GeomTree.combine(':', tree, Surface(3))
+        GeomTree((':', ('*', Surface(1, None), Surface(2, None)), \
+Surface(3, None)))
+        '''
+        tree = cls()
+        args = [tree.graft(operand) if isinstance(operand, GeomTree)
+                else tree.add_leaf(operand)
+                for operand in operands]
+        tree.add_node(OPCODES[operator], args)
+        return tree
+
+    @classmethod
+    def from_ast(cls, ast):
+        '''Build a tree from a MIP geometry AST (nested tuples or lists whose
+        first element is the operator).
+
+        >>> from MIP.geom.semantics import Surface
+        >>> tree = GeomTree.from_ast(('*', ('*', Surface(1), Surface(-2)),
+        ...                           (':', Surface(3), Surface(4))))
+        >>> len(tree)
+        7
+        >>> tree.args(tree.root)
+        [2, 5]
+        '''
+        if isinstance(ast, GeomTree):
+            return ast
+        tree = cls()
+        if not isinstance(ast, (tuple, list)):
+            tree.add_leaf(ast)
+            return tree
+        # each entry holds an operator node of the AST, an iterator over its
+        # arguments and the indices of the children added so far
+        stack = [(ast, iter(ast[1:]), [])]
+        while stack:
+            node, arg_iter, args = stack[-1]
+            for arg in arg_iter:
+                if isinstance(arg, (tuple, list)):
+                    stack.append((arg, iter(arg[1:]), []))
+                    break
+                args.append(tree.add_leaf(arg))
+            else:
+                stack.pop()
+                index = tree.add_node(OPCODES[node[0]], args)
+                if stack:
+                    stack[-1][2].append(index)
+        return tree
+
+    def to_ast(self, node=None):
+        '''Convert the subtree rooted at `node` (by default, the whole tree)
+        to a MIP geometry AST, made of :class:`GeomExpression` objects. Node
+        keys are not included.'''
+        if node is None:
+            node = self.root
+        results = [None] * (node + 1)
+        for index in range(node + 1):
+            opcode = self.opcodes[index]
+            if opcode == LEAF:
+                results[index] = self.leaves[index]
+            else:
+                results[index] = GeomExpression(
+                    (OPERATORS[opcode],)
+                    + tuple(results[child] for child in self.args(index)))
+        return results[node]
+
+    @property
+    def root(self):
+        '''The index of the root node.'''
+        return len(self.opcodes) - 1
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def is_leaf(self, node):
+        '''Return `True` if `node` is a leaf.'''
+        return self.opcodes[node] == LEAF
+
+    def args(self, node):
+        '''Return the list of the children of `node`.'''
+        first = self.first[node]
+        return self.children[first:first + self.counts[node]].tolist()
+
+    def leaf_values(self):
+        '''Return the list of the leaf objects, from left to right.'''
+        return [leaf for leaf in self.leaves if leaf is not None]
+
+    def surfaces(self):
+        '''Return the list of the surfaces in this tree, from left to right.
+        Complemented cells are not expanded.
+
+        >>> from MIP.geom.semantics import Surface
+        >>> from .CellMCNP import CellRef
+        >>> tree = GeomTree.from_ast(('*', Surface(1), CellRef(2),
+        ...                           ('^', Cell('3')), Surface(-4)))
+        >>> tree.surfaces()
+        [Surface(1, None), Surface(-4, None)]
+        '''
+        return [leaf for leaf in self.leaves
+                if isinstance(leaf, (int, Surface))]
+
+    def hash_cons(self, table):
+        '''Return the list of the structural identities of the nodes of this
+        tree. Two nodes have the same identity if and only if the subtrees
+        rooted at them have the same operators and the same leaves, in the
+        same order; node keys are ignored.
+
+        `table` maps the structure of the nodes to their identities and is
+        updated with the new structures; pass the same table to several trees
+        to compare their nodes.
+
+        >>> table = {}
+        >>> tree = GeomTree.from_ast(('*', (':', 1, 2), (':', 1, 2), 3))
+        >>> tree.hash_cons(table)
+        [0, 1, 2, 0, 1, 2, 3, 4]
+        >>> GeomTree.from_ast((':', 1, 2)).hash_cons(table)
+        [0, 1, 2]
+        '''
+        opcodes = self.opcodes
+        leaves = self.leaves
+        first = self.first
+        counts = self.counts
+        children = self.children
+        ids = [None] * len(opcodes)
+        for node in self.postorder():
+            opcode = opcodes[node]
+            if opcode == LEAF:
+                structure = (LEAF, leaves[node])
+            else:
+                start = first[node]
+                structure = (opcode, tuple(
+                    ids[arg] for arg in children[start:start + counts[node]]))
+            ids[node] = table.setdefault(structure, len(table))
+        return ids
+
+    def has_opcode(self, opcode):
+        '''Return `True` if any node of the tree has the given opcode.'''
+        return opcode in self.opcodes
+
+    def with_keys(self, keys):
+        '''Return a copy of this tree with the given node keys.'''
+        tree = self._shallow_copy()
+        tree.keys = array('q', keys)
+        return tree
+
+    def with_leaves(self, leaves):
+        '''Return a copy of this tree with the given leaf objects.'''
+        tree = self._shallow_copy()
+        tree.leaves = leaves
+        return tree
+
+    def _shallow_copy(self):
+        tree = GeomTree.__new__(GeomTree)
+        for slot in self.__slots__:
+            setattr(tree, slot, getattr(self, slot))
+        return tree
+
+    def inverse(self, leaf_inverse=None):
+        '''Return the complement of this tree, obtained by De Morgan's laws.
+
+        :param leaf_inverse: a function returning the complement of a leaf; by
+            default, the ``inverse()`` method of the leaf is called
+
+        >>> from MIP.geom.semantics import Surface
+        >>> GeomTree.from_ast(('*', Surface(1), (':', Surface(-2),
+        ...                                     Surface(3)))).inverse()
+        GeomTree((':', Surface(-1, None), ('*', Surface(2, None), \
+Surface(-3, None))))
+        >>> GeomTree.from_ast(('*', 1, 2)).inverse(lambda leaf: -leaf)
+        GeomTree((':', -1, -2))
+        '''
+        if leaf_inverse is None:
+            def leaf_inverse(leaf):
+                return leaf.inverse()
+        tree = self._shallow_copy()
+        swap = (LEAF, UNION, INTE, COMPL)
+        tree.opcodes = array('b', (swap[opcode] for opcode in self.opcodes))
+        tree.leaves = [None if leaf is None else leaf_inverse(leaf)
+                       for leaf in self.leaves]
+        return tree
+
+    def compact(self, root=None):
+        '''Return a tree containing only the nodes that can be reached from
+        `root` (by default, the last node).'''
+        if root is None:
+            root = self.root
+        return self.rebuild(root=root)
+
+    def preorder(self, node=None):
+        '''Iterate over the nodes of the subtree rooted at `node` (by
+        default, the root) in pre-order, using an explicit stack.
+
+        >>> tree = GeomTree.from_ast(('*', 1, (':', 2, 3), 4))
+        >>> [tree.leaves[node] for node in tree.preorder()]
+        [None, 1, None, 2, 3, 4]
+        '''
+        if node is None:
+            node = self.root
+        yield node
+        opcodes = self.opcodes
+        if opcodes[node] == LEAF:
+            return
+        first = self.first
+        counts = self.counts
+        children = self.children
+
+        def args(node):
+            start = first[node]
+            return iter(children[start:start + counts[node]])
+
+        stack = [args(node)]
+        while stack:
+            for arg in stack[-1]:
+                yield arg
+                if opcodes[arg] != LEAF:
+                    stack.append(args(arg))
+                    break
+            else:
+                stack.pop()
+
+    def postorder(self, node=None):
+        '''Return an iterable over the nodes of the subtree rooted at `node`
+        in post-order, using an explicit stack. If `node` is `None`, all the
+        nodes are returned in storage order; this is a post-order of the whole
+        tree, because children are always stored before their parents.
+
+        >>> tree = GeomTree.from_ast(('*', 1, (':', 2, 3), 4))
+        >>> [tree.leaves[node] for node in tree.postorder(tree.root)]
+        [1, 2, 3, None, 4, None]
+        '''
+        if node is None:
+            return range(len(self.opcodes))
+        return self._postorder(node)
+
+    def _postorder(self, node):
+        opcodes = self.opcodes
+        if opcodes[node] == LEAF:
+            yield node
+            return
+        first = self.first
+        counts = self.counts
+        children = self.children
+
+        def args(node):
+            start = first[node]
+            return iter(children[start:start + counts[node]])
+
+        stack = [(node, args(node))]
+        while stack:
+            node, arg_iter = stack[-1]
+            for arg in arg_iter:
+                if opcodes[arg] != LEAF:
+                    stack.append((arg, args(arg)))
+                    break
+                yield arg
+            else:
+                stack.pop()
+                yield node
+
+    def fold(self, expand, combine, node=None):
+        '''Compute a value for the subtree rooted at `node` (by default, the
+        root) bottom-up, using an explicit stack.
+
+        `expand(node)` is called when the operator `node` is first visited
+        and must return a pair ``(context, children)``, where `children` is
+        the sequence of the nodes whose values are needed to compute the value
+        of `node`. They are evaluated one after the other, in the given order;
+        then ``combine(node, context, values)`` is called with the list of
+        their values, and must return the value of `node`. Leaves are not
+        expanded: their value is ``combine(leaf, None, [])``. Side effects
+        happen in the same order as in the equivalent recursive function.
+
+        >>> tree = GeomTree.from_ast(('*', 1, (':', 2, 3), 4))
+        >>> def expand(node):
+        ...     return None, tree.args(node)
+        >>> def combine(node, _context, values):
+        ...     return tree.leaves[node] if tree.is_leaf(node) else sum(values)
+        >>> tree.fold(expand, combine)
+        10
+        '''
+        if node is None:
+            node = self.root
+        opcodes = self.opcodes
+        if opcodes[node] == LEAF:
+            return combine(node, None, [])
+        context, children = expand(node)
+        # each entry holds a node, its context, an iterator over the children
+        # whose values are needed and the values computed so far
+        stack = [(node, context, iter(children), [])]
+        while True:
+            node, context, child_iter, values = stack[-1]
+            for child in child_iter:
+                if opcodes[child] == LEAF:
+                    values.append(combine(child, None, []))
+                    continue
+                child_context, grandchildren = expand(child)
+                stack.append((child, child_context, iter(grandchildren), []))
+                break
+            else:
+                stack.pop()
+                value = combine(node, context, values)
+                if not stack:
+                    return value
+                stack[-1][3].append(value)
+
+    def rebuild(self, leaf_fn=None, node_fn=None, root=None):
+        '''Build a new tree by mapping the nodes of this tree in post-order.
+
+        `leaf_fn(tree, leaf)` must add the replacement for the leaf object
+        `leaf` to the new tree `tree` (a leaf or a whole subtree) and return
+        its index, or return `None` to drop the leaf. By default, leaves are
+        copied.
+
+        `node_fn(tree, node, args)` must do the same for the operator `node`
+        of this tree; `args` is the list of the indices of its rebuilt
+        children in the new tree (`None` for the dropped ones). By default,
+        the node is copied and the dropped children are discarded.
+
+        If `root` is given, only the subtree rooted at `root` is rebuilt.
+        The result is compacted if some of its nodes are not reachable from
+        its root; `None` is returned if the root itself was dropped.
+
+        >>> tree = GeomTree.from_ast(('*', 1, (':', 2, 3), 4))
+        >>> tree.rebuild(lambda new, leaf: new.add_leaf(-leaf))
+        GeomTree(('*', -1, (':', -2, -3), -4))
+        >>> tree.rebuild(lambda new, leaf: new.add_leaf(leaf) if leaf % 2
+        ...                                else None)
+        GeomTree(('*', 1, (':', 3)))
+        '''
+        opcodes = self.opcodes
+        leaves = self.leaves
+        first = self.first
+        counts = self.counts
+        children = self.children
+        keys = self.keys
+        tree = GeomTree()
+        new_index = [None] * len(opcodes)
+        for node in self.postorder(root):
+            opcode = opcodes[node]
+            if opcode == LEAF:
+                if leaf_fn is None:
+                    new_index[node] = tree.add_leaf(leaves[node])
+                else:
+                    new_index[node] = leaf_fn(tree, leaves[node])
+                continue
+            start = first[node]
+            args = [new_index[arg]
+                    for arg in children[start:start + counts[node]]]
+            if node_fn is None:
+                new_index[node] = tree.add_node(
+                    opcode, [arg for arg in args if arg is not None],
+                    keys[node])
+            else:
+                new_index[node] = node_fn(tree, node, args)
+
+        new_root = new_index[self.root if root is None else root]
+        if new_root is None:
+            return None
+        # the new tree is made of the nodes reachable from new_root if and
+        # only if all the other nodes are referenced by some node
+        if (new_root != tree.root
+                or len(set(tree.children)) != len(tree.opcodes) - 1):
+            return tree.rebuild(root=new_root)
+        return tree
+
+    def evaluate(self):
+        '''Return a string representation of the geometry.'''
+        ast = self.to_ast()
+        return ast.evaluate() if hasattr(ast, 'evaluate') else str(ast)
+
+    def __eq__(self, other):
+        if not isinstance(other, GeomTree):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot)
+                   for slot in self.__slots__)
+
+    def __repr__(self):
+        return f'GeomTree({self.to_ast()!r})'
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
@@ -252,9 +252,21 @@ def parse_ranges(intervals):
 class LatticeSpec:
     '''A simple class that holds a list of `n*m*l` integers and provides
     n-dimensional indexing into the list.
+
+    If `bounds` is `None`, the lattice is filled with a single universe over
+    bounds that are still unknown; `spec` must then contain only this
+    universe, and the bounds must be set with :meth:`with_bounds` before the
+    lattice can be indexed.
     '''
 
     def __init__(self, bounds, spec):
+        if bounds is None:
+            if not isinstance(spec, (list, tuple)) or len(spec) != 1:
+                raise ValueError('The `spec` argument must have exactly one '
+                                 'element if `bounds` is None')
+            self.bounds = None
+            self.spec = spec
+            return
         if not isinstance(bounds, LatticeBounds):
             raise TypeError('Expected a LatticeBounds object for the `bounds` '
                             f'argument, got a {type(bounds)}')
@@ -315,6 +327,16 @@ class LatticeSpec:
     def __repr__(self):
         return f'LatticeSpec({self.bounds}, {self.spec})'
 
+    def with_bounds(self, bounds):
+        '''Return a copy of a lattice filled with a single universe, extended
+        to the given bounds.
+
+        >>> spec = LatticeSpec(None, [3])
+        >>> spec.with_bounds(LatticeBounds([(0, 1), (-1, 0)]))
+        LatticeSpec([(0, 1), (-1, 0)], [3, 3, 3, 3])
+        '''
+        return LatticeSpec(bounds, list(self.spec) * bounds.size())
+
     def __iter__(self):
         yield from self.spec
 
@@ -356,6 +378,29 @@ def squareLatticeBaseVectors(surfaces):
     return latticeReciprocal(lat_rec_vectors)
 
 
+def squareLatticeCenter(surfaces):
+    '''Compute the center of the base cell of a square lattice.
+
+    Along the directions where the base cell is unbounded, the returned point
+    lies at the origin.
+
+    >>> surfaces = [(((3, 0, 0), (1, 0, 0)), -1), (((1, 0, 0), (1, 0, 0)), 1),
+    ...             (((0, 0, 2), (0, 0, 1)), 1), (((0, 0, 4), (0, 0, 1)), -1)]
+    >>> squareLatticeCenter(surfaces)
+    (2.0, 0.0, 3.0)
+    '''
+    lat_rec_vectors = squareLatticeReciprocalVecs(surfaces)
+    lat_base_vectors = latticeReciprocal(lat_rec_vectors)
+    center = (0., 0., 0.)
+    for i, (rec_vec, base_vec) in enumerate(zip(lat_rec_vectors,
+                                                lat_base_vectors)):
+        (point_1, _), _ = surfaces[2 * i]
+        (point_2, _), _ = surfaces[2 * i + 1]
+        coord = 0.5 * (scal(rec_vec, point_1) + scal(rec_vec, point_2))
+        center = vsum(center, rescale(coord, base_vec))
+    return center
+
+
 def hexLatticeBaseVectors(surfaces):
     '''Compute the base vectors for a hexagonal lattice.'''
     vertices_0, axis = hexVertices(surfaces, 0)
@@ -370,6 +415,21 @@ def hexLatticeBaseVectors(surfaces):
     return base_vecs
 
 
+def hexLatticeCenter(surfaces):
+    '''Compute the center of the base cell of a hexagonal lattice.
+
+    If the base cell has no axial bounds, the returned point lies on the plane
+    through the origin orthogonal to the prism axis.
+    '''
+    vertices, axis = hexVertices(surfaces, 0)
+    center = rescale(1. / len(vertices), vsum(*vertices))
+    if len(surfaces) == 8:
+        bottom_pt = projectPointOnPlane(center, surfaces[-1][0], axis)
+        top_pt = projectPointOnPlane(center, surfaces[-2][0], axis)
+        center = rescale(0.5, vsum(bottom_pt, top_pt))
+    return center
+
+
 def hexVertices(surfs, first_side):
     '''Return the vertices of a base of the hexagonal prism described by the
     given surfaces and the direction of the prism axis.
@@ -0,0 +1,154 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Boolean simplification of cell geometries.
+
+The simplification works on :class:`~.GeomTree` objects whose surfaces have
+already been expanded to signed T4 surface IDs, so that ``-s`` is the
+complement of ``s``. The following rules are applied bottom-up, until the tree
+does not contain any empty or full subtree (except for the whole tree, which
+may be empty):
+
+* nested operators of the same kind are flattened;
+* duplicate operands are removed (idempotence);
+* an intersection containing ``s`` and ``-s`` is empty, and a union containing
+  ``s`` and ``-s`` is full;
+* empty operands make intersections empty and are dropped from unions; full
+  operands make unions full and are dropped from intersections;
+* ``A ∩ (A ∪ B)`` is simplified to ``A`` and ``A ∪ (A ∩ B)`` to ``A``
+  (absorption);
+* operators with a single operand are replaced by their operand.
+'''
+
+from .GeomTree import LEAF, INTE, UNION
+from .TreeFunctions import isSurface
+
+
+#: marker for the subtrees that cover the whole space (empty subtrees are
+#: marked by `None`)
+FULL = -1
+
+
+class FullRegionError(Exception):
+    '''Raised when a whole geometry simplifies to the full space, which cannot
+    be represented as a tree.'''
+
+
+def simplify(tree):
+    '''Simplify the geometry `tree` according to the rules described in the
+    module documentation.
+
+    :param GeomTree tree: the geometry, after surface expansion
+    :returns: a pair ``(simplified, removed)``, where `simplified` is the
+        simplified tree (or `None` if the geometry is empty) and `removed` is
+        the number of nodes that were removed. If the geometry covers the whole
+        space, `tree` is returned unchanged.
+
+    >>> from .GeomTree import GeomTree
+    >>> simplify(GeomTree.from_ast(('*', 1, (':', 1, 2), (':', 3, -3))))
+    (GeomTree(1), 7)
+    >>> simplify(GeomTree.from_ast(('*', 1, (':', 2, 3), -1)))
+    (None, 6)
+    >>> simplify(GeomTree.from_ast((':', (':', 1, 2), ('*', 1, -1), 2)))
+    (GeomTree((':', 1, 2)), 5)
+    >>> simplify(GeomTree.from_ast((':', 1, -1)))
+    (GeomTree((':', 1, -1)), 0)
+    '''
+    try:
+        simplified = _simplify(tree)
+    except FullRegionError:
+        return tree, 0
+    removed = len(tree) - (0 if simplified is None else len(simplified))
+    return simplified, removed
+
+
+def _simplify(tree):
+    '''Return the simplified tree, or `None` if it is empty. Raise
+    :exc:`FullRegionError` if it is full.'''
+    opcodes = tree.opcodes
+    keys = tree.keys
+    root = tree.root
+    # the structural identity of each node of the new tree (see
+    # GeomTree.hash_cons), and the table mapping structures to identities
+    identities = []
+    table = {}
+
+    def region(node, value):
+        if value == FULL and node == root:
+            raise FullRegionError()
+        return value
+
+    def copy_leaf(new_tree, leaf):
+        identities.append(table.setdefault((LEAF, leaf), len(table)))
+        return new_tree.add_leaf(leaf)
+
+    def simplify_node(new_tree, node, args):
+        operator = opcodes[node]
+        if operator == INTE:
+            absorbing, neutral, dual = None, FULL, UNION
+        elif operator == UNION:
+            absorbing, neutral, dual = FULL, None, INTE
+        else:
+            identities.append(table.setdefault(
+                (operator, tuple(identities[arg] for arg in args)),
+                len(table)))
+            return new_tree.add_node(operator, args, keys[node])
+
+        if absorbing in args:
+            return region(node, absorbing)
+
+        new_opcodes = new_tree.opcodes
+        new_args = []
+        seen = set()
+        for arg in args:
+            if arg == neutral:
+                continue
+            if new_opcodes[arg] == operator:
+                sub_args = new_tree.args(arg)
+            else:
+                sub_args = (arg,)
+            for sub_arg in sub_args:
+                identity = identities[sub_arg]
+                if identity not in seen:
+                    seen.add(identity)
+                    new_args.append(sub_arg)
+
+        # an intersection with the same surface with opposite signs is empty;
+        # besides, TRIPOLI-4 does not like surfaces to appear with both signs
+        # at the same time
+        leaves = new_tree.leaves
+        surfs = {leaves[arg] for arg in new_args
+                 if new_opcodes[arg] == LEAF and isSurface(leaves[arg])}
+        if any(-surf in surfs for surf in surfs):
+            return region(node, absorbing)
+
+        new_args = [arg for arg in new_args
+                    if new_opcodes[arg] != dual
+                    or not any(identities[sub_arg] in seen
+                               for sub_arg in new_tree.args(arg))]
+
+        if not new_args:
+            return region(node, neutral)
+        if len(new_args) == 1:
+            return new_args[0]
+        identities.append(table.setdefault(
+            (operator, tuple(identities[arg] for arg in new_args)),
+            len(table)))
+        return new_tree.add_node(operator, new_args, keys[node])
+
+    return tree.rebuild(leaf_fn=copy_leaf, node_fn=simplify_node)
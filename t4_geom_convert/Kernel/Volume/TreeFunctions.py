@@ -17,99 +17,71 @@
 #
 # vim: set fileencoding=utf-8 :
 
-from MIP.geom.semantics import GeomExpression, Surface
+from MIP.geom.semantics import Surface
 from .CellMCNP import CellRef
+from .GeomTree import LEAF, INTE
 
 
-def isLeaf(tree):
-    '''Function which tells if a tree is an instance of a Surface or a
-    Geometry.
+def isSurface(leaf):
+    '''Returns `True` if the leaf object `leaf` is a surface.
 
     :rtype: bool
     '''
-    if isinstance(tree, (tuple, list, GeomExpression)):
-        return False
-    if isinstance(tree, (int, Surface, CellRef)):
-        return True
-    return False
+    return isinstance(leaf, (int, Surface))
 
 
-def isSurface(tree):
-    '''Returns `True` if `tree` is a surface.
+def isCellRef(leaf):
+    '''Returns `True` if the leaf object `leaf` is a :class:`~.CellRef`.
 
     :rtype: bool
     '''
-    return isLeaf(tree) and isinstance(tree, (int, Surface))
-
-
-def isCellRef(tree):
-    '''Returns `True` if `tree` is a :class:`~.CellRef`.
-
-    :rtype: bool
-    '''
-    return isLeaf(tree) and isinstance(tree, CellRef)
-
-
-def isIntersection(tree):
-    '''Function that tells if a node is an intersection.
-
-    :rtype: bool
-    '''
-    if isinstance(tree, (list, tuple)):
-        if tree[1] == '*':
-            return True
-
-    return False
-
-
-def isUnion(tree):
-    '''Function that tells if a node is a union.
-
-    :rtype: bool
-    '''
-    if isinstance(tree, (list, tuple)):
-        if tree[1] == ':':
-            return True
-
-    return False
-
-
-def largestPureIntersectionNode(nodes):
-    '''Returns the index of the largest node of the `nodes` list that is an
-    intersection of surfaces, or `None` if no such node is present.
-
-    >>> from .CellMCNP import CellRef
-    >>> largestPureIntersectionNode([[2, '*', 1, 2], [3, '*', 4, 5, 6]])
+    return isinstance(leaf, CellRef)
+
+
+def largestPureIntersectionNode(tree, nodes):
+    '''Returns the position in the `nodes` list of the largest node of `tree`
+    that is an intersection of surfaces, or `None` if no such node is present.
+
+    >>> from .GeomTree import GeomTree
+    >>> def largest(*operands):
+    ...     tree = GeomTree.combine(':', *operands)
+    ...     return largestPureIntersectionNode(tree, tree.args(tree.root))
+    >>> def inte(*surfs):
+    ...     return GeomTree.from_ast(('*',) + surfs)
+    >>> def union(*surfs):
+    ...     return GeomTree.from_ast((':',) + surfs)
+    >>> largest(inte(1, 2), inte(4, 5, 6))
     1
-    >>> largestPureIntersectionNode([4, 5, 6])
+    >>> largest(4, 5, 6)
     0
-    >>> largestPureIntersectionNode([[2, '*', 1, 2],
-    ...                              [3, '*', 4, 5, 6],
-    ...                              [4, ':', 7, 8, 9, 10]])
+    >>> largest(inte(1, 2), inte(4, 5, 6), union(7, 8, 9, 10))
     1
-    >>> largestPureIntersectionNode([[3, '*', 4, 5, 6],
-    ...                              [2, '*', 1, 2],
-    ...                              [4, ':', 7, 8, 9, 10]])
+    >>> largest(inte(4, 5, 6), inte(1, 2), union(7, 8, 9, 10))
     0
-    >>> largestPureIntersectionNode([[2, ':', 1, 2], [3, ':', 4, 5, 6]])
-    >>> largestPureIntersectionNode([[3, '*', CellRef(4), 5, 6],
-    ...                              [2, '*', 1, 2]])
+    >>> largest(union(1, 2), union(4, 5, 6))
+    >>> largest(inte(CellRef(4), 5, 6), inte(1, 2))
     1
     '''
+    opcodes = tree.opcodes
+    leaves = tree.leaves
     largest_index = None
     largest_len = 0
     for index, node in enumerate(nodes):
-        if isSurface(node) and largest_len < 1:
-            largest_len = 1
-            largest_index = index
-            continue
-        if not isinstance(node, (list, tuple)):
+        if opcodes[node] == LEAF:
+            if isSurface(leaves[node]) and largest_len < 1:
+                largest_len = 1
+                largest_index = index
             continue
-        if node[1] != '*':
+        if opcodes[node] != INTE:
             continue
-        if not all(isSurface(subnode) for subnode in node[2:]):
+        args = tree.args(node)
+        if not all(opcodes[arg] == LEAF and isSurface(leaves[arg])
+                   for arg in args):
             continue
-        if len(node) > largest_len:
-            largest_len = len(node)
+        # any intersection is preferred to a single surface, even if it has
+        # only one argument
+        size = len(args) + 2
+        if size > largest_len:
+            largest_len = size
             largest_index = index
     return largest_index
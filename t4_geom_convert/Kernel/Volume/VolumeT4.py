@@ -17,30 +17,90 @@
 #
 # vim: set fileencoding=utf-8 :
 
+from array import array
+from sys import intern
+
+
+def _compact_ids(ids):
+    '''Return the given surface IDs as a sorted array without duplicates, or
+    as an empty tuple if there are none (empty tuples are shared).'''
+    ids = sorted(set(ids))
+    return array('q', ids) if ids else ()
+
+
 class VolumeT4:
-    '''Class which permits to access precisely of the value of a volume T4.'''
+    '''Class which permits to access precisely of the value of a volume T4.
+
+    The volumes are stored compactly: the surface IDs are kept in sorted
+    arrays, the operator name is interned and the provenance is an immutable
+    tuple, which is shared by the copies of the volume. The surface IDs are
+    returned as sets, and the volume is only modified by assigning to its
+    attributes:
+
+    >>> volume = VolumeT4(pluses=[3, 1, 3], minuses=[2], ops=['INTE', [4, 5]],
+    ...                   idorigin=[(10, 1)])
+    >>> volume.pluses, volume.ops, volume.idorigin
+    ({1, 3}, ('INTE', (4, 5)), ((10, 1),))
+    >>> str(volume)
+    'EQUA PLUS 2 1 3 MINUS 1 2 INTE 2 4 5 FICTIVE'
+    >>> volume.minuses = volume.minuses | {1}
+    >>> volume.empty()
+    True
+    '''
+
+    __slots__ = ('_pluses', '_minuses', '_ops', 'idorigin', 'fictive')
 
     def __init__(self, pluses, minuses, ops=None, idorigin=None, fictive=True):
         '''
         Constructor
         '''
-        self.pluses = set(pluses)
-        self.minuses = set(minuses)
+        self.pluses = pluses
+        self.minuses = minuses
         self.ops = ops
-        self.idorigin = idorigin.copy() if idorigin is not None else []
+        self.idorigin = tuple(idorigin) if idorigin is not None else ()
         self.fictive = fictive
 
+    @property
+    def pluses(self):
+        '''The IDs of the surfaces on whose positive side the volume lies, as
+        a set.'''
+        return set(self._pluses)
+
+    @pluses.setter
+    def pluses(self, ids):
+        self._pluses = _compact_ids(ids)
+
+    @property
+    def minuses(self):
+        '''The IDs of the surfaces on whose negative side the volume lies, as
+        a set.'''
+        return set(self._minuses)
+
+    @minuses.setter
+    def minuses(self, ids):
+        self._minuses = _compact_ids(ids)
+
+    @property
+    def ops(self):
+        '''The operation applied to other volumes, as an ``(operator, IDs)``
+        pair, or `None`.'''
+        return self._ops
+
+    @ops.setter
+    def ops(self, ops):
+        self._ops = None if ops is None else (intern(ops[0]), tuple(ops[1]))
+
     def __str__(self):
         str_params = ['EQUA']
-        if self.pluses:
-            str_params.extend(('PLUS', len(self.pluses)))
-            str_params.extend(sorted(self.pluses))
-        if self.minuses:
-            str_params.extend(('MINUS', len(self.minuses)))
-            str_params.extend(sorted(self.minuses))
-        if self.ops is not None:
-            str_params.extend((self.ops[0], len(self.ops[1])))
-            str_params.extend(self.ops[1])
+        if self._pluses:
+            str_params.extend(('PLUS', len(self._pluses)))
+            str_params.extend(self._pluses)
+        if self._minuses:
+            str_params.extend(('MINUS', len(self._minuses)))
+            str_params.extend(self._minuses)
+        if self._ops is not None:
+            str_params.extend((self._ops[0], len(self._ops[1])))
+            str_params.extend(self._ops[1])
         if self.fictive:
             str_params.append('FICTIVE')
         return ' '.join(str(param) for param in str_params)
@@ -52,9 +112,15 @@ class VolumeT4:
 
     def copy(self):
         '''Return a copy of `self`.'''
-        return VolumeT4(pluses=self.pluses.copy(), minuses=self.minuses,
-                        ops=None if self.ops is None else self.ops,
-                        idorigin=self.idorigin.copy(), fictive=self.fictive)
+        new = VolumeT4.__new__(VolumeT4)
+        # the surface arrays and the tuples are never modified in place, so
+        # they can be shared
+        new._pluses = self._pluses  # pylint: disable=protected-access
+        new._minuses = self._minuses  # pylint: disable=protected-access
+        new._ops = self._ops  # pylint: disable=protected-access
+        new.idorigin = self.idorigin
+        new.fictive = self.fictive
+        return new
 
     def comment(self):
         if self.idorigin:
@@ -64,8 +130,8 @@ class VolumeT4:
     def empty(self):
         '''Return `True` if the cell is patently empty, i.e. if the same
         surface ID appears with opposite signs.'''
-        return bool(self.pluses & self.minuses)
+        return not set(self._pluses).isdisjoint(self._minuses)
 
     def surface_ids(self):
         '''Return the surface IDs used in this volume, as a set.'''
-        return self.pluses | self.minuses
+        return set(self._pluses).union(self._minuses)
@@ -0,0 +1,82 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for :class:`MIP.geom.parsegeom.ASTCache`.'''
+
+import pytest
+
+from MIP.geom.naryparser import GeomParseError
+from MIP.geom.parsegeom import ASTCache, get_ast
+
+
+@pytest.mark.parametrize('backend', ['tatsu', 'nary'])
+def test_shared(backend):
+    '''Test that equal geometries return the same AST object, and that the
+    hits and misses are counted.'''
+    cache = ASTCache()
+    first = get_ast('1 -2 : 3 #4', backend, cache)
+    assert get_ast('1 -2 : 3 #4', backend, cache) is first
+    assert get_ast('  1\n     -2  :  3   #4', backend, cache) is first
+    assert get_ast('1 -2 : 3 #5', backend, cache) is not first
+    assert (cache.hits, cache.misses, len(cache)) == (2, 2, 2)
+
+
+def test_backends():
+    '''Test that the backends do not share cache entries.'''
+    cache = ASTCache()
+    tatsu_ast = get_ast('1 2 3', 'tatsu', cache)
+    nary_ast = get_ast('1 2 3', 'nary', cache)
+    assert tatsu_ast != nary_ast
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_bounded():
+    '''Test that the least recently used entries are evicted.'''
+    cache = ASTCache(maxsize=2)
+    first = get_ast('1', 'nary', cache)
+    get_ast('2', 'nary', cache)
+    assert get_ast('1', 'nary', cache) is first
+    get_ast('3', 'nary', cache)
+    assert len(cache) == 2
+    assert get_ast('1', 'nary', cache) is first
+    assert (cache.hits, cache.misses) == (2, 3)
+    get_ast('2', 'nary', cache)
+    assert cache.misses == 4
+
+
+def test_errors_not_cached():
+    '''Test that geometries that fail to parse are not cached.'''
+    cache = ASTCache()
+    for _ in range(2):
+        with pytest.raises(GeomParseError):
+            get_ast('1 (', 'nary', cache)
+    assert (cache.hits, cache.misses, len(cache)) == (0, 2, 0)
+
+
+def test_no_cache():
+    '''Test that passing ``cache=None`` bypasses the cache.'''
+    assert get_ast('1 2', 'nary', None) is not get_ast('1 2', 'nary', None)
+
+
+def test_clear():
+    '''Test that :meth:`~.ASTCache.clear` resets the cache.'''
+    cache = ASTCache()
+    get_ast('1 2', 'nary', cache)
+    get_ast('1 2', 'nary', cache)
+    cache.clear()
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
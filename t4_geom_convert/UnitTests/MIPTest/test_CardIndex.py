@@ -0,0 +1,109 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the card index of :class:`MIP.mip.MIP`.'''
+
+from pathlib import Path
+
+import pytest
+
+from MIP import mip
+
+
+DATA_DIR = Path(__file__).parents[2] / 'IntegrationTests' / 'data'
+INPUTS = sorted(DATA_DIR.glob('*.imcnp'))
+
+
+def read_input(path, mapped=False):
+    '''Return a :class:`MIP.mip.MIP` parser for the given input file.'''
+    encoding = 'latin1' if 'latin1' in path.name else 'utf-8'
+    return mip.MIP(str(path), encoding=encoding, mapped=mapped)
+
+
+@pytest.mark.parametrize('path', INPUTS, ids=[path.name for path in INPUTS])
+def test_index_matches_scan(path):
+    '''Test that the indexed cards are the same as the ones obtained by
+    scanning the blocks.'''
+    parser = read_input(path)
+    indexed = list(parser.cards(blocks='csd', skipcomments=True))
+    scanned = list(parser._scan_cards('csd', True))  # pylint: disable=W0212
+    assert ([(card.type, card.position, card.lines) for card in indexed]
+            == [(card.type, card.position, card.lines) for card in scanned])
+    assert ([card.parts() for card in indexed]
+            == [card.parts() for card in scanned])
+
+
+@pytest.mark.parametrize('path', INPUTS, ids=[path.name for path in INPUTS])
+def test_data_cards(path):
+    '''Test that querying the index by data card type returns the same cards
+    as filtering the data block.'''
+    parser = read_input(path)
+    data = list(parser.cards(blocks='d', skipcomments=True))
+    for types in [('m',), ('tr', '*tr')]:
+        expected = [card for card in data
+                    if card.parts()[1].strip().lower() in types]
+        assert parser.data_cards(*types) == expected
+
+
+def test_spans():
+    '''Test that card spans point to the card text in the input file.'''
+    parser = read_input(DATA_DIR / 'continuation.imcnp')
+    for card in parser.cards(blocks='csd', skipcomments=True):
+        start, end = card.span
+        text = parser.text[start:end]
+        assert text.startswith(card.lines[0])
+        assert text.rstrip().endswith(card.lines[-1].rstrip())
+
+
+@pytest.mark.parametrize('path', INPUTS, ids=[path.name for path in INPUTS])
+@pytest.mark.parametrize('skipcomments', [True, False])
+def test_mapped_matches_text(path, skipcomments):
+    '''Test that a memory-mapped parser finds the same blocks and cards as a
+    parser that reads the whole file.'''
+    parser = read_input(path)
+    mapped = read_input(path, mapped=True)
+    assert [block[:2] for block in mapped.blocks()] == \
+        [block[:2] for block in parser.blocks()]
+    cards = list(parser.cards(skipcomments=skipcomments))
+    mapped_cards = list(mapped.cards(skipcomments=skipcomments))
+    assert ([(card.type, card.position, card.lines) for card in mapped_cards]
+            == [(card.type, card.position, card.lines) for card in cards])
+    if skipcomments:
+        assert ([card.parts() for card in mapped_cards]
+                == [card.parts() for card in cards])
+    mapped.close()
+
+
+def test_mapped_encoding(tmp_path):
+    '''Test that memory-mapping is refused for encodings that are not
+    ASCII-compatible.'''
+    path = tmp_path / 'utf16.imcnp'
+    path.write_text('title\n1 0 -1\n\n1 so 1\n\nimp:n 1\n',
+                    encoding='utf-16')
+    with pytest.raises(ValueError, match='not ASCII-compatible'):
+        mip.MIP(str(path), encoding='utf-16', mapped=True)
+
+
+def test_mapped_close(tmp_path):
+    '''Test that using the parser as a context manager releases the memory
+    map.'''
+    path = tmp_path / 'input.imcnp'
+    path.write_text('title\n1 0 -1\n\n1 so 1\n\nimp:n 1\n')
+    with mip.MIP(str(path), mapped=True) as parser:
+        assert len(list(parser.cards())) == 3
+    assert parser.buf.closed
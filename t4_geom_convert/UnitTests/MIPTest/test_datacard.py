@@ -0,0 +1,74 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the expansion of abbreviated data cards.'''
+
+import math
+
+import pytest
+from hypothesis import given
+from hypothesis.strategies import floats, lists, sampled_from, one_of
+
+from MIP.mip.datacard import expand_data_card
+
+
+FLOAT_TOKENS = floats(min_value=-1e6, max_value=1e6).map(repr)
+ABBREVIATIONS = sampled_from(['r', '2r', 'j', '3j'])
+
+
+def slow_expand(tokens, **kwargs):
+    '''Expand tokens through the abbreviation loop, by appending a dummy
+    repetition and dropping it from the result.'''
+    result, consumed = expand_data_card(tokens + ['0r'], **kwargs)
+    return result, consumed - 1
+
+
+@given(tokens=lists(FLOAT_TOKENS, min_size=1),
+       dtype=sampled_from(['int', 'float']))
+def test_fast_path(tokens, dtype):
+    '''Test that the fast path for plain numbers agrees with the expansion
+    loop.'''
+    assert expand_data_card(tokens, dtype=dtype) == slow_expand(tokens,
+                                                               dtype=dtype)
+
+
+def test_fast_path_expected():
+    '''Test the fast path with an expected number of items.'''
+    assert expand_data_card(['1', '2', 'other'], expected=2) == ([1., 2.], 2)
+    with pytest.raises(ValueError, match='expected exactly 3 items'):
+        expand_data_card(['1', '2'], expected=3)
+
+
+@given(tokens=lists(one_of(FLOAT_TOKENS, ABBREVIATIONS), min_size=1),
+       dtype=sampled_from(['int', 'float']))
+def test_array(tokens, dtype):
+    '''Test that ``array=True`` returns the same values as the list.'''
+    if tokens[0] in ['r', '2r']:
+        tokens = ['1'] + tokens
+    listed, consumed = expand_data_card(tokens, dtype='float')
+    if dtype == 'int' and None in listed:
+        return
+    listed, consumed = expand_data_card(tokens, dtype=dtype)
+    values, array_consumed = expand_data_card(tokens, dtype=dtype, array=True)
+    assert consumed == array_consumed
+    assert len(values) == len(listed)
+    for value, expected in zip(values.tolist(), listed):
+        if expected is None:
+            assert math.isnan(value)
+        else:
+            assert value == expected
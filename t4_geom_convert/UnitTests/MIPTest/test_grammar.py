@@ -0,0 +1,127 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the generated geometry parser in
+:mod:`MIP.geom.grammars.geom_parser`.'''
+
+import sys
+import types
+import warnings
+from pathlib import Path
+from pkgutil import get_data
+
+import pytest
+import tatsu
+
+from MIP import mip
+from MIP.geom.cells import get_cells
+from MIP.geom.grammars import generate
+from MIP.geom import parsegeom
+from MIP.geom.parsegeom import get_parser, normalize
+from MIP.geom.semantics import GeomSemantics
+
+
+DATA_DIR = Path(__file__).parents[2] / 'IntegrationTests' / 'data'
+INPUTS = sorted(DATA_DIR.glob('*.imcnp'))
+GRAMMAR = get_data('MIP.geom.grammars', 'geom.ebnf').decode('utf-8')
+SOURCE = Path(generate.parser_path).read_text(encoding='utf-8')
+
+
+@pytest.fixture(name='geom_parser')
+def fixture_geom_parser():
+    '''Return the generated parser module, or skip the test if it cannot be
+    loaded with the installed TatSu version.'''
+    try:
+        from MIP.geom.grammars import geom_parser
+    except (ImportError, SyntaxError, TypeError, AttributeError) as err:
+        pytest.skip(f'the generated parser cannot be loaded: {err}')
+    return geom_parser
+
+
+def test_up_to_date():
+    '''Test that the generated parser was generated from the current
+    grammar.'''
+    sha_line = f'EBNF_SHA256 = {generate.ebnf_sha256(GRAMMAR)!r}\n'
+    assert sha_line in SOURCE, \
+        'run `python -m MIP.geom.grammars.generate` to update the parser'
+
+
+def test_regenerate(geom_parser):
+    '''Test that regenerating the parser gives the shipped source code.'''
+    if tatsu.__version__ != geom_parser.TATSU_VERSION:
+        pytest.skip('generated with a different TatSu version')
+    assert generate.generate(GRAMMAR) == SOURCE
+
+
+def test_generated_parser_used(monkeypatch):
+    '''Test that the generated parser can be loaded with the installed TatSu
+    version, and that :func:`~.get_parser` returns it.'''
+    from MIP.geom.grammars import geom_parser
+    monkeypatch.setattr(parsegeom, '_parser', None)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert isinstance(get_parser(), geom_parser.GeomParser)
+
+
+def test_fallback(monkeypatch):
+    '''Test that :func:`~.get_parser` warns and compiles the grammar if the
+    generated parser cannot be loaded.'''
+    monkeypatch.setitem(sys.modules, 'MIP.geom.grammars.geom_parser', None)
+    monkeypatch.setattr(parsegeom, '_parser', None)
+    with pytest.warns(UserWarning, match='compiling the grammar'):
+        parser = get_parser()
+    assert type(parser).__name__ != 'GeomParser'
+    assert parser.parse(normalize('1 -2'), semantics=GeomSemantics())
+
+
+@pytest.mark.parametrize('error', [AttributeError, TypeError])
+def test_fallback_incompatible(monkeypatch, error):
+    '''Test that :func:`~.get_parser` falls back to compiling the grammar if
+    the generated parser fails with an older TatSu version, e.g. because
+    :class:`tatsu.parserconfig.ParserConfig` lacks an attribute.'''
+    def broken_parser():
+        raise error('incompatible TatSu version')
+
+    module = types.ModuleType('MIP.geom.grammars.geom_parser')
+    module.GeomParser = broken_parser
+    monkeypatch.setitem(sys.modules, 'MIP.geom.grammars.geom_parser', module)
+    monkeypatch.setattr(parsegeom, '_parser', None)
+    with pytest.warns(UserWarning, match=error.__name__):
+        parser = get_parser()
+    assert parser.parse(normalize('1 -2'), semantics=GeomSemantics())
+
+
+@pytest.mark.parametrize('path', INPUTS, ids=[path.name for path in INPUTS])
+def test_same_ast(path, geom_parser):
+    '''Test that the generated parser gives the same ASTs as the grammar
+    compiled at runtime.'''
+    compiled = tatsu.compile(GRAMMAR)
+    generated = geom_parser.GeomParser()
+    encoding = 'latin1' if 'latin1' in path.name else 'utf-8'
+    parser = mip.MIP(str(path), encoding=encoding)
+    for _, geom, _ in get_cells(parser).values():
+        if 'like' in geom.lower():
+            continue
+        geom = normalize(geom)
+        try:
+            expected = compiled.parse(geom, semantics=GeomSemantics())
+        except tatsu.exceptions.ParseException:
+            with pytest.raises(tatsu.exceptions.ParseException):
+                generated.parse(geom, semantics=GeomSemantics())
+            continue
+        assert generated.parse(geom, semantics=GeomSemantics()) == expected
@@ -0,0 +1,185 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the :mod:`MIP.geom.naryparser` module.'''
+
+from pathlib import Path
+
+import pytest
+import tatsu.exceptions
+from hypothesis import given
+from hypothesis.strategies import (composite, integers, lists, one_of,
+                                   recursive, sampled_from, just)
+
+from MIP import mip
+from MIP.geom.cells import get_cells
+from MIP.geom.main import extract_surfaces_list
+from MIP.geom.naryparser import GeomParseError
+from MIP.geom.parsegeom import get_ast, normalize
+from MIP.geom.semantics import GeomExpression
+
+
+DATA_DIR = Path(__file__).parents[2] / 'IntegrationTests' / 'data'
+INPUTS = sorted(DATA_DIR.glob('*.imcnp'))
+
+
+def flatten(ast):
+    '''Collect nested nodes of the same operator, so that binary and n-ary
+    ASTs of the same geometry compare equal.'''
+    if not isinstance(ast, GeomExpression) or ast[0] not in '*:':
+        return ast
+    args = [ast[0]]
+    for arg in ast[1:]:
+        arg = flatten(arg)
+        if isinstance(arg, tuple) and arg[0] == ast[0]:
+            args.extend(arg[1:])
+        else:
+            args.append(arg)
+    return tuple(args)
+
+
+def parse_with(geom, backend):
+    '''Parse geom with the given backend and return the flattened AST.
+
+    Return ``None`` if the backend rejects geom as a syntax error, and the
+    exception class if it fails in any other way (e.g. complements of cell
+    complements, which are not supported by :mod:`MIP.geom.semantics`).
+    '''
+    try:
+        return flatten(get_ast(geom, backend))
+    except (tatsu.exceptions.ParseException, GeomParseError):
+        return None
+    except Exception as err:  # pylint: disable=broad-except
+        return type(err)
+
+
+def parse_both(geom):
+    '''Parse geom with both backends and return the flattened ASTs.'''
+    return parse_with(geom, 'tatsu'), parse_with(geom, 'nary')
+
+
+@composite
+def surfaces(draw):
+    '''Generate a random signed surface, possibly with a facet number.'''
+    sign = draw(sampled_from(['', '-', '+']))
+    num = draw(integers(1, 99999))
+    facet = draw(sampled_from(['', '', '.1', '.3']))
+    return f'{sign}{num}{facet}'
+
+
+def blanks():
+    '''Generate some whitespace.'''
+    return sampled_from([' ', '  ', '\t', ' \n     '])
+
+
+@composite
+def joined(draw, children, sep):
+    '''Join a list of generated geometries with the separator.'''
+    items = draw(lists(children, min_size=2, max_size=5))
+    out = items[0]
+    for item in items[1:]:
+        out += draw(sep) + item
+    return out
+
+
+def geometries():
+    '''Generate random valid geometry descriptions.'''
+    leaves = one_of(surfaces(), integers(1, 999).map(lambda n: f'#{n}'),
+                    integers(1, 999).map(lambda n: f'# {n}'))
+    return recursive(
+        leaves,
+        lambda children: one_of(
+            joined(children, blanks()),
+            joined(children, sampled_from([':', ' : ', ' :', ': '])),
+            children.map(lambda geom: f'({geom})'),
+            children.map(lambda geom: f'( {geom} )'),
+            children.map(lambda geom: f'#({geom})'),
+            children.map(lambda geom: f'# ({geom})')),
+        max_leaves=30)
+
+
+def check_equivalent(geom):
+    '''Check that both backends produce equivalent ASTs for geom.
+
+    The only tolerated difference is that the TatSu backend rejects cell
+    complements following the union operator (e.g. ``1 : #2``), because
+    :func:`~MIP.geom.parsegeom.normalize` turns the blank it inserts before
+    ``^(`` into an intersection.
+    '''
+    tatsu_ast, nary_ast = parse_both(geom)
+    if tatsu_ast is None and nary_ast is not None:
+        assert ':*' in normalize(geom)
+    else:
+        assert tatsu_ast == nary_ast
+    return nary_ast
+
+
+@given(geom=geometries())
+def test_random_geometries(geom):
+    '''Test that both backends produce equivalent ASTs.'''
+    assert check_equivalent(geom) is not None
+
+
+@given(geom=lists(one_of(surfaces(), sampled_from(['(', ')', ':', '#', ' ']),
+                          just('1-2')), max_size=12).map(''.join))
+def test_random_strings(geom):
+    '''Test that both backends accept and reject the same strings.'''
+    check_equivalent(geom)
+
+
+@pytest.mark.parametrize('geom', ['', '1 :', ': 1', '(1', '1)', '()',
+                                  '1 ( : 2)', '1-2', '1.23', '#-1', '1 $ 2'])
+def test_errors(geom):
+    '''Test that invalid geometries are rejected.'''
+    with pytest.raises(GeomParseError):
+        get_ast(geom, 'nary')
+
+
+def test_nary():
+    '''Test that chains of the same operator are collected in a single
+    node, and that parentheses are respected.'''
+    ast = get_ast('1 -2 3 : 4 (5 : 6) : -7', 'nary')
+    assert ast[0] == ':'
+    assert len(ast) == 4
+    assert ast[1][0] == '*' and len(ast[1]) == 4
+    assert ast[2][0] == '*' and ast[2][2][0] == ':'
+
+
+def test_deep_nesting():
+    '''Test that deeply nested geometries do not exhaust the stack.'''
+    depth = 5000
+    ast = get_ast('(' * depth + '1 2' + ')' * depth, 'nary')
+    assert extract_surfaces_list(ast) == list(get_ast('1 2', 'nary')[1:])
+
+
+def test_unknown_backend():
+    '''Test that an unknown backend is rejected.'''
+    with pytest.raises(ValueError):
+        get_ast('1 2', 'yacc')
+
+
+@pytest.mark.parametrize('path', INPUTS, ids=[path.name for path in INPUTS])
+def test_decks(path):
+    '''Test that both backends produce equivalent ASTs and the same ordered
+    list of surfaces on the integration-test decks.'''
+    encoding = 'latin1' if 'latin1' in path.name else 'utf-8'
+    parser = mip.MIP(str(path), encoding=encoding)
+    for _, geom, _ in get_cells(parser).values():
+        if isinstance(check_equivalent(geom), tuple):
+            assert (extract_surfaces_list(get_ast(geom, 'tatsu'))
+                    == extract_surfaces_list(get_ast(geom, 'nary')))
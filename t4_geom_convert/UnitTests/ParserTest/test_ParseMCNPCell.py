@@ -0,0 +1,193 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the :mod:`~.ParseMCNPCell` module.'''
+
+import re
+from pathlib import Path
+
+import pytest
+
+from MIP import mip
+from t4_geom_convert.main import parse_args, parse_lattice
+from t4_geom_convert.Kernel.FileHandlers.Parser.ParseMCNPCell import (
+    ParseMCNPCell, ParseMCNPCellError)
+from t4_geom_convert.Kernel.Volume.Lattice import LatticeSpec
+from ...IntegrationTests.test_mcnp_conversion import get_options
+
+
+DATA_DIR = Path(__file__).parents[2] / 'IntegrationTests' / 'data'
+INPUTS = sorted(DATA_DIR.glob('*.imcnp'))
+
+
+def parse_cells(path, jobs, **kwargs):
+    '''Parse the cells of the given input file with `jobs` processes.'''
+    conv_opts, _, _, _ = get_options(path)
+    args = parse_args([str(path)] + conv_opts)
+    mcnp_parser = mip.MIP(str(path), encoding=args.encoding)
+    lattice_params = parse_lattice(args.lattice)
+    return ParseMCNPCell(mcnp_parser, None, lattice_params, jobs=jobs,
+                         **kwargs).parse()
+
+
+def cell_state(cell):
+    '''Return the attributes of a :class:`~.CellMCNP` in a comparable
+    form.'''
+    state = vars(cell).copy()
+    if isinstance(cell.fillid, LatticeSpec):
+        state['fillid'] = (cell.fillid.bounds, list(cell.fillid.spec))
+    return state
+
+
+@pytest.mark.parametrize('path', INPUTS, ids=[path.name for path in INPUTS])
+def test_parallel(path):
+    '''Test that parsing the cells in parallel gives the same result as
+    parsing them serially.'''
+    serial_cells, serial_skipped = parse_cells(path, 1)
+    par_cells, par_skipped = parse_cells(path, 3)
+    assert list(par_cells) == list(serial_cells)
+    assert par_skipped == serial_skipped
+    for key, cell in serial_cells.items():
+        assert cell_state(par_cells[key]) == cell_state(cell)
+
+
+@pytest.mark.parametrize('geom_parser', ['tatsu', 'nary'])
+@pytest.mark.parametrize('bad_cell', ['3 0 -3 ( imp:n=1',
+                                      '3 0 -3 imp:n=1 lat=7',
+                                      '3 like 99 but imp:n=1'])
+def test_parallel_errors(tmp_path, bad_cell, geom_parser):
+    '''Test that parsing errors are the same in parallel and in serial.'''
+    cells = [f'{i} 0 -{i} imp:n=1' for i in range(1, 50)]
+    cells[2] = bad_cell
+    cells[30] = '31 0 -31 ) imp:n=1'
+    surfs = [f'{i} so {i}' for i in range(1, 50)]
+    path = tmp_path / 'bad.imcnp'
+    path.write_text('title\n' + '\n'.join(cells) + '\n\n'
+                    + '\n'.join(surfs) + '\n\nnps 1\n')
+    errors = []
+    for jobs in (1, 2):
+        with pytest.raises(ParseMCNPCellError) as err:
+            parse_cells(path, jobs, geom_parser=geom_parser)
+        errors.append((err.type, str(err.value)))
+    assert errors[0] == errors[1]
+
+
+@pytest.mark.parametrize('jobs', ['-1', '-3'])
+def test_negative_jobs(jobs, capsys):
+    '''Test that a negative number of jobs is rejected on the command
+    line.'''
+    with pytest.raises(SystemExit):
+        parse_args(['--jobs', jobs, 'input.imcnp'])
+    assert '--jobs must be >= 0' in capsys.readouterr().err
+
+
+def test_zero_jobs():
+    '''Test that ``--jobs 0`` is accepted (one worker per CPU).'''
+    assert parse_args(['--jobs', '0', 'input.imcnp']).jobs == 0
+
+
+def write_deck(path, cells):
+    '''Write a minimal input file with the given cell cards, and one sphere
+    for each cell.'''
+    surfs = [f'{i} so {i}' for i in range(1, len(cells) + 1)]
+    path.write_text('title\n' + '\n'.join(cells) + '\n\n'
+                    + '\n'.join(surfs) + '\n\nnps 1\n')
+
+
+def test_like_chain(tmp_path):
+    '''Test that a long chain of ``LIKE n BUT`` cells is resolved, with the
+    BUT options accumulated from the start of the chain.'''
+    n_cells = 2000
+    cells = ['1 1 -1.0 -1 imp:n=1']
+    cells += [f'{i} like {i - 1} but rho=-{i}' for i in range(2, n_cells)]
+    # refer to a cell that comes later in the file
+    cells.append(f'{n_cells} like {n_cells + 1} but u=0')
+    cells.append(f'{n_cells + 1} like {n_cells - 1} but u=3')
+    path = tmp_path / 'chain.imcnp'
+    write_deck(path, cells)
+    parsed, skipped = parse_cells(path, 1)
+    assert list(parsed) == list(range(1, n_cells + 2))
+    for i in range(2, n_cells):
+        assert parsed[i].density == f'-{i}'
+        assert parsed[i].geometry == parsed[1].geometry
+    assert parsed[n_cells].density == f'-{n_cells - 1}'
+    assert parsed[n_cells].universe == 0
+    assert parsed[n_cells + 1].universe == 3
+    assert not skipped
+
+
+@pytest.mark.parametrize('cells, msg', [
+    (['1 like 3 but u=0', '2 like 1 but u=0', '3 like 2 but u=0'],
+     'circular LIKE n BUT references: 1 -> 3 -> 2 -> 1'),
+    (['1 0 -1 imp:n=1', '2 like 2 but u=0'],
+     'circular LIKE n BUT references: 2 -> 2'),
+    (['1 0 -1 imp:n=1', '2 like 1 but u=0', '3 like 7 but u=0'],
+     'LIKE 7 BUT refers to a missing cell (in cell 3)'),
+])
+def test_like_errors(tmp_path, cells, msg):
+    '''Test that cycles and missing cells in ``LIKE n BUT`` references are
+    reported.'''
+    path = tmp_path / 'bad_like.imcnp'
+    write_deck(path, cells)
+    with pytest.raises(ParseMCNPCellError, match=re.escape(msg)):
+        parse_cells(path, 1)
+
+
+def write_imp_deck(path, imp_cards, cell_opts=()):
+    '''Write a minimal input file with three cells and the given importance
+    cards in the data block; `cell_opts` are appended to the cell cards.'''
+    cell_opts = list(cell_opts) + [''] * (3 - len(cell_opts))
+    cells = [f'{i} 0 -{i} {opts}'.rstrip()
+             for i, opts in enumerate(cell_opts, 1)]
+    surfs = [f'{i} so {i}' for i in range(1, 4)]
+    path.write_text('title\n' + '\n'.join(cells) + '\n\n'
+                    + '\n'.join(surfs) + '\n\n' + '\n'.join(imp_cards)
+                    + '\nnps 1\n')
+
+
+def test_importance_jump(tmp_path):
+    '''Test that the J entries of the importance cards are skipped when
+    taking the maximum importance.'''
+    path = tmp_path / 'imp_j.imcnp'
+    write_imp_deck(path, ['imp:n 1 j 0', 'imp:p 0.5 2 j'])
+    parsed, skipped = parse_cells(path, 1)
+    assert [cell.importance for cell in parsed.values()] == [1., 2., 0.]
+    assert skipped == [3]
+
+
+@pytest.mark.parametrize('imp_cards', [['imp:n 1 j 0'],
+                                       ['imp:n 1 j 0', 'imp:p 1 j 0']],
+                         ids=['single', 'multi'])
+def test_importance_jump_everywhere(tmp_path, imp_cards):
+    '''Test that a cell whose importance is skipped in all the importance
+    cards gets no importance, as with a single importance card.'''
+    path = tmp_path / 'imp_j.imcnp'
+    write_imp_deck(path, imp_cards)
+    parsed, skipped = parse_cells(path, 1)
+    assert [cell.importance for cell in parsed.values()] == [1., None, 0.]
+    assert skipped == [3]
+
+
+def test_importance_jump_cell_card(tmp_path):
+    '''Test that the importance on the cell card is used for a cell that is
+    skipped in all the importance cards.'''
+    path = tmp_path / 'imp_j.imcnp'
+    write_imp_deck(path, ['imp:n 1 j 0', 'imp:p 1 j 0'],
+                   ['', 'imp:n=3'])
+    parsed, _ = parse_cells(path, 1)
+    assert [cell.importance for cell in parsed.values()] == [1., 3., 0.]
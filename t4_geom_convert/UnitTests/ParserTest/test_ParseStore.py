@@ -0,0 +1,153 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the :mod:`~.ParseStore` module.'''
+
+import pickle
+from pathlib import Path
+
+import pytest
+
+from MIP import mip
+from t4_geom_convert.main import parse_args, parse_lattice
+from t4_geom_convert.Kernel.FileHandlers.Parser.ParseMCNPCell import (
+    ParseMCNPCell)
+from t4_geom_convert.Kernel.FileHandlers.Parser.ParseMCNPSurface import (
+    parseMCNPSurface)
+from t4_geom_convert.Kernel.FileHandlers.Parser.ParseStore import ParseStore
+from ...IntegrationTests.test_mcnp_conversion import get_options
+from .test_ParseMCNPCell import cell_state
+
+
+DATA_DIR = Path(__file__).parents[2] / 'IntegrationTests' / 'data'
+INPUTS = sorted(DATA_DIR.glob('*.imcnp'))
+
+DECK = '''title
+1 0 -1 2 imp:n=1
+2 1 -1.0 -3 trcl=5 imp:n=1
+3 like 1 but u=0
+4 0 #1 #2 #3 imp:n=0
+
+1 so 10
+2 so 1
+3 5 so 2
+
+m1 1001 1
+tr5 1 0 0
+'''
+
+
+def parse_all(path, store_path):
+    '''Parse the surfaces and cells of the input file at `path`, using the
+    store at `store_path` (or no store if `None`).'''
+    conv_opts, _, _, _ = get_options(path)
+    args = parse_args([str(path)] + conv_opts)
+    mcnp_parser = mip.MIP(str(path), encoding=args.encoding)
+    lattice_params = parse_lattice(args.lattice)
+    store = None if store_path is None else ParseStore(store_path)
+    surfaces = parseMCNPSurface(mcnp_parser, store)
+    cells, skipped = ParseMCNPCell(mcnp_parser, store, lattice_params).parse()
+    if store is not None:
+        store.save()
+    return store, surfaces, cells, skipped
+
+
+def results(surfaces, cells, skipped):
+    '''Return the parse results in a comparable form.'''
+    return ({key: repr(surfs) for key, surfs in surfaces.items()},
+            {key: cell_state(cell) for key, cell in cells.items()},
+            skipped)
+
+
+@pytest.mark.parametrize('path', INPUTS, ids=[path.name for path in INPUTS])
+def test_reuse(path, tmp_path):
+    '''Test that the results reused from the store are the same as the ones
+    obtained without store.'''
+    _, *expected = parse_all(path, None)
+    expected = results(*expected)
+    store_path = tmp_path / 'store.cache'
+    store, *first = parse_all(path, store_path)
+    surfaces, cells, _ = first
+    # only the TR cards are reused, because they are needed for both the
+    # surfaces and the cells
+    assert store.hits == store.misses - len(surfaces) - len(cells)
+    assert results(*first) == expected
+    store, *second = parse_all(path, store_path)
+    assert store.misses == 0
+    assert results(*second) == expected
+
+
+@pytest.mark.parametrize('old, new, reparsed', [
+    # cell 1 is the target of the LIKE in cell 3
+    ('1 0 -1 2 imp:n=1', '1 0 -1 -2 imp:n=1', 2),
+    # cell 2 and surface 3 refer to TR5
+    ('tr5 1 0 0', 'tr5 2 0 0', 2),
+    # changing the layout of a card does not invalidate it
+    ('1 so 10', '1   so\n      10', 0),
+    ('4 0 #1 #2 #3 imp:n=0', '4 0 #1 #2 #3 imp:n=1', 1),
+])
+def test_incremental(tmp_path, old, new, reparsed):
+    '''Test that only the cards affected by a change are parsed again.'''
+    path = tmp_path / 'deck.imcnp'
+    store_path = tmp_path / 'deck.parse.cache'
+    path.write_text(DECK)
+    parse_all(path, store_path)
+    path.write_text(DECK.replace(old, new))
+    store, *reused = parse_all(path, store_path)
+    _, *expected = parse_all(path, None)
+    assert results(*reused) == results(*expected)
+    # the TR card itself is parsed again if it changed
+    assert store.misses == reparsed + ('tr5' in old)
+
+
+def test_stale_entries(tmp_path):
+    '''Test that the results for modified cards are dropped from the
+    store.'''
+    store_path = tmp_path / 'store.cache'
+    store = ParseStore(store_path)
+    store.put(store.key('old'), 1)
+    store.save()
+    store = ParseStore(store_path)
+    store.put(store.key('new'), 2)
+    store.save()
+    store = ParseStore(store_path)
+    assert store.get(store.key('old')) is None
+    assert store.get(store.key('new')) == 2
+
+
+def test_copies():
+    '''Test that the stored results are isolated from the caller.'''
+    store = ParseStore(None)
+    value = [1, 2]
+    store.put('key', value)
+    value.append(3)
+    got = store.get('key')
+    got.append(4)
+    assert store.get('key') == [1, 2]
+
+
+@pytest.mark.parametrize('contents', [b'garbage', pickle.dumps((1, {})), b''])
+def test_bad_file(tmp_path, contents):
+    '''Test that unreadable or outdated stores are ignored.'''
+    store_path = tmp_path / 'store.cache'
+    store_path.write_bytes(contents)
+    store = ParseStore(store_path)
+    assert store.get(store.key('anything')) is None
+    store.put(store.key('anything'), 1)
+    store.save()
+    assert ParseStore(store_path).get(store.key('anything')) == 1
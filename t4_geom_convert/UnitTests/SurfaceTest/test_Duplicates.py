@@ -0,0 +1,158 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the :mod:`~.Duplicates` module.'''
+# pylint: disable=no-value-for-parameter
+
+from math import isclose
+
+from hypothesis import given
+from hypothesis.strategies import (composite, floats, integers, lists,
+                                   sampled_from)
+
+from t4_geom_convert.Kernel.Surface.Duplicates import (
+    remove_duplicate_surfaces, renumber_surfaces)
+from t4_geom_convert.Kernel.Volume.VolumeT4 import VolumeT4
+from t4_geom_convert.Kernel.Surface.SurfaceStore import SurfaceStore
+from t4_geom_convert.Kernel.Surface.SurfaceT4 import SurfaceT4
+from t4_geom_convert.Kernel.Surface.ESurfaceTypeT4 import ESurfaceTypeT4 as T4S
+
+REL_TOL = 1e-10
+ABS_TOL = 1e-12
+TOL = max(REL_TOL, ABS_TOL)
+
+
+@composite
+def surface_dicts(draw):
+    '''Generate dictionaries of surfaces whose parameters are often equal or
+    very close to each other.'''
+    bases = draw(lists(floats(-1e3, 1e3, allow_nan=False), min_size=1,
+                       max_size=4))
+    noises = sampled_from([0., 1e-14, -1e-13, 1e-11, 1e-9, 1e-6])
+
+    def param():
+        return draw(sampled_from(bases)) * (1. + draw(noises))
+
+    surfs = {}
+    for key in range(1, draw(integers(1, 20)) + 1):
+        type_surface = draw(sampled_from([T4S.PLANEX, T4S.PLANEY,
+                                          T4S.PLANE, T4S.SPHERE]))
+        if type_surface == T4S.PLANE:
+            # a plane orthogonal to the x axis, with either orientation
+            sign = draw(sampled_from([-1., 1.]))
+            params = [sign, 0., 0., sign * param()]
+        elif type_surface == T4S.SPHERE:
+            params = [param() for _ in range(4)]
+        else:
+            params = [param()]
+        surfs[key] = SurfaceT4(type_surface, params)
+    return surfs
+
+
+def matches(surf, other):
+    '''Brute-force version of the comparison in
+    :func:`remove_duplicate_surfaces`.'''
+    type_surface, params, _ = surf.canonical(TOL)
+    other_type, other_params, _ = other.canonical(TOL)
+    return (type_surface == other_type
+            and all(isclose(param, other_param, rel_tol=REL_TOL,
+                            abs_tol=ABS_TOL)
+                    for param, other_param in zip(params, other_params)))
+
+
+@given(surfs=surface_dicts())
+def test_against_brute_force(surfs):
+    '''Test that :func:`remove_duplicate_surfaces` replaces each surface with
+    the first matching surface.'''
+    new_surfs, renumbering, stats = remove_duplicate_surfaces(
+        SurfaceStore(surfs), REL_TOL, ABS_TOL)
+    kept = []
+    for key, surf in sorted(surfs.items()):
+        match = next((other for other in kept
+                      if matches(surf, surfs[other])), None)
+        if match is None:
+            kept.append(key)
+            assert renumbering[key] == key
+        else:
+            flipped = (surf.canonical(TOL)[2]
+                       != surfs[match].canonical(TOL)[2])
+            assert renumbering[key] == (-match if flipped else match)
+    assert sorted(new_surfs) == kept
+    assert stats.exact + stats.close == len(surfs) - len(kept)
+    assert stats.flipped == sum(1 for new_key in renumbering.values()
+                                if new_key < 0)
+
+
+def test_exact():
+    '''Test that zero tolerances only merge identical surfaces.'''
+    surfs = {1: SurfaceT4(T4S.PLANEX, [4.5]),
+             2: SurfaceT4(T4S.PLANEX, [4.499999999999999]),
+             3: SurfaceT4(T4S.PLANEY, [4.5]),
+             4: SurfaceT4(T4S.PLANEX, [4.5])}
+    surfs = SurfaceStore(surfs)
+    _, renumbering, stats = remove_duplicate_surfaces(surfs)
+    assert renumbering == {1: 1, 2: 2, 3: 3, 4: 1}
+    assert stats == (1, 0, 0)
+    _, renumbering, stats = remove_duplicate_surfaces(surfs, REL_TOL, ABS_TOL)
+    assert renumbering == {1: 1, 2: 1, 3: 3, 4: 1}
+    assert stats == (1, 1, 0)
+
+
+def test_flipped():
+    '''Test that surfaces with opposite orientations are merged, and that the
+    volumes are updated accordingly.'''
+    surfs = {1: SurfaceT4(T4S.PLANEX, [4.]),
+             2: SurfaceT4(T4S.PLANE, [-1., 0., 0., 4.]),
+             3: SurfaceT4(T4S.QUAD, [1., 1., 0., 0., 0., 0., 0., 0., 0., -1.]),
+             4: SurfaceT4(T4S.QUAD, [-2., -2., 0., 0., 0., 0., 0., 0., 0.,
+                                     2.])}
+    new_surfs, renumbering, stats = remove_duplicate_surfaces(
+        SurfaceStore(surfs))
+    assert sorted(new_surfs) == [1, 3]
+    assert renumbering == {1: 1, 2: -1, 3: 3, 4: -3}
+    assert stats == (2, 0, 2)
+    volus = {1: VolumeT4(pluses={2, 3}, minuses={4}),
+             2: VolumeT4(pluses={1, 2}, minuses=set())}
+    volus = renumber_surfaces(volus, renumbering)
+    assert (volus[1].pluses, volus[1].minuses) == ({3}, {1})
+    assert volus[2].empty()
+
+
+def test_rounding_residue():
+    '''Test that a rounding residue in the leading coefficient of a surface,
+    with either sign, does not change its orientation.'''
+    surfs = {1: SurfaceT4(T4S.PLANE, [0., 1., 0., -2.]),
+             2: SurfaceT4(T4S.PLANE, [6e-17, 1., 0., -2.]),
+             3: SurfaceT4(T4S.PLANE, [-6e-17, 1., 0., -2.]),
+             4: SurfaceT4(T4S.PLANE, [6e-17, -1., 0., 2.]),
+             5: SurfaceT4(T4S.PLANE, [-6e-17, -1., 0., 2.]),
+             6: SurfaceT4(T4S.QUAD, [0., 1., 1., 0., 0., 0., 0., 0., 0., -1.]),
+             7: SurfaceT4(T4S.QUAD, [1e-16, 1., 1., 0., 0., 0., 0., 0., 0.,
+                                     -1.]),
+             8: SurfaceT4(T4S.QUAD, [-1e-16, 1., 1., 0., 0., 0., 0., 0., 0.,
+                                     -1.]),
+             9: SurfaceT4(T4S.QUAD, [1e-16, -1., -1., 0., 0., 0., 0., 0., 0.,
+                                     1.]),
+             10: SurfaceT4(T4S.QUAD, [-1e-16, -1., -1., 0., 0., 0., 0., 0.,
+                                      0., 1.])}
+    new_surfs, renumbering, stats = remove_duplicate_surfaces(
+        SurfaceStore(surfs), REL_TOL, ABS_TOL)
+    assert sorted(new_surfs) == [1, 6]
+    assert renumbering == {1: 1, 2: 1, 3: 1, 4: -1, 5: -1,
+                           6: 6, 7: 6, 8: 6, 9: -6, 10: -6}
+    assert stats == (0, 8, 4)
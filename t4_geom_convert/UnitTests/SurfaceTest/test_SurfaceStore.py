@@ -0,0 +1,74 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the :mod:`~.SurfaceStore` module.'''
+# pylint: disable=no-value-for-parameter
+
+import numpy as np
+from hypothesis import given
+from hypothesis.strategies import (composite, floats, integers, lists,
+                                   sampled_from, sets)
+
+from t4_geom_convert.Kernel.Surface.SurfaceStore import SurfaceStore
+from t4_geom_convert.Kernel.Surface.SurfaceT4 import SurfaceT4
+from t4_geom_convert.Kernel.Surface.ESurfaceTypeT4 import ESurfaceTypeT4 as T4S
+
+TRANSFORMS = [None, (np.array([1., 2., 3.]), np.eye(3))]
+
+
+@composite
+def surface_dicts(draw):
+    '''Generate dictionaries of surfaces of a few types, with a few
+    provenances and transformations.'''
+    keys = draw(sets(integers(1, 1000), max_size=20))
+    surfs = {}
+    for key in keys:
+        type_surface, n_params = draw(sampled_from([(T4S.PLANEX, 1),
+                                                    (T4S.PLANE, 4),
+                                                    (T4S.SPHERE, 4)]))
+        params = draw(lists(floats(-1e3, 1e3) | integers(-1000, 1000),
+                            min_size=n_params, max_size=n_params))
+        idorigin = draw(sampled_from([(), (key,), ('aux plane', 7)]))
+        transform = draw(sampled_from(TRANSFORMS))
+        surfs[key] = SurfaceT4(type_surface, params, idorigin, transform)
+    return surfs
+
+
+@given(surfs=surface_dicts())
+def test_roundtrip(surfs):
+    '''Test that the store returns the surfaces it was built from.'''
+    store = SurfaceStore(surfs)
+    assert len(store) == len(surfs)
+    assert list(store) == sorted(surfs)
+    for key, surf in store.items():
+        assert surf == surfs[key]
+        assert surf.idorigin == surfs[key].idorigin
+        assert str(surf) == str(surfs[key])
+        assert store[key] == surfs[key]
+        assert str(store[key]) == str(surfs[key])
+    assert 1001 not in store
+
+
+@given(surfs=surface_dicts(), data=sets(integers(1, 1000)))
+def test_select(surfs, data):
+    '''Test that :meth:`SurfaceStore.select` keeps the requested surfaces.'''
+    selected = SurfaceStore(surfs).select(data)
+    assert list(selected) == sorted(data & set(surfs))
+    for key, surf in selected.items():
+        assert surf == surfs[key]
+        assert str(surf) == str(surfs[key])
@@ -0,0 +1,86 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the :mod:`~.BatchTranslation` module.'''
+# pylint: disable=no-value-for-parameter
+
+import pytest
+import numpy as np
+from hypothesis import given
+from hypothesis.strategies import floats, composite, lists
+
+from t4_geom_convert.Kernel.Transformation.BatchTranslation import (
+    translate_surfaces)
+from t4_geom_convert.Kernel.Transformation.Transformation import (
+    transformation)
+from t4_geom_convert.Kernel.Surface.ConversionSurfaceMCNPToT4 import (
+    convert_mcnp_surface)
+from t4_geom_convert.Kernel.FileHandlers.Parser.ParseMCNPSurface import (
+    to_surfaces_mcnp)
+
+
+SURFACES = [
+    ('PX', [1.5]),
+    ('PY', [-2.0]),
+    ('PZ', [0.0]),
+    ('P', [1.0, 2.0, 3.0, 4.0]),
+    ('P', [-1.0, 0.0, 0.0, 4.0]),
+    ('CX', [1.0]),
+    ('C/Y', [1.0, -2.0, 0.5]),
+    ('C/Z', [1.0, 2.0, 3.0]),
+    ('SO', [2.0]),
+    ('S', [1.0, 2.0, 3.0, 4.0]),
+    ('KZ', [1.0, 2.0, -1.0]),
+    ('K/X', [1.0, 2.0, 3.0, 0.5]),
+    ('K/Y', [1.0, 2.0, 3.0, 0.5, 1.0]),
+    ('TZ', [1.0, 2.0, 3.0, 4.0, 1.0, 1.0]),
+    ('SQ', [1.0, 2.0, 3.0, 0.0, 0.0, 0.0, -4.0, 1.0, 2.0, 3.0]),
+    ('GQ', [1.0, 2.0, 3.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -4.0]),
+    ('RPP', [-1.0, 1.0, -2.0, 2.0, -3.0, 3.0]),
+    ('RCC', [0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 0.5]),
+]
+
+
+@composite
+def translations(draw):
+    '''Generate a list of random translation vectors.'''
+    component = floats(-1e5, 1e5, allow_nan=False, allow_infinity=False)
+    vector = lists(component, min_size=3, max_size=3)
+    return draw(lists(vector, min_size=1, max_size=5))
+
+
+@pytest.mark.parametrize('card,params', SURFACES,
+                         ids=[card for card, _ in SURFACES])
+@given(vectors=translations())
+def test_same_as_transformation(card, params, vectors):
+    '''Test that :func:`translate_surfaces` yields the same surfaces as the
+    generic transformation and conversion code.'''
+    mcnp_surfs = to_surfaces_mcnp(1, ('', None, card, params), {})
+    translated = translate_surfaces(1, mcnp_surfs, np.array(vectors))
+    assert len(translated) == len(vectors)
+    for vector, (t4_coll, new_mcnp_surfs) in zip(vectors, translated):
+        trnsf = vector + [1., 0., 0., 0., 1., 0., 0., 0., 1.]
+        expected_mcnp = [(transformation(trnsf, surf), side)
+                         for surf, side in mcnp_surfs]
+        expected_t4 = convert_mcnp_surface(1, expected_mcnp)
+        assert ([(repr(surf), side) for surf, side in new_mcnp_surfs]
+                == [(repr(surf), side) for surf, side in expected_mcnp])
+        assert ([(str(surf), surf.idorigin, side) for surf, side in t4_coll]
+                == [(str(surf), surf.idorigin, side)
+                    for surf, side in expected_t4])
+
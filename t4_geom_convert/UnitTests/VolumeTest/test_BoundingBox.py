@@ -0,0 +1,254 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the :mod:`~.BoundingBox` module.'''
+
+from itertools import product
+from math import sqrt, inf
+
+import numpy as np
+from hypothesis import given, note
+from hypothesis.strategies import (floats, integers, sampled_from, tuples,
+                                   lists, builds)
+
+from MIP.geom.semantics import Surface
+from t4_geom_convert.Kernel.Surface.ESurfaceTypeT4 import ESurfaceTypeT4 as T4S
+from t4_geom_convert.Kernel.Surface.SurfaceT4 import SurfaceT4
+from t4_geom_convert.Kernel.Surface.SurfaceCollection import SurfaceCollection
+from t4_geom_convert.Kernel.Volume.BoundingBox import (AABB, half_space_box,
+                                                       transform_box,
+                                                       CellBoxes, VolumeBoxes)
+from t4_geom_convert.Kernel.Volume.CellMCNP import CellMCNP, CellRef
+from t4_geom_convert.Kernel.Volume.GeomTree import GeomTree
+from t4_geom_convert.Kernel.Volume.VolumeT4 import VolumeT4
+
+coords = floats(-10., 10.)
+lengths = floats(0.1, 10.)
+points = tuples(coords, coords, coords)
+
+
+def evaluate(surf, point):
+    '''Evaluate the equation of the T4 surface `surf` at `point`.'''
+    x, y, z = point
+    params = surf.param_surface
+    type_surf = surf.type_surface
+    if type_surf in (T4S.PLANEX, T4S.PLANEY, T4S.PLANEZ):
+        axis = (T4S.PLANEX, T4S.PLANEY, T4S.PLANEZ).index(type_surf)
+        return point[axis] - params[0]
+    if type_surf == T4S.PLANE:
+        return params[0] * x + params[1] * y + params[2] * z + params[3]
+    if type_surf == T4S.SPHERE:
+        return ((x - params[0])**2 + (y - params[1])**2 + (z - params[2])**2
+                - params[3]**2)
+    if type_surf in (T4S.CYLX, T4S.CYLY, T4S.CYLZ):
+        axis = (T4S.CYLX, T4S.CYLY, T4S.CYLZ).index(type_surf)
+        others = [coord for i, coord in enumerate(point) if i != axis]
+        return ((others[0] - params[0])**2 + (others[1] - params[1])**2
+                - params[2]**2)
+    if type_surf in (T4S.TORUSX, T4S.TORUSY, T4S.TORUSZ):
+        axis = (T4S.TORUSX, T4S.TORUSY, T4S.TORUSZ).index(type_surf)
+        rel = [coord - center for coord, center in zip(point, params[:3])]
+        radial = sqrt(sum(coord**2 for i, coord in enumerate(rel)
+                          if i != axis))
+        major, along, across = params[3:6]
+        return ((radial - major)**2 / across**2 + rel[axis]**2 / along**2
+                - 1.)
+    assert type_surf == T4S.QUAD
+    a, b, c, d, e, f, g, h, j, k = params
+    return (a * x**2 + b * y**2 + c * z**2 + d * x * y + e * y * z
+            + f * z * x + g * x + h * y + j * z + k)
+
+
+def axis_plane(type_surf, pos):
+    '''Build an axis-aligned plane.'''
+    return SurfaceT4(type_surf, (pos,))
+
+
+def plane(axis, coeff, pos):
+    '''Build a generic plane orthogonal to one of the axes.'''
+    normal = tuple(coeff if i == axis else 0. for i in range(3))
+    return SurfaceT4(T4S.PLANE, normal + (pos,))
+
+
+def sphere(center, radius):
+    '''Build a sphere.'''
+    return SurfaceT4(T4S.SPHERE, center + (radius,))
+
+
+def cylinder(type_surf, x, y, radius):
+    '''Build a cylinder parallel to one of the axes.'''
+    return SurfaceT4(type_surf, (x, y, radius))
+
+
+def torus(type_surf, center, major, along, across):
+    '''Build a torus parallel to one of the axes.'''
+    return SurfaceT4(type_surf, center + (major, along, across))
+
+
+def ellipsoid(center, axes, sign):
+    '''Build a quadric representing an ellipsoid. If `sign` is positive, the
+    inside of the ellipsoid is on the negative side of the quadric.'''
+    params = [1 / axes[0]**2, 1 / axes[1]**2, 1 / axes[2]**2, 0., 0., 0.]
+    params.extend(-2 * c / r**2 for c, r in zip(center, axes))
+    params.append(sum(c**2 / r**2 for c, r in zip(center, axes)) - 1.)
+    return SurfaceT4(T4S.QUAD, [sign * param for param in params])
+
+
+def surfaces():
+    '''Generate T4 surfaces of the types that have bounded half-spaces.'''
+    axis_planes = sampled_from((T4S.PLANEX, T4S.PLANEY, T4S.PLANEZ))
+    cylinders = sampled_from((T4S.CYLX, T4S.CYLY, T4S.CYLZ))
+    tori = sampled_from((T4S.TORUSX, T4S.TORUSY, T4S.TORUSZ))
+    return (builds(axis_plane, axis_planes, coords)
+            | builds(plane, integers(0, 2), sampled_from((-2., -1., 1., 3.)),
+                     coords)
+            | builds(sphere, points, lengths)
+            | builds(cylinder, cylinders, coords, coords, lengths)
+            | builds(torus, tori, points, lengths, lengths, lengths)
+            | builds(ellipsoid, points, tuples(lengths, lengths, lengths),
+                     sampled_from((-1., 1.))))
+
+
+@given(surf=surfaces(), side=sampled_from((-1, 1)),
+       point_list=lists(points, min_size=1, max_size=20))
+def test_half_space_box(surf, side, point_list):
+    '''Test that the points of a half-space lie in its bounding box.'''
+    box = half_space_box(surf, side)
+    note(f'box: {box!r}')
+    for point in point_list:
+        if side * evaluate(surf, point) > 0:
+            assert box.contains(point)
+
+
+@given(center=points, radius=lengths, axis=integers(0, 2))
+def test_half_space_box_bounded(center, radius, axis):
+    '''Test that the bounding box of the inside of a sphere is tight, and that
+    cylinders are unbounded along their axis only.'''
+    sphere = half_space_box(SurfaceT4(T4S.SPHERE, center + (radius,)), -1)
+    assert sphere == AABB.around(center, (radius,) * 3)
+    cyl_type = (T4S.CYLX, T4S.CYLY, T4S.CYLZ)[axis]
+    cyl = half_space_box(SurfaceT4(cyl_type, (0., 0., radius)), -1)
+    assert cyl.lower[axis] == -inf and cyl.upper[axis] == inf
+    assert all(cyl.upper[i] == radius for i in range(3) if i != axis)
+
+
+@given(box=tuples(points, points), translation=points,
+       angle=floats(0., 6.28))
+def test_transformed(box, translation, angle):
+    '''Test that the corners of a transformed box lie in the transformed
+    bounding box.'''
+    lower, upper = np.minimum(*box), np.maximum(*box)
+    matrix = np.array([[np.cos(angle), -np.sin(angle), 0.],
+                       [np.sin(angle), np.cos(angle), 0.],
+                       [0., 0., 1.]])
+    new_box = AABB(lower, upper).transformed(translation, matrix)
+    for corner in product(*zip(lower, upper)):
+        image = matrix.dot(corner) + translation
+        assert np.all(image >= np.array(new_box.lower) - 1e-9)
+        assert np.all(image <= np.array(new_box.upper) + 1e-9)
+
+
+@given(box=tuples(points, points), translation=points,
+       angle=floats(0., 6.28), direction=points)
+def test_transform_box(box, translation, angle, direction):
+    '''Test that the corners of a box transformed by an MCNP transformation
+    lie in the transformed box, and that the support function of the box
+    bounds the projections of the corners.'''
+    lower, upper = np.minimum(*box), np.maximum(*box)
+    matrix = np.array([[np.cos(angle), 0., -np.sin(angle)],
+                       [0., 1., 0.],
+                       [np.sin(angle), 0., np.cos(angle)]])
+    transform = tuple(translation) + tuple(matrix.flatten())
+    aabb = AABB(lower, upper)
+    new_box = transform_box(aabb, transform)
+    back_box = transform_box(new_box, transform, inverse=True)
+    for corner in product(*zip(lower, upper)):
+        image = matrix.T.dot(corner) + translation
+        assert np.all(image >= np.array(new_box.lower) - 1e-9)
+        assert np.all(image <= np.array(new_box.upper) + 1e-9)
+        assert np.all(np.array(corner) >= np.array(back_box.lower) - 1e-9)
+        assert np.all(np.array(corner) <= np.array(back_box.upper) + 1e-9)
+        assert np.dot(direction, corner) <= aabb.support(direction) + 1e-9
+
+
+def test_cell_boxes():
+    '''Test the propagation of bounding boxes through cell geometries and cell
+    references.'''
+    dic_surface = {
+        1: SurfaceCollection([(SurfaceT4(T4S.SPHERE, (0., 0., 0., 2.)), 1)]),
+        2: SurfaceCollection([(SurfaceT4(T4S.PLANEX, (1.,)), 1)]),
+        3: SurfaceCollection([(SurfaceT4(T4S.PLANEX, (5.,)), -1),
+                              (SurfaceT4(T4S.PLANEY, (0.,)), 1)]),
+    }
+
+    def cell(ast):
+        return CellMCNP(1, -1., GeomTree.from_ast(ast), 1., 0, None, None,
+                        None, [])
+
+    dic_cell = {
+        10: cell(('*', Surface(-1), Surface(2))),
+        11: cell((':', CellRef(10), Surface(-3))),
+        12: cell(('*', CellRef(11), Surface(-3, sub=1))),
+    }
+    boxes = CellBoxes(dic_cell, dic_surface)
+    assert boxes.cell(10) == AABB((1, -2, -2), (2, 2, 2))
+    assert boxes.surface(Surface(-3)) == AABB((5, -inf, -inf),
+                                              (inf, 0, inf))
+    assert boxes.cell(11) == AABB((1, -inf, -inf), (inf, 2, inf))
+    assert boxes.cell(12) == AABB((5, -inf, -inf), (inf, 2, inf))
+    assert 10 in boxes.cell_cache
+
+    boxes.invalidate(10)
+    assert 10 not in boxes.cell_cache
+    assert 11 in boxes.cell_cache
+
+
+def test_volume_boxes():
+    '''Test the propagation of bounding boxes through T4 volumes.'''
+    dic_surface = {
+        1: SurfaceT4(T4S.SPHERE, (0., 0., 0., 2.)),
+        2: SurfaceT4(T4S.PLANEX, (1.,)),
+        3: SurfaceT4(T4S.PLANEX, (3.,)),
+        4: SurfaceT4(T4S.PLANEX, (-3.,)),
+    }
+    dic_volume = {
+        1: VolumeT4([2], [1]),
+        2: VolumeT4([], [4]),
+        # empty EQUA part (x > 3 and x < -3), union of volumes 1 and 2
+        3: VolumeT4([3], [4], ops=('UNION', (1, 2))),
+        4: VolumeT4([], [1], ops=('INTE', (3,))),
+    }
+    boxes = VolumeBoxes(dic_volume, dic_surface)
+    assert boxes.volume(1) == AABB((1, -2, -2), (2, 2, 2))
+    assert boxes.volume(3) == AABB((-inf, -inf, -inf), (2, inf, inf))
+    assert boxes.volume(4) == AABB((-2, -2, -2), (2, 2, 2))
+    assert boxes.equa(dic_volume[3]).is_empty()
+
+
+@given(axis=floats(0.1, 1.5))
+def test_degenerate_quadric(axis):
+    '''Test that the inside of a quadric describing a rotated elliptic cylinder
+    is unbounded.'''
+    direction = np.array([np.cos(axis), np.sin(axis), 0.3])
+    direction /= np.linalg.norm(direction)
+    # x^T (I - d d^T) x - 1 < 0: a cylinder of radius 1 along d
+    quad = np.eye(3) - np.outer(direction, direction)
+    params = [quad[0, 0], quad[1, 1], quad[2, 2], 2 * quad[0, 1],
+              2 * quad[1, 2], 2 * quad[2, 0], 0., 0., 0., -1.]
+    box = half_space_box(SurfaceT4(T4S.QUAD, params), -1)
+    assert not box.is_bounded()
@@ -0,0 +1,139 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the :mod:`~.ConstructVolumeT4` module.'''
+# pylint: disable=no-value-for-parameter
+
+from hypothesis import given
+from hypothesis.strategies import (booleans, composite, integers, lists,
+                                   sampled_from)
+
+from t4_geom_convert.Kernel.Volume.ConstructVolumeT4 import \
+    remove_empty_volumes, remove_unused_volumes, SweepStats
+from t4_geom_convert.Kernel.Volume.DictVolumeT4 import DictVolumeT4
+from t4_geom_convert.Kernel.Volume.VolumeT4 import VolumeT4
+
+UNION_IDS = (100, 101)
+
+
+@composite
+def volume_dicts(draw):
+    '''Generate dictionaries of volumes that refer to each other, some of
+    which are patently empty.'''
+    n_volumes = draw(integers(1, 15))
+    keys = list(range(1, n_volumes + 1))
+    dic = DictVolumeT4()
+    for key in keys:
+        minuses = [1] if draw(integers(0, 3)) == 0 else [2]
+        operator = draw(sampled_from([None, 'INTE', 'UNION']))
+        if operator is None:
+            ops = None
+        else:
+            ops = (operator, tuple(draw(lists(sampled_from(keys), min_size=1,
+                                              max_size=3))))
+        dic[key] = VolumeT4([1], minuses, ops=ops)
+    return dic
+
+
+def remove_empty_volumes_by_rounds(dic_volume, union_ids):
+    '''Reference implementation of :func:`remove_empty_volumes`, which
+    rescans all the volumes after each round of removals.'''
+    removed = set()
+    to_remove = [key for key, val in dic_volume.items() if val.empty()]
+    while to_remove:
+        for key in to_remove:
+            val = dic_volume[key]
+            if val.ops is None or val.ops[0] != 'UNION':
+                del dic_volume[key]
+                removed.add(key)
+                continue
+            val.pluses = {union_ids[0]}
+            val.minuses = {union_ids[1]}
+        to_remove = []
+        for key, val in dic_volume.items():
+            if val.ops is None:
+                continue
+            if (val.ops[0] == 'INTE'
+                    and any(arg in removed for arg in val.ops[1])):
+                to_remove.append(key)
+            elif val.ops[0] == 'UNION':
+                new_args = tuple(arg for arg in val.ops[1]
+                                 if arg not in removed)
+                val.ops = (val.ops[0], new_args) if new_args else None
+
+
+@given(dic=volume_dicts())
+def test_same_as_rounds(dic):
+    '''Test that the worklist in :func:`remove_empty_volumes` gives the same
+    result as rescanning the volumes after each round.'''
+    expected = dic.copy()
+    for key, val in expected.items():
+        expected[key] = val.copy()
+    remove_empty_volumes_by_rounds(expected, UNION_IDS)
+    remove_empty_volumes(dic, UNION_IDS)
+    assert ({key: str(val) for key, val in dic.items()}
+            == {key: str(val) for key, val in expected.items()})
+
+
+@composite
+def volume_graphs(draw):
+    '''Generate dictionaries of fictive and non-fictive volumes that refer
+    to each other through UNION and INTE operations, or that only use
+    surfaces (EQUA).'''
+    n_volumes = draw(integers(1, 15))
+    keys = list(range(1, n_volumes + 1))
+    dic = DictVolumeT4()
+    for key in keys:
+        pluses = draw(lists(integers(1, 20), max_size=3))
+        minuses = draw(lists(integers(1, 20), max_size=3))
+        operator = draw(sampled_from([None, 'INTE', 'UNION']))
+        if operator is None:
+            ops = None
+        else:
+            ops = (operator, tuple(draw(lists(sampled_from(keys), min_size=1,
+                                              max_size=3))))
+        dic[key] = VolumeT4(pluses, minuses, ops=ops, fictive=draw(booleans()))
+    return dic
+
+
+def remove_unused_volumes_by_rounds(dic):
+    '''Reference implementation of :func:`remove_unused_volumes`, which
+    extends the set of used volumes until it no longer changes.'''
+    used = {key for key, val in dic.items() if not val.fictive}
+    while True:
+        new_used = used.union(arg for key in used if dic[key].ops is not None
+                              for arg in dic[key].ops[1])
+        if new_used == used:
+            break
+        used = new_used
+    unused = [key for key in dic if key not in used]
+    used_surfs = set().union(*(dic[key].surface_ids() for key in used))
+    unused_surfs = set().union(*(dic[key].surface_ids() for key in unused))
+    for key in unused:
+        del dic[key]
+    return SweepStats(len(unused), len(unused_surfs - used_surfs))
+
+
+@given(dic=volume_graphs())
+def test_sweep_same_as_rounds(dic):
+    '''Test that the traversal in :func:`remove_unused_volumes` keeps the
+    same volumes as extending the set of used volumes round by round.'''
+    expected = dic.copy()
+    stats = remove_unused_volumes_by_rounds(expected)
+    assert remove_unused_volumes(dic) == stats
+    assert sorted(dic) == sorted(expected)
@@ -0,0 +1,160 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the :mod:`~.GeomTree` module.'''
+
+import pickle
+
+import pytest
+
+from MIP.geom.parsegeom import get_ast
+from MIP.geom.main import extract_surfaces_list
+
+from t4_geom_convert.Kernel.Volume.GeomTree import GeomTree, INTE, UNION
+from t4_geom_convert.Kernel.Volume.CellMCNP import CellRef
+
+
+GEOMETRIES = ['1 -2 3', '1 : -2 : 3', '(1 -2) : (3 4 : -5)',
+              '1 (2 : (3 -4 (5 : 6)))', '#3 1 (-2 : 4) #5']
+
+
+@pytest.mark.parametrize('geom', GEOMETRIES)
+def test_roundtrip(geom):
+    '''Test that converting an AST to a tree and back is the identity.'''
+    ast = get_ast(geom)
+    tree = GeomTree.from_ast(ast)
+    assert tree.to_ast() == ast
+    assert tree.surfaces() == extract_surfaces_list(ast)
+
+
+@pytest.mark.parametrize('geom', GEOMETRIES[:-1])
+def test_inverse(geom):
+    '''Test that the inverse of a tree is the inverse of its AST (complements
+    must have been replaced before inverting).'''
+    ast = get_ast(geom)
+    assert GeomTree.from_ast(ast).inverse().to_ast() == ast.inverse()
+
+
+@pytest.mark.parametrize('geom', GEOMETRIES)
+def test_pickle(geom):
+    '''Test that trees survive pickling (as done by :class:`~.ParseStore` and
+    by the process pool).'''
+    tree = GeomTree.from_ast(get_ast(geom))
+    assert pickle.loads(pickle.dumps(tree)) == tree
+
+
+def test_deep_tree():
+    '''Test that very deep trees can be built and converted without hitting
+    the recursion limit.'''
+    depth = 20000
+    ast = 1
+    for surf in range(2, depth + 2):
+        ast = ('*', ast, surf)
+    tree = GeomTree.from_ast(ast)
+    assert len(tree.surfaces()) == depth + 1
+    assert tree.opcodes[tree.root] == INTE
+    compact = tree.compact()
+    assert compact == tree
+
+
+def test_compact_drops_orphans():
+    '''Test that :meth:`~.GeomTree.compact` only keeps reachable nodes.'''
+    tree = GeomTree()
+    orphan = tree.add_leaf(7)
+    args = [tree.add_leaf(1), tree.add_leaf(2)]
+    tree.add_node(INTE, [orphan, args[0]])
+    tree.add_node(UNION, args, key=42)
+    compact = tree.compact()
+    assert len(compact) == 3
+    assert compact.surfaces() == [1, 2]
+    assert compact.keys[compact.root] == 42
+
+
+def test_deep_traversals():
+    '''Test that all the traversal modes work on trees that are much deeper
+    than the recursion limit.'''
+    depth = 100000
+    ast = 1
+    for surf in range(2, depth + 2):
+        ast = ('*', ast, surf)
+    tree = GeomTree.from_ast(ast)
+
+    preorder = list(tree.preorder())
+    assert preorder[0] == tree.root
+    assert sorted(preorder) == list(range(len(tree)))
+    assert list(tree.postorder(tree.root)) == list(tree.postorder())
+
+    def expand(node):
+        return None, tree.args(node)
+
+    def combine(node, _context, values):
+        return tree.leaves[node] if tree.is_leaf(node) else sum(values)
+
+    assert tree.fold(expand, combine) == (depth + 1) * (depth + 2) // 2
+
+    negated = tree.rebuild(lambda new_tree, leaf: new_tree.add_leaf(-leaf))
+    assert negated.surfaces() == [-surf for surf in tree.surfaces()]
+
+
+def test_fold_order():
+    '''Test that :meth:`~.GeomTree.fold` evaluates the children in the order
+    returned by `expand`.'''
+    tree = GeomTree.from_ast(('*', 1, (':', 2, 3), 4))
+    visited = []
+
+    def expand(node):
+        return None, tree.args(node)[::-1]
+
+    def combine(node, _context, values):
+        if tree.is_leaf(node):
+            visited.append(tree.leaves[node])
+        return values
+
+    tree.fold(expand, combine)
+    assert visited == [4, 3, 2, 1]
+
+
+def test_rebuild_drops_nodes():
+    '''Test that :meth:`~.GeomTree.rebuild` compacts the tree when nodes are
+    dropped or replaced.'''
+    tree = GeomTree.from_ast(('*', 1, (':', 2, 3), 4))
+
+    def flatten(new_tree, node, args):
+        # replace the union with its first argument
+        if tree.opcodes[node] == UNION:
+            return args[0]
+        return new_tree.add_node(tree.opcodes[node], args)
+
+    rebuilt = tree.rebuild(node_fn=flatten)
+    assert rebuilt == GeomTree.from_ast(('*', 1, 2, 4))
+    assert tree.rebuild(node_fn=lambda new_tree, node, args: None) is None
+
+
+def test_hash_cons():
+    '''Test that :meth:`~.GeomTree.hash_cons` gives the same identity to
+    structurally identical subtrees, across trees.'''
+    table = {}
+    tree = GeomTree.from_ast(('*', 1, (':', 2, CellRef(3)), (':', 2, 3)))
+    ids = tree.hash_cons(table)
+    union1, union2 = tree.args(tree.root)[1:]
+    assert ids[union1] != ids[union2]
+
+    other = GeomTree.from_ast((':', (':', 2, CellRef(3)), 4))
+    other_ids = other.hash_cons(table)
+    assert other_ids[other.args(other.root)[0]] == ids[union1]
+    assert other_ids[other.root] not in ids
@@ -0,0 +1,130 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the :mod:`~.Simplification` module.'''
+
+from itertools import product
+
+from hypothesis import given, note, settings
+from hypothesis.strategies import (integers, lists, one_of, recursive,
+                                   sampled_from, tuples, builds)
+
+from t4_geom_convert.Kernel.Volume.GeomTree import GeomTree, LEAF, INTE, UNION
+from t4_geom_convert.Kernel.Volume.CellMCNP import CellRef
+from t4_geom_convert.Kernel.Volume.Simplification import simplify
+
+N_SURFACES = 4
+CELLS = (10, 11)
+
+
+def leaves():
+    '''Generate signed surface IDs and cell references.'''
+    surfs = integers(1, N_SURFACES).flatmap(lambda n: sampled_from((n, -n)))
+    return one_of(surfs, builds(CellRef, sampled_from(CELLS)))
+
+
+def asts():
+    '''Generate geometry ASTs with small numbers of surfaces, so that
+    duplicate, complementary and absorbed operands are frequent.'''
+    def extend(children):
+        operands = lists(children, min_size=1, max_size=4)
+        return tuples(sampled_from('*:'), operands).map(
+            lambda args: (args[0],) + tuple(args[1]))
+    return recursive(leaves(), extend, max_leaves=20)
+
+
+def evaluate(tree, values):
+    '''Evaluate `tree` for the given truth values of the surfaces and cells.'''
+    results = []
+    for node in tree.postorder():
+        opcode = tree.opcodes[node]
+        if opcode == LEAF:
+            leaf = tree.leaves[node]
+            if isinstance(leaf, CellRef):
+                results.append(values[leaf.cell])
+            else:
+                results.append(values[abs(leaf)] == (leaf > 0))
+            continue
+        args = [results[arg] for arg in tree.args(node)]
+        results.append(all(args) if opcode == INTE else any(args))
+    return results[tree.root]
+
+
+def truth_table(tree):
+    '''Return the truth table of `tree`, or `None` for empty trees.'''
+    if tree is None:
+        return None
+    keys = list(range(1, N_SURFACES + 1)) + list(CELLS)
+    table = []
+    for bits in product((False, True), repeat=len(keys)):
+        table.append(evaluate(tree, dict(zip(keys, bits))))
+    return table
+
+
+@settings(max_examples=500)
+@given(ast=asts())
+def test_equivalent(ast):
+    '''Test that simplified trees are equivalent to the original ones.'''
+    tree = GeomTree.from_ast(ast)
+    simplified, removed = simplify(tree)
+    note(f'simplified: {simplified!r}')
+    table = truth_table(tree)
+    if simplified is None:
+        assert not any(table)
+        assert removed == len(tree)
+        return
+    assert truth_table(simplified) == table
+    assert removed == len(tree) - len(simplified)
+    assert removed >= 0
+
+
+@settings(max_examples=500)
+@given(ast=asts())
+def test_simplified(ast):
+    '''Test that simplified trees do not contain nested operators of the same
+    kind, duplicate operands or complementary surfaces.'''
+    simplified, _ = simplify(GeomTree.from_ast(ast))
+    if simplified is None:
+        return
+    table = truth_table(simplified)
+    if all(table):
+        # full geometries are returned unchanged
+        return
+    for node in simplified.postorder():
+        opcode = simplified.opcodes[node]
+        if opcode == LEAF:
+            continue
+        args = simplified.args(node)
+        assert len(args) > 1
+        assert all(simplified.opcodes[arg] != opcode for arg in args)
+        leaves = [simplified.leaves[arg] for arg in args
+                  if simplified.opcodes[arg] == LEAF]
+        assert len(set(leaves)) == len(leaves)
+        surfs = {leaf for leaf in leaves if isinstance(leaf, int)}
+        assert not any(-surf in surfs for surf in surfs)
+
+
+def test_keys():
+    '''Test that the surviving operator nodes keep their keys.'''
+    tree = GeomTree()
+    inte = tree.add_node(INTE, [tree.add_leaf(1), tree.add_leaf(2)], key=7)
+    tree.add_node(UNION, [inte, tree.add_leaf(3), tree.add_leaf(3)], key=8)
+    simplified, removed = simplify(tree)
+    assert removed == 1
+    assert simplified.keys[simplified.root] == 8
+    assert simplified.keys[simplified.args(simplified.root)[0]] == 7
@@ -0,0 +1,51 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the :mod:`~.VolumeT4` module.'''
+
+from hypothesis import given
+from hypothesis.strategies import booleans, integers, lists, none, one_of, \
+    sampled_from, tuples
+
+from t4_geom_convert.Kernel.Volume.VolumeT4 import VolumeT4
+
+IDS = lists(integers(1, 50), max_size=8)
+OPS = one_of(none(), tuples(sampled_from(['INTE', 'UNION']), IDS))
+
+
+@given(pluses=IDS, minuses=IDS, ops=OPS, fictive=booleans())
+def test_set_semantics(pluses, minuses, ops, fictive):
+    '''Test that :class:`VolumeT4` behaves as if the surface IDs were stored
+    in sets.'''
+    volume = VolumeT4(pluses, minuses, ops=ops, idorigin=[(1, 2)],
+                      fictive=fictive)
+    assert volume.pluses == set(pluses)
+    assert volume.minuses == set(minuses)
+    assert volume.empty() == bool(set(pluses) & set(minuses))
+    assert volume.surface_ids() == set(pluses) | set(minuses)
+    expected = ['EQUA']
+    if pluses:
+        expected += ['PLUS', len(set(pluses))] + sorted(set(pluses))
+    if minuses:
+        expected += ['MINUS', len(set(minuses))] + sorted(set(minuses))
+    if ops is not None:
+        expected += [ops[0], len(ops[1])] + ops[1]
+    if fictive:
+        expected.append('FICTIVE')
+    assert str(volume) == ' '.join(map(str, expected))
+    assert str(volume.copy()) == str(volume)
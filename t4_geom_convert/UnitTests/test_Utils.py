@@ -0,0 +1,66 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Tests for the :mod:`~.Utils` module.'''
+
+import re
+
+from hypothesis import given
+from hypothesis.strategies import from_regex, lists
+
+from t4_geom_convert.Kernel.Utils import (normalize_float, normalize_floats,
+                                          parse_floats)
+
+
+NUMBERS = from_regex(r'[-+]?([0-9]{1,3}(\.[0-9]{0,4})?|\.[0-9]{1,4})'
+                     r'([eEdD]?[-+]?[0-9]{1,2})?', fullmatch=True)
+
+
+def reference_normalize_float(number):
+    '''A straightforward version of :func:`normalize_float`, without the fast
+    path for plain numbers.'''
+    norm = re.sub(r'^([-+]?[0-9]*\.[0-9]*[1-9])0+$', r'\1', number)
+    if norm[-1] == '.':
+        norm += '0'
+    norm = re.sub(r'^([-+]?([0-9]+(\.[0-9]*)?|[0-9]*\.[0-9]+))([-+][0-9]+)$',
+                  r'\1e\4',
+                  norm)
+    norm = re.sub(r'[eEdD]', 'e', norm)
+    return norm
+
+
+@given(number=NUMBERS)
+def test_normalize_float(number):
+    '''Test that the fast path of :func:`normalize_float` does not change the
+    result.'''
+    assert normalize_float(number) == reference_normalize_float(number)
+
+
+@given(numbers=lists(NUMBERS))
+def test_normalize_floats(numbers):
+    '''Test that :func:`normalize_floats` is equivalent to applying
+    :func:`normalize_float` to each number.'''
+    assert normalize_floats(numbers) == [normalize_float(number)
+                                         for number in numbers]
+
+
+@given(numbers=lists(NUMBERS))
+def test_parse_floats(numbers):
+    '''Test that :func:`parse_floats` parses the normalized numbers.'''
+    assert parse_floats(numbers).tolist() == [float(normalize_float(number))
+                                              for number in numbers]
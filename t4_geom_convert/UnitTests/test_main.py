@@ -0,0 +1,34 @@
+# Copyright 2019-2024 French Alternative Energies and Atomic Energy Commission
+#
+# This file is part of t4_geom_convert.
+#
+# t4_geom_convert is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# t4_geom_convert is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# t4_geom_convert.  If not, see <https://www.gnu.org/licenses/>.
+#
+# vim: set fileencoding=utf-8 :
+'''Unit tests for the :mod:`t4_geom_convert.main` module.'''
+
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize('module', ['tatsu', 'numpy'])
+def test_lazy_imports(module):
+    '''Test that importing the CLI module does not import heavy
+    dependencies, which are only needed for the conversion.'''
+    code = ('import sys, t4_geom_convert.main; '
+            f'sys.exit({module!r} in sys.modules)')
+    assert subprocess.run([sys.executable, '-c', code],
+                          check=False).returncode == 0
@@ -23,14 +23,9 @@ from datetime import datetime
 from pathlib import Path
 
 from MIP import mip
+from MIP.geom.parsegeom import backends, ast_cache
 
 from . import __version__
-from .Kernel.FileHandlers.Writer.WriteT4Geometry import (convertMCNPGeometry,
-                                                         writeT4Geometry)
-from .Kernel.FileHandlers.Writer.WriteT4Composition import writeT4Composition
-from .Kernel.FileHandlers.Writer.WriteT4GeomComp import writeT4GeomComp
-from .Kernel.FileHandlers.Writer.WriteT4BoundCond import writeT4BoundCond
-from .Kernel.Volume.Lattice import parse_ranges
 
 
 def parse_lattice(lattice_list):
@@ -81,6 +76,8 @@ in option '100,'
     ValueError: range bound '-6.022e23' is not an integer in option \
 '100,-6.022e23:0'
     '''
+    # pylint: disable=import-outside-toplevel
+    from .Kernel.Volume.Lattice import parse_ranges
 
     lattice_params = {}
 
@@ -107,6 +104,15 @@ in option '100,'
 
 def conversion(args):
     '''Orchestrate the conversion.'''
+    # The conversion modules pull in numpy and TatSu; import them here rather
+    # than at the top, so that --help and --version stay fast.
+    # pylint: disable=import-outside-toplevel
+    from .Kernel.FileHandlers.Writer.WriteT4Geometry import (
+        convertMCNPGeometry, writeT4Geometry)
+    from .Kernel.FileHandlers.Writer.WriteT4Composition import (
+        writeT4Composition)
+    from .Kernel.FileHandlers.Writer.WriteT4GeomComp import writeT4GeomComp
+    from .Kernel.FileHandlers.Writer.WriteT4BoundCond import writeT4BoundCond
 
     start = datetime.now()
     print(f'started at: {start.isoformat()}\n')
@@ -117,38 +123,54 @@ def conversion(args):
         t4_output_filename = Path(args.input).with_suffix('.t4')
 
     try:
-        mcnp_parser = mip.MIP(args.input, encoding=args.encoding)
+        mcnp_parser = mip.MIP(args.input, encoding=args.encoding,
+                              mapped=args.mmap)
     except UnicodeError:
-        msg = (f"Could not decode input file using encoding {args.encoding!r}."
-               "You probably need to specify the encoding with the `-e' "
-               "option.")
-        raise UnicodeError(msg)
-
-    lattice_params = parse_lattice(args.lattice)
-    geom_conv = convertMCNPGeometry(mcnp_parser, lattice_params, args)
-    with t4_output_filename.open('w') as ofile:
-        writeHeader(ofile)
-        (dic_surf_mcnp, dic_surface_t4, dic_volumes_t4, mcnp_new_dict,
-         skipped_cells) = geom_conv
-        writeT4Geometry(dic_surface_t4, dic_volumes_t4, skipped_cells, ofile)
-        if not args.skip_compositions:
-            writeT4Composition(mcnp_parser, mcnp_new_dict, ofile)
-        if not args.skip_geomcomp:
-            writeT4GeomComp(dic_volumes_t4, mcnp_new_dict, ofile)
-        if not args.skip_boundary_conditions:
-            writeT4BoundCond(dic_surf_mcnp, ofile)
+        raise UnicodeError(decoding_error_message(args.encoding)) from None
+
+    # with --mmap, the cards are only decoded when the conversion reads them
+    with mcnp_parser:
+        try:
+            lattice_params = parse_lattice(args.lattice)
+            geom_conv = convertMCNPGeometry(mcnp_parser, lattice_params, args)
+            with t4_output_filename.open('w') as ofile:
+                writeHeader(ofile)
+                (dic_surf_mcnp, dic_surface_t4, dic_volumes_t4, mcnp_new_dict,
+                 skipped_cells) = geom_conv
+                writeT4Geometry(dic_surface_t4, dic_volumes_t4, skipped_cells,
+                                ofile)
+                if not args.skip_compositions:
+                    writeT4Composition(mcnp_parser, mcnp_new_dict, ofile)
+                if not args.skip_geomcomp:
+                    writeT4GeomComp(dic_volumes_t4, mcnp_new_dict, ofile)
+                if not args.skip_boundary_conditions:
+                    writeT4BoundCond(dic_surf_mcnp, ofile)
+        except UnicodeDecodeError:
+            raise UnicodeError(
+                decoding_error_message(args.encoding)) from None
 
     if skipped_cells:
         print('\nNOTE: the following cells have been omitted from the '
               'conversion\n      because their importance is equal to zero:'
               f'\n      {skipped_cells}')
 
+    if args.verbose:
+        print(f'\ngeometry AST cache: {ast_cache.hits} hits, '
+              f'{ast_cache.misses} misses')
+
     end = datetime.now()
     elapsed = end - start
     print(f'\nfinished at: {end.isoformat()}')
     print(f'elapsed time: {elapsed.total_seconds()} s')
 
 
+def decoding_error_message(encoding):
+    '''Return the error message for an input file that cannot be decoded.'''
+    return (f"Could not decode input file using encoding {encoding!r}. "
+            "You probably need to specify the encoding with the `-e' "
+            "option.")
+
+
 def writeHeader(ofile):
     '''Write a short header for the TRIPOLI-4 output file.'''
     ofile.write('// TRIPOLI-4 geometry generated by t4_geom_convert\n'
@@ -178,8 +200,29 @@ def parse_args(argv):
                            default=None)
     g_general.add_argument('-e', '--encoding',
                            help='encoding of the input file', default='utf-8')
+    g_general.add_argument('--mmap', action='store_true',
+                           help='memory-map the input file and only decode '
+                           'the cards that are needed (reduces memory usage '
+                           'for very large input files; requires an '
+                           'ASCII-compatible encoding)', default=False)
+    g_general.add_argument('--geometry-parser', choices=sorted(backends),
+                           help='parser for the cell geometry descriptions; '
+                           '"nary" is a faster hand-written parser that '
+                           'collects chains of the same operator in a single '
+                           'node', default='tatsu')
+    g_general.add_argument('-j', '--jobs', metavar='N', type=int, default=1,
+                           help='parse the cells in N worker processes (0 '
+                           'means one per CPU)')
     g_general.add_argument('--skip-deduplication', action='store_true',
                            help='skip deduplication of surfaces')
+    g_general.add_argument('--dedup-rel-tol', metavar='TOL', type=float,
+                           default=1e-10,
+                           help='relative tolerance on the surface parameters '
+                           'for surface deduplication')
+    g_general.add_argument('--dedup-abs-tol', metavar='TOL', type=float,
+                           default=1e-12,
+                           help='absolute tolerance on the surface parameters '
+                           'for surface deduplication')
     g_general.add_argument('--skip-compositions', action='store_true',
                            help='skip conversion of the compositions')
     g_general.add_argument('--skip-geomcomp', action='store_true',
@@ -188,15 +231,19 @@ def parse_args(argv):
     g_general.add_argument('--skip-boundary-conditions', action='store_true',
                            help='skip conversion of the boundary conditions')
     g_general.add_argument('--cache', action='store_true',
-                           help='read/write surfaces, cells etc. from a disk '
-                           'cache (avoids parsing, mostly for debug)',
-                           default=False)
+                           help='store the parsed cells, surfaces and '
+                           'transformations in a file next to the input '
+                           '(with the .parse.cache extension) and reuse them '
+                           'on the next run for the cards that did not '
+                           'change', default=False)
 
     # lattice args
     g_conversion = parser.add_argument_group('arguments that control the '
                                              'conversion')
     g_conversion.add_argument('--lattice', metavar='LATTICE_SPEC',
-                              help='bounds for converting a given lattice',
+                              help='bounds for converting a given lattice '
+                              '(inferred from the enclosing cells if '
+                              'omitted)',
                               action='append', default=[])
     g_conversion.add_argument('--always-inline-filling', action='store_true',
                               help='inline the definitions of cells from '
@@ -216,6 +263,8 @@ def parse_args(argv):
                               default=1.0, type=float)
 
     args = parser.parse_args(argv)
+    if args.jobs < 0:
+        parser.error('--jobs must be >= 0')
     return args
 
 